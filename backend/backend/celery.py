@@ -36,6 +36,14 @@ app.conf.beat_schedule = {
         'task': 'owner.tasks.send_weekly_email_notifications_task',
         'schedule': crontab(day_of_week=1, hour=9, minute=0),  # Every Monday at 9:00 AM UTC
     },
+    'archive-notifications': {
+        'task': 'owner.tasks.archive_notifications_task',
+        'schedule': crontab(hour=3, minute=0),  # Every day at 3:00 AM UTC
+    },
+    'drain-email-outbox': {
+        'task': 'owner.tasks.drain_email_outbox_task',
+        'schedule': crontab(),  # Every minute, to retry mail whose backoff has passed
+    },
 }
 
 # Timezone for Celery Beat
@@ -327,6 +327,41 @@ CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = 'UTC'
 CELERY_TASK_TRACK_STARTED = True
 CELERY_TASK_TIME_LIMIT = 30 * 60  # 30 minutes
+# Outgoing mail is sent by its own workers (celery -A backend worker -Q email)
+CELERY_TASK_ROUTES = {
+    'owner.tasks.drain_email_outbox_task': {'queue': 'email'},
+}
+
+# Number of due recurring tasks handled per bulk chunk by the nightly instance job
+RECURRING_TASK_BATCH_SIZE = int(os.getenv('RECURRING_TASK_BATCH_SIZE', 500))
+# Number of due recurring tasks handed to each worker shard by the nightly instance job
+RECURRING_TASK_SHARD_SIZE = int(os.getenv('RECURRING_TASK_SHARD_SIZE', 5000))
+# Number of task registrations handled per bulk chunk by the registration task job
+TASK_REGISTRATION_BATCH_SIZE = int(os.getenv('TASK_REGISTRATION_BATCH_SIZE', 500))
+# Match new home components to task templates in a Celery task after commit (False = inline in the request)
+TASK_REGISTRATION_ASYNC = os.getenv('TASK_REGISTRATION_ASYNC', 'True') == 'True'
+# Number of tasks whose in-app notifications are synced per chunk by the daily boundary job
+NOTIFICATION_BATCH_SIZE = int(os.getenv('NOTIFICATION_BATCH_SIZE', 1000))
+# Number of users handed to each worker shard by the daily notification and weekly email jobs
+USER_SHARD_SIZE = int(os.getenv('USER_SHARD_SIZE', 5000))
+# Number of users whose digest emails share one mail backend connection
+EMAIL_BATCH_SIZE = int(os.getenv('EMAIL_BATCH_SIZE', 200))
+# Days after which read notifications are moved to the notification archive
+NOTIFICATION_RETENTION_DAYS = int(os.getenv('NOTIFICATION_RETENTION_DAYS', 90))
+# Number of notifications archived per chunk by the retention job
+NOTIFICATION_ARCHIVE_BATCH_SIZE = int(os.getenv('NOTIFICATION_ARCHIVE_BATCH_SIZE', 1000))
+# Number of outbox emails each worker claims and sends over one connection
+EMAIL_OUTBOX_BATCH_SIZE = int(os.getenv('EMAIL_OUTBOX_BATCH_SIZE', 100))
+# Attempts before an outbox email is marked failed
+EMAIL_OUTBOX_MAX_ATTEMPTS = int(os.getenv('EMAIL_OUTBOX_MAX_ATTEMPTS', 8))
+# Seconds before the first retry of an outbox email; doubles with every failed attempt
+EMAIL_OUTBOX_RETRY_DELAY = int(os.getenv('EMAIL_OUTBOX_RETRY_DELAY', 60))
+# Redis that notification and task changes are published to for the live event stream (blank = off)
+EVENTS_REDIS_URL = os.getenv('EVENTS_REDIS_URL', '')
+# Redis pub/sub channel the change events are published on
+EVENTS_CHANNEL = os.getenv('EVENTS_CHANNEL', 'homedex:events')
+# Seconds between keep-alive comments on an idle event stream
+EVENTS_KEEPALIVE_INTERVAL = int(os.getenv('EVENTS_KEEPALIVE_INTERVAL', 25))
 
 try:
     from .local_settings import *  # noqa
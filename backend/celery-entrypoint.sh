@@ -26,6 +26,9 @@ export DJANGO_SETTINGS_MODULE=${DJANGO_SETTINGS_MODULE:-backend.settings}
 if [ "$CELERY_MODE" = "worker" ]; then
     echo "Starting Celery worker..."
     exec celery -A backend worker -l info
+elif [ "$CELERY_MODE" = "email_worker" ]; then
+    echo "Starting Celery email worker..."
+    exec celery -A backend worker -Q email -l info --concurrency "${EMAIL_WORKER_CONCURRENCY:-4}"
 elif [ "$CELERY_MODE" = "beat" ]; then
     echo "Starting Celery beat..."
     exec celery -A backend beat -l info --scheduler django_celery_beat.schedulers:DatabaseScheduler
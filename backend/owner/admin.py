@@ -4,9 +4,10 @@ from import_export.admin import ImportExportModelAdmin
 from .models import (
     Home, HomeMembership, UserHomeContext,
     ContactUs, HomeComponent, ComponentImage, ComponentAttachment,
-    Document, Task, Appointment, Notification, NotificationPreference,
+    Document, Task, Appointment, Notification, NotificationArchive, NotificationPreference, EmailOutbox,
     TaskTemplate, TaskRegistration, HomeLocation, Contractor, MaintenanceHistory
 )
+from .recurring_tasks import defer_category_rematch, defer_component_registration
 
 
 # ===== New Home Models =====
@@ -109,6 +110,14 @@ class HomeComponentResource(resources.ModelResource):
         model = HomeComponent
         fields = ('id', 'home', 'name', 'category', 'brand', 'model', 'sku', 'location', 'condition', 'year_installed', 'purchase_date', 'purchase_price', 'warranty_expiration', 'notes')
 
+    def import_data(self, dataset, dry_run=False, **kwargs):
+        # Match and register all new components in one bulk pass, not once per row
+        with defer_component_registration() as component_ids:
+            result = super().import_data(dataset, dry_run=dry_run, **kwargs)
+            if dry_run:
+                component_ids.clear()
+        return result
+
 
 @admin.register(HomeComponent)
 class HomeComponentAdmin(ImportExportModelAdmin):
@@ -263,6 +272,14 @@ class NotificationAdmin(ImportExportModelAdmin):
     )
 
 
+@admin.register(NotificationArchive)
+class NotificationArchiveAdmin(admin.ModelAdmin):
+    list_display = ['title', 'user', 'notification_type', 'is_read', 'created_at', 'archived_at']
+    list_filter = ['notification_type', 'is_read', 'archived_at']
+    search_fields = ['title', 'message', 'user__email']
+    raw_id_fields = ['user', 'task']
+
+
 class NotificationPreferenceResource(resources.ModelResource):
     class Meta:
         model = NotificationPreference
@@ -291,6 +308,14 @@ class NotificationPreferenceAdmin(ImportExportModelAdmin):
     )
 
 
+@admin.register(EmailOutbox)
+class EmailOutboxAdmin(admin.ModelAdmin):
+    list_display = ['subject', 'status', 'attempts', 'next_attempt_at', 'sent_at', 'created_at']
+    list_filter = ['status', 'created_at']
+    search_fields = ['idempotency_key', 'subject', 'to']
+    readonly_fields = ['idempotency_key', 'attempts', 'last_error', 'sent_at', 'created_at', 'updated_at']
+
+
 class TaskTemplateResource(resources.ModelResource):
     class Meta:
         model = TaskTemplate
@@ -302,6 +327,14 @@ class TaskTemplateResource(resources.ModelResource):
             'image_cues', 'symptom_tags', 'is_active'
         )
 
+    def import_data(self, dataset, dry_run=False, **kwargs):
+        # Re-match each affected category once for the whole file, not once per row
+        with defer_category_rematch() as categories:
+            result = super().import_data(dataset, dry_run=dry_run, **kwargs)
+            if dry_run:
+                categories.clear()
+        return result
+
 
 @admin.register(TaskTemplate)
 class TaskTemplateAdmin(ImportExportModelAdmin):
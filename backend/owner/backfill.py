@@ -0,0 +1,138 @@
+"""
+Chunked, resumable backfill of TaskRegistrations for existing HomeComponents.
+
+Components are split into primary key ranges that can be processed in any
+process. A BackfillCheckpoint records the highest component ID below which
+every range has finished, so an interrupted run picks up where it left off.
+"""
+
+import multiprocessing
+from functools import partial
+from django.db import connections
+from django.utils import timezone
+from .fanout import filter_id_range, get_id_ranges
+from .models import BackfillCheckpoint, HomeComponent
+from .recurring_tasks import register_components_bulk
+from .template_matching import get_template_index
+
+
+def get_backfill_components(user_id=None, home_id=None):
+    """
+    Get the HomeComponents a registration backfill covers.
+    """
+    components = HomeComponent.objects.all()
+    if user_id:
+        components = components.filter(user_id=user_id)
+    if home_id:
+        components = components.filter(home_id=home_id)
+    return components
+
+
+def get_component_ranges(components, chunk_size, after_id=0):
+    """
+    Split components into primary key ranges of at most chunk_size components.
+
+    Args:
+        components: QuerySet of HomeComponents
+        chunk_size: maximum number of components per range
+        after_id: only include components with a greater ID
+
+    Returns:
+        list of [start_id, end_id) pairs; end_id is None for the last range
+    """
+    return get_id_ranges(components.filter(id__gt=after_id), chunk_size)
+
+
+def backfill_component_range(id_range, user_id=None, home_id=None, dry_run=False):
+    """
+    Register the components in one [start_id, end_id) range against the active
+    task templates and generate their initial tasks. Safe to repeat: existing
+    registrations are left alone.
+
+    Args:
+        id_range: [start_id, end_id) pair; end_id may be None
+        user_id: optional user filter
+        home_id: optional home filter
+        dry_run: only count the template matches
+
+    Returns:
+        dict with 'range', 'components', 'matched', 'registrations', 'tasks'
+        and 'errors'
+    """
+    components = filter_id_range(get_backfill_components(user_id, home_id), id_range)
+    components = list(components.select_related('user', 'home'))
+
+    if dry_run:
+        template_index = get_template_index()
+        result = {
+            'matched': sum(len(template_index.match(component)) for component in components),
+            'registrations': 0,
+            'tasks': 0,
+            'errors': 0,
+        }
+    else:
+        result = register_components_bulk(components)
+
+    result.update(range=id_range, components=len(components))
+    return result
+
+
+def run_registration_backfill(name, ranges, workers=1, user_id=None, home_id=None, dry_run=False,
+                              on_progress=None):
+    """
+    Process component ranges in order, or across a pool of worker processes,
+    advancing the named checkpoint as each range (and all before it) finishes.
+
+    Args:
+        name: checkpoint name
+        ranges: list of [start_id, end_id) pairs from get_component_ranges
+        workers: number of worker processes (1 = run in this process)
+        user_id: optional user filter
+        home_id: optional home filter
+        dry_run: only count matches and leave the checkpoint alone
+        on_progress: optional callback receiving each range's result
+
+    Returns:
+        dict of totals for this run
+    """
+    totals = {'components': 0, 'matched': 0, 'registrations': 0, 'tasks': 0, 'errors': 0}
+    checkpoint = None
+    if not dry_run:
+        checkpoint, _ = BackfillCheckpoint.objects.get_or_create(name=name)
+
+    def record(result):
+        for key in totals:
+            totals[key] += result[key]
+
+        if checkpoint is not None:
+            end_id = result['range'][1]
+            if end_id is None:
+                checkpoint.completed_at = timezone.now()
+            else:
+                # Results arrive in range order, so everything below end_id is done
+                checkpoint.last_id = end_id - 1
+            checkpoint.processed += result['components']
+            checkpoint.created += result['registrations']
+            checkpoint.save()
+
+        if on_progress:
+            on_progress(result)
+
+    kwargs = {'user_id': user_id, 'home_id': home_id, 'dry_run': dry_run}
+
+    if workers <= 1:
+        for id_range in ranges:
+            record(backfill_component_range(id_range, **kwargs))
+        return totals
+
+    # Forked workers must not share the parent's database connection; each
+    # opens its own on first use
+    connections.close_all()
+    context = multiprocessing.get_context('fork')
+
+    with context.Pool(workers) as pool:
+        # imap yields in submission order, which keeps the checkpoint contiguous
+        for result in pool.imap(partial(backfill_component_range, **kwargs), ranges):
+            record(result)
+
+    return totals
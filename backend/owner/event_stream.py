@@ -0,0 +1,176 @@
+"""
+Server-sent events stream of notification counter and task changes.
+
+A plain ASGI app, mounted by backend/asgi.py in front of Django. Each process
+keeps one Redis pub/sub subscription (EventBroker) and hands events to the
+open streams of their user, so an idle dashboard costs an open socket and a
+periodic keep-alive rather than a poll of the REST endpoints. The current
+counters are sent once when a stream opens.
+"""
+
+import asyncio
+import json
+import logging
+from importlib import import_module
+from types import SimpleNamespace
+import redis.asyncio as aioredis
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import aget_user
+from django.db import close_old_connections
+from django.http import parse_cookie
+from .events import get_counter_data
+from .notification_service import get_notification_counter
+
+logger = logging.getLogger(__name__)
+
+EVENTS_PATH = '/api/v1/owner/events/'
+
+# Events buffered per stream; a client that falls further behind misses some
+# and is brought up to date by the next counter event
+STREAM_QUEUE_SIZE = 100
+
+
+class EventBroker:
+    """
+    Fans events from the Redis channel out to the streams open in this process.
+    """
+
+    def __init__(self):
+        self.streams = {}
+        self.listener = None
+
+    def subscribe(self, user_id):
+        """
+        Open a stream for a user and start listening to Redis if needed.
+
+        Returns:
+            asyncio.Queue that receives the user's events
+        """
+        queue = asyncio.Queue(maxsize=STREAM_QUEUE_SIZE)
+        self.streams.setdefault(user_id, set()).add(queue)
+
+        if self.listener is None and settings.EVENTS_REDIS_URL:
+            self.listener = asyncio.ensure_future(self.listen())
+        return queue
+
+    def unsubscribe(self, user_id, queue):
+        streams = self.streams.get(user_id)
+        if streams is not None:
+            streams.discard(queue)
+            if not streams:
+                del self.streams[user_id]
+
+    def dispatch(self, message):
+        """
+        Hand one published event to the streams of its user.
+        """
+        event = json.loads(message)
+        for queue in self.streams.get(event['user_id'], ()):
+            try:
+                queue.put_nowait(event)
+            except asyncio.QueueFull:
+                pass
+
+    async def listen(self):
+        """
+        Forward events from the Redis channel until cancelled, reconnecting
+        after errors.
+        """
+        while True:
+            try:
+                client = aioredis.Redis.from_url(settings.EVENTS_REDIS_URL)
+                async with client.pubsub() as pubsub:
+                    await pubsub.subscribe(settings.EVENTS_CHANNEL)
+                    async for message in pubsub.listen():
+                        if message['type'] == 'message':
+                            self.dispatch(message['data'])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Event stream lost its Redis subscription: {str(e)}")
+                await asyncio.sleep(1)
+
+
+broker = EventBroker()
+
+
+async def get_scope_user(scope):
+    """
+    Resolve the user of an ASGI connection from its Django session cookie.
+    """
+    headers = dict(scope.get('headers', []))
+    cookies = parse_cookie(headers.get(b'cookie', b'').decode('latin-1'))
+    session_store = import_module(settings.SESSION_ENGINE).SessionStore
+    request = SimpleNamespace(session=session_store(cookies.get(settings.SESSION_COOKIE_NAME)))
+    return await aget_user(request)
+
+
+def load_counter_data(user):
+    close_old_connections()
+    return get_counter_data(get_notification_counter(user))
+
+
+def format_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n".encode()
+
+
+async def wait_for_disconnect(receive):
+    while (await receive())['type'] != 'http.disconnect':
+        pass
+
+
+async def event_stream(scope, receive, send):
+    """
+    ASGI app serving a user's event stream at EVENTS_PATH.
+    """
+    user = await get_scope_user(scope)
+    if not user.is_authenticated:
+        await send({
+            'type': 'http.response.start',
+            'status': 401,
+            'headers': [(b'content-type', b'text/plain')],
+        })
+        await send({'type': 'http.response.body', 'body': b'Authentication required'})
+        return
+
+    # Subscribe before reading the counters so no change falls in between
+    queue = broker.subscribe(user.pk)
+    disconnected = asyncio.ensure_future(wait_for_disconnect(receive))
+    try:
+        await send({
+            'type': 'http.response.start',
+            'status': 200,
+            'headers': [
+                (b'content-type', b'text/event-stream'),
+                (b'cache-control', b'no-cache'),
+                (b'x-accel-buffering', b'no'),
+            ],
+        })
+        counter_data = await sync_to_async(load_counter_data)(user)
+        await send({
+            'type': 'http.response.body',
+            'body': format_event('notifications', counter_data),
+            'more_body': True,
+        })
+
+        while not disconnected.done():
+            next_event = asyncio.ensure_future(queue.get())
+            done, _ = await asyncio.wait(
+                {next_event, disconnected},
+                timeout=settings.EVENTS_KEEPALIVE_INTERVAL,
+                return_when=asyncio.FIRST_COMPLETED,
+            )
+            if next_event in done:
+                event = next_event.result()
+                body = format_event(event['event'], event['data'])
+            else:
+                next_event.cancel()
+                if disconnected.done():
+                    break
+                body = b': keep-alive\n\n'
+
+            await send({'type': 'http.response.body', 'body': body, 'more_body': True})
+    finally:
+        disconnected.cancel()
+        broker.unsubscribe(user.pk, queue)
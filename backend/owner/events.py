@@ -0,0 +1,136 @@
+"""
+Change events for the live event stream.
+
+Notification counter and task writes publish small JSON events to one Redis
+pub/sub channel once their transaction commits. Every event stream process
+subscribes to the channel and forwards each event to the connections of the
+user it belongs to (see event_stream.py). Publishing is off when
+EVENTS_REDIS_URL is blank.
+"""
+
+import json
+import logging
+import redis
+from django.conf import settings
+from django.db import transaction
+from .models import HomeMembership, NotificationCounter
+
+logger = logging.getLogger(__name__)
+
+_client = None
+
+
+def get_redis():
+    """
+    Get the shared Redis client used for publishing, creating it on first use.
+    """
+    global _client
+
+    if _client is None:
+        _client = redis.Redis.from_url(
+            settings.EVENTS_REDIS_URL, socket_connect_timeout=1, socket_timeout=1
+        )
+    return _client
+
+
+def publish_events(events):
+    """
+    Publish events to the event channel in one round trip.
+
+    Args:
+        events: list of (user_id, event name, data dict) tuples
+    """
+    if not events or not settings.EVENTS_REDIS_URL:
+        return
+
+    try:
+        pipeline = get_redis().pipeline(transaction=False)
+        for user_id, event, data in events:
+            pipeline.publish(
+                settings.EVENTS_CHANNEL,
+                json.dumps({'user_id': user_id, 'event': event, 'data': data}, default=str),
+            )
+        pipeline.execute()
+    except redis.RedisError as e:
+        # Clients catch up from the REST endpoints when they reconnect
+        logger.warning(f"Error publishing {len(events)} events: {str(e)}")
+
+
+def get_counter_data(counter):
+    """
+    Event data for a NotificationCounter, in the shape of the summary endpoint.
+    """
+    return {
+        'overdue': counter.overdue,
+        'due_today': counter.due_today,
+        'due_soon': counter.due_soon,
+        'total': counter.total,
+    }
+
+
+def publish_counter_events(user_ids):
+    """
+    Publish the current unread counters of some users.
+    """
+    counters = NotificationCounter.objects.filter(user_id__in=user_ids)
+    publish_events([
+        (counter.user_id, 'notifications', get_counter_data(counter)) for counter in counters
+    ])
+
+
+def queue_counter_events(user_ids):
+    """
+    Publish the unread counters of some users once the current transaction commits.
+    """
+    user_ids = set(user_ids)
+    if user_ids and settings.EVENTS_REDIS_URL:
+        transaction.on_commit(lambda: publish_counter_events(user_ids))
+
+
+def publish_task_events(tasks):
+    """
+    Publish task change events to everyone who can see each task through the
+    API: the members of its home, and its owner.
+
+    Args:
+        tasks: list of (user ID, home ID, event data) tuples
+    """
+    home_ids = {home_id for _, home_id, _ in tasks if home_id}
+    members = {}
+    if home_ids:
+        for home_id, user_id in HomeMembership.objects.filter(home_id__in=home_ids).values_list('home_id', 'user_id'):
+            members.setdefault(home_id, set()).add(user_id)
+
+    events = []
+    for user_id, home_id, data in tasks:
+        recipients = set(members.get(home_id, ()))
+        if user_id:
+            recipients.add(user_id)
+        events.extend((recipient, 'task', data) for recipient in sorted(recipients))
+    publish_events(events)
+
+
+def queue_task_events(tasks, action='saved'):
+    """
+    Publish a change event for each task once the current transaction commits.
+
+    Args:
+        tasks: iterable of Task objects
+        action: 'saved' or 'deleted'
+    """
+    if not settings.EVENTS_REDIS_URL:
+        return
+
+    # Built now, while deleted tasks still have their IDs
+    tasks = [
+        (task.user_id, task.home_id, {
+            'id': task.id,
+            'action': action,
+            'title': task.title,
+            'status': task.status,
+            'due_date': task.due_date,
+        })
+        for task in tasks if task.user_id or task.home_id
+    ]
+    if tasks:
+        transaction.on_commit(lambda: publish_task_events(tasks))
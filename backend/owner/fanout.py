@@ -0,0 +1,65 @@
+"""
+Helpers for fanning batch jobs out over the Celery worker pool.
+
+A job streams the primary keys of the rows it covers, cuts them into fixed-size
+[start_id, end_id) shards, runs one subtask per shard (as a chord) and merges
+the shard results. Only the shard boundaries are ever held in memory, so the
+coordinator stays flat as the table grows.
+"""
+
+
+def get_id_ranges(queryset, shard_size):
+    """
+    Split the rows of a queryset into primary key ranges of at most shard_size rows.
+
+    Args:
+        queryset: QuerySet to split
+        shard_size: maximum number of rows per range
+
+    Returns:
+        list of [start_id, end_id) pairs; end_id is None for the last range
+    """
+    ids = queryset.order_by('id').values_list('id', flat=True)
+
+    starts = [
+        row_id for position, row_id in enumerate(ids.iterator(chunk_size=shard_size))
+        if position % shard_size == 0
+    ]
+
+    return [[start, end] for start, end in zip(starts, starts[1:] + [None])]
+
+
+def filter_id_range(queryset, id_range, field='id'):
+    """
+    Limit a queryset to one [start_id, end_id) range of the given field.
+    """
+    start_id, end_id = id_range
+    queryset = queryset.filter(**{f'{field}__gte': start_id})
+    if end_id is not None:
+        queryset = queryset.filter(**{f'{field}__lt': end_id})
+    return queryset
+
+
+def merge_results(results):
+    """
+    Merge shard result dicts: numbers are added up, lists concatenated and
+    nested dicts merged the same way.
+
+    Args:
+        results: iterable of result dicts
+
+    Returns:
+        dict with the merged result
+    """
+    merged = {}
+
+    for result in results:
+        for key, value in result.items():
+            if isinstance(value, dict):
+                merged[key] = merge_results([merged.get(key, {}), value])
+            elif isinstance(value, list):
+                merged[key] = merged.get(key, []) + value
+            else:
+                merged[key] = merged.get(key, 0) + value
+
+    return merged
@@ -2,26 +2,28 @@
 Django management command to backfill task registrations for existing HomeComponents.
 
 This command will:
-1. Find all existing HomeComponents that don't have task registrations
-2. Check them against all active TaskTemplates
-3. Create TaskRegistrations for matches
+1. Split the HomeComponents into primary key ranges of --chunk-size components
+2. Check each range against all active TaskTemplates
+3. Bulk create the missing TaskRegistrations
 4. Generate initial tasks for the new registrations
 
+Ranges can be spread over several worker processes. Progress is checkpointed
+after every range, so an interrupted run resumes where it stopped.
+
 Usage:
     python manage.py backfill_task_registrations
     python manage.py backfill_task_registrations --dry-run
     python manage.py backfill_task_registrations --user-id 123
     python manage.py backfill_task_registrations --home-id 456
+    python manage.py backfill_task_registrations --chunk-size 2000 --workers 4
+    python manage.py backfill_task_registrations --restart
 """
 
-import logging
-from django.core.management.base import BaseCommand
-from django.contrib.auth import get_user_model
-from owner.models import HomeComponent, TaskTemplate, TaskRegistration
-from owner.recurring_tasks import create_tasks_from_registrations
-
-User = get_user_model()
-logger = logging.getLogger(__name__)
+import time
+from django.core.management.base import BaseCommand, CommandError
+from owner.backfill import get_backfill_components, get_component_ranges, run_registration_backfill
+from owner.models import BackfillCheckpoint
+from owner.template_matching import get_template_index
 
 
 class Command(BaseCommand):
@@ -43,123 +45,114 @@ class Command(BaseCommand):
             type=int,
             help='Backfill for a specific home only',
         )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=1000,
+            help='Components per range (default: 1000)',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=1,
+            help='Worker processes to spread the ranges over (default: 1)',
+        )
+        parser.add_argument(
+            '--restart',
+            action='store_true',
+            help='Ignore the saved checkpoint and start from the first component',
+        )
 
     def handle(self, *args, **options):
-        dry_run = options.get('dry_run', False)
-        user_id = options.get('user_id')
-        home_id = options.get('home_id')
+        dry_run = options['dry_run']
+        user_id = options['user_id']
+        home_id = options['home_id']
+
+        if options['chunk_size'] < 1 or options['workers'] < 1:
+            raise CommandError('--chunk-size and --workers must be at least 1')
 
         if dry_run:
             self.stdout.write(
                 self.style.WARNING('Running in dry-run mode - no changes will be made')
             )
-
-        # Build query for HomeComponents
-        components_query = HomeComponent.objects.all()
-
         if user_id:
-            components_query = components_query.filter(user_id=user_id)
             self.stdout.write(f"Filtering to user ID: {user_id}")
-
         if home_id:
-            components_query = components_query.filter(home_id=home_id)
             self.stdout.write(f"Filtering to home ID: {home_id}")
 
-        # Get all active task templates
-        active_templates = TaskTemplate.objects.filter(is_active=True)
-
-        self.stdout.write(
-            self.style.SUCCESS(f"Found {components_query.count()} HomeComponents")
-        )
-        self.stdout.write(f"Found {active_templates.count()} active TaskTemplates")
-
-        total_matches = 0
-        total_registrations_created = 0
-        components_with_matches = []
-
-        # Check each component
-        for component in components_query:
-            matched_templates = []
+        # One checkpoint per combination of filters
+        name = f"backfill_task_registrations:user={user_id or '*'}:home={home_id or '*'}"
+        checkpoint = BackfillCheckpoint.objects.filter(name=name).first()
 
-            # Find templates that match this component
-            for template in active_templates:
-                if template.matches_component(component):
-                    matched_templates.append(template)
-
-            if matched_templates:
+        after_id = 0
+        if checkpoint and not dry_run:
+            if options['restart'] or checkpoint.completed_at:
+                checkpoint.delete()
+            else:
+                after_id = checkpoint.last_id
                 self.stdout.write(
-                    self.style.SUCCESS(f"\n✓ {component.name} ({component.category})")
+                    self.style.WARNING(
+                        f"Resuming after component ID {after_id} "
+                        f"({checkpoint.processed} components already processed)"
+                    )
                 )
-                self.stdout.write(f"  Matched {len(matched_templates)} template(s)")
-
-                for template in matched_templates:
-                    self.stdout.write(f"    - {template.title}")
-                    total_matches += 1
-
-                    if not dry_run:
-                        # Create a TaskRegistration if it doesn't already exist
-                        registration, created_reg = TaskRegistration.objects.get_or_create(
-                            home_component=component,
-                            task_template=template,
-                            defaults={
-                                'user': component.user,
-                                'home': component.home,
-                                'frequency_months': None,  # Will use template default
-                                'is_active': True,
-                            }
-                        )
-
-                        if created_reg:
-                            self.stdout.write(
-                                self.style.SUCCESS(f"      → Created new TaskRegistration (ID: {registration.id})")
-                            )
-                            total_registrations_created += 1
-                            components_with_matches.append(component)
-                        else:
-                            self.stdout.write(
-                                f"      → TaskRegistration already exists (ID: {registration.id})"
-                            )
+
+        components = get_backfill_components(user_id, home_id)
+        total = components.filter(id__gt=after_id).count()
+        ranges = get_component_ranges(components, options['chunk_size'], after_id=after_id)
+
+        self.stdout.write(self.style.SUCCESS(f"Found {total} HomeComponents"))
+        self.stdout.write(f"Found {len(get_template_index())} active TaskTemplates")
+        self.stdout.write(f"Processing {len(ranges)} range(s) with {options['workers']} worker(s)")
+
+        self.total = total
+        self.done = 0
+        self.registrations = 0
+        self.start = time.monotonic()
+
+        totals = run_registration_backfill(
+            name,
+            ranges,
+            workers=options['workers'],
+            user_id=user_id,
+            home_id=home_id,
+            dry_run=dry_run,
+            on_progress=self.write_progress,
+        )
+        elapsed = time.monotonic() - self.start
 
         # Summary
         self.stdout.write("\n" + "="*60)
         self.stdout.write(self.style.SUCCESS("BACKFILL SUMMARY"))
         self.stdout.write("="*60)
-        self.stdout.write(f"Total template matches found: {total_matches}")
+        self.stdout.write(f"Components processed: {totals['components']} in {elapsed:.1f}s")
+        self.stdout.write(f"Total template matches found: {totals['matched']}")
 
         if dry_run:
             self.stdout.write(
-                self.style.WARNING(f"Would create: {total_matches} TaskRegistrations (dry-run mode)")
+                self.style.WARNING(f"Would create up to {totals['matched']} TaskRegistrations (dry-run mode)")
             )
-        else:
-            self.stdout.write(f"TaskRegistrations created: {total_registrations_created}")
-
-            # Generate initial tasks for newly created registrations
-            if total_registrations_created > 0:
-                self.stdout.write(
-                    self.style.SUCCESS(
-                        f"\nGenerating initial tasks for {total_registrations_created} new registrations..."
-                    )
-                )
+            return
 
-                # Get all new registrations from components we just processed
-                new_registrations = TaskRegistration.objects.filter(
-                    home_component__in=components_with_matches,
-                    last_task_generated__isnull=True,  # Never generated a task yet
-                )
+        self.stdout.write(f"TaskRegistrations created: {totals['registrations']}")
+        self.stdout.write(
+            self.style.SUCCESS(f"Task generation complete: {totals['tasks']} tasks created")
+        )
+        if totals['errors']:
+            self.stdout.write(
+                self.style.ERROR(f"Encountered {totals['errors']} errors generating tasks (see the log)")
+            )
 
-                result = create_tasks_from_registrations(registrations=new_registrations)
+    def write_progress(self, result):
+        self.done += result['components']
+        self.registrations += result['registrations']
 
-                self.stdout.write(
-                    self.style.SUCCESS(
-                        f"Task generation complete: {result['created']} tasks created"
-                    )
-                )
+        elapsed = time.monotonic() - self.start
+        rate = self.done / elapsed if elapsed else 0
+        eta = (self.total - self.done) / rate if rate else 0
+        percent = 100 * self.done / self.total if self.total else 100
 
-                if result.get('errors'):
-                    self.stdout.write(
-                        self.style.ERROR(f"Encountered {len(result['errors'])} errors:")
-                    )
-                    for error in result['errors']:
-                        self.stdout.write(
-                            self.style.ERROR(f"  - {error}")
-                        )
+        self.stdout.write(
+            f"{self.done}/{self.total} components ({percent:.1f}%)  "
+            f"{rate:.0f}/s  {self.registrations} registrations  ETA {eta:.0f}s"
+        )
@@ -0,0 +1,107 @@
+"""
+Django management command to benchmark the recurring task scheduler.
+
+Reports next-occurrence throughput per rule shape, then the wall time and
+query count of a full nightly create_recurring_task_instances run. The nightly
+run is rolled back unless --keep is given, so it can be repeated against the
+same data (see generate_recurring_workload).
+
+Usage:
+    python manage.py benchmark_recurring_tasks
+    python manage.py benchmark_recurring_tasks --sample 5000 --iterations 50
+    python manage.py benchmark_recurring_tasks --batch-size 500 --catch-up
+    python manage.py benchmark_recurring_tasks --row-mode --workload-only
+"""
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from owner.models import Task
+from owner.workload import WORKLOAD_USERNAME_PREFIX, benchmark_nightly_run, benchmark_patterns
+
+
+class Command(BaseCommand):
+    help = 'Benchmark recurrence calculation and the nightly recurring task run'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sample',
+            type=int,
+            default=1000,
+            help='Number of recurring tasks to use for per-pattern throughput',
+        )
+        parser.add_argument(
+            '--iterations',
+            type=int,
+            default=10,
+            help='Occurrences to calculate per sampled task',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            help='Batch size for the nightly run (defaults to RECURRING_TASK_BATCH_SIZE)',
+        )
+        parser.add_argument(
+            '--row-mode',
+            action='store_true',
+            help='Benchmark the row-at-a-time nightly run instead of batch mode',
+        )
+        parser.add_argument(
+            '--catch-up',
+            action='store_true',
+            help='Create every missed occurrence during the nightly run',
+        )
+        parser.add_argument(
+            '--workload-only',
+            action='store_true',
+            help='Only sample tasks created by generate_recurring_workload',
+        )
+        parser.add_argument(
+            '--skip-nightly',
+            action='store_true',
+            help='Only measure per-pattern throughput',
+        )
+        parser.add_argument(
+            '--keep',
+            action='store_true',
+            help='Commit the instances created by the nightly run',
+        )
+
+    def handle(self, *args, **options):
+        tasks = Task.objects.filter(is_recurring=True, parent_task__isnull=True).order_by('id')
+        if options['workload_only']:
+            tasks = tasks.filter(user__username__startswith=WORKLOAD_USERNAME_PREFIX)
+
+        sample = list(tasks[:options['sample']])
+        self.stdout.write(f"Per-pattern throughput ({len(sample)} tasks):")
+
+        for label, stats in benchmark_patterns(sample, options['iterations']).items():
+            self.stdout.write(
+                f"  {label:<18} {stats['tasks']:>7} tasks  "
+                f"engine {stats['engine_per_second']}/s  "
+                f"calculate_next_due_date {stats['next_due_date_per_second']}/s  "
+                f"{stats['queries_per_task']} queries/task"
+            )
+
+        if options['skip_nightly']:
+            return
+
+        batch_size = None if options['row_mode'] else (
+            options['batch_size'] or settings.RECURRING_TASK_BATCH_SIZE
+        )
+        mode = 'row mode' if batch_size is None else f'batch size {batch_size}'
+        if not options['keep']:
+            mode += ', rolled back'
+
+        stats = benchmark_nightly_run(
+            batch_size=batch_size,
+            catch_up=options['catch_up'],
+            keep=options['keep'],
+        )
+
+        self.stdout.write(f"Nightly run ({mode}):")
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"  {stats['created']} instances in {stats['seconds']}s "
+                f"({stats['per_second']}/s), {stats['queries']} queries, {stats['errors']} errors"
+            )
+        )
@@ -5,9 +5,11 @@ This should be scheduled to run periodically (e.g., daily via cron or Celery Bea
 Usage:
     python manage.py create_recurring_task_instances
     python manage.py create_recurring_task_instances --dry-run
+    python manage.py create_recurring_task_instances --batch-size 500
+    python manage.py create_recurring_task_instances --catch-up [--collapse]
 """
 
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
 from owner.recurring_tasks import create_recurring_task_instances
 
 
@@ -20,16 +22,42 @@ class Command(BaseCommand):
             action='store_true',
             help='Show what would be created without actually creating',
         )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            help='Process due tasks in bulk chunks of this size (emails are written to the outbox)',
+        )
+        parser.add_argument(
+            '--catch-up',
+            action='store_true',
+            help='Create every occurrence missed since the last run, not just the next one',
+        )
+        parser.add_argument(
+            '--collapse',
+            action='store_true',
+            help='With --catch-up, only create the latest missed occurrence of each task',
+        )
 
     def handle(self, *args, **options):
         dry_run = options.get('dry_run', False)
+        batch_size = options.get('batch_size')
+        catch_up = options.get('catch_up', False)
+        collapse = options.get('collapse', False)
+
+        if collapse and not catch_up:
+            raise CommandError('--collapse only applies with --catch-up')
 
         if dry_run:
             self.stdout.write(
                 self.style.WARNING('Running in dry-run mode - no changes will be made')
             )
 
-        result = create_recurring_task_instances(dry_run=dry_run)
+        result = create_recurring_task_instances(
+            dry_run=dry_run,
+            batch_size=batch_size,
+            catch_up=catch_up,
+            collapse=collapse,
+        )
 
         self.stdout.write(
             self.style.SUCCESS(f"Successfully created {result['created']} recurring task instances")
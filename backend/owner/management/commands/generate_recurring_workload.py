@@ -0,0 +1,93 @@
+"""
+Django management command to generate a synthetic recurring task workload.
+
+Creates load test homes, each with one owner and a mix of daily, weekly,
+monthly (absolute and relative) and yearly recurring tasks, for use with
+benchmark_recurring_tasks. Generated users have no email address.
+
+Usage:
+    python manage.py generate_recurring_workload --homes 1000 --tasks-per-home 20
+    python manage.py generate_recurring_workload --homes 100 --mix daily:1,weekly:3 --seed 42
+    python manage.py generate_recurring_workload --homes 100 --components-per-home 5
+    python manage.py generate_recurring_workload --clear
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+from owner.workload import clear_workload, generate_workload, parse_pattern_mix
+
+
+class Command(BaseCommand):
+    help = 'Generate synthetic homes and recurring tasks for benchmarking'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--homes',
+            type=int,
+            default=100,
+            help='Number of homes (each with one owner) to create',
+        )
+        parser.add_argument(
+            '--tasks-per-home',
+            type=int,
+            default=10,
+            help='Number of recurring tasks per home',
+        )
+        parser.add_argument(
+            '--mix',
+            help='Pattern weights, e.g. daily:10,weekly:35,monthly-absolute:25,monthly-relative:15,yearly:15',
+        )
+        parser.add_argument(
+            '--spread-days',
+            type=int,
+            default=45,
+            help='Spread task due dates over this many past days',
+        )
+        parser.add_argument(
+            '--components-per-home',
+            type=int,
+            default=0,
+            help='Home components per home, registered against the active task templates',
+        )
+        parser.add_argument(
+            '--seed',
+            type=int,
+            help='Random seed for a reproducible workload',
+        )
+        parser.add_argument(
+            '--clear',
+            action='store_true',
+            help='Delete previously generated data instead of generating more',
+        )
+
+    def handle(self, *args, **options):
+        if options['clear']:
+            deleted = clear_workload()
+            self.stdout.write(self.style.SUCCESS(f"Deleted {deleted} generated rows"))
+            return
+
+        try:
+            mix = parse_pattern_mix(options['mix']) if options['mix'] else None
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        counts = generate_workload(
+            homes=options['homes'],
+            tasks_per_home=options['tasks_per_home'],
+            mix=mix,
+            seed=options['seed'],
+            spread_days=options['spread_days'],
+            components_per_home=options['components_per_home'],
+        )
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Created {counts['homes']} homes, {counts['users']} users and "
+                f"{sum(counts['tasks'].values())} recurring tasks"
+            )
+        )
+        if counts['components']:
+            self.stdout.write(
+                f"Created {counts['components']} components with {counts['registrations']} task registrations"
+            )
+        for label, count in counts['tasks'].items():
+            self.stdout.write(f"  {label}: {count}")
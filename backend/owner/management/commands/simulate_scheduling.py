@@ -0,0 +1,170 @@
+"""
+Django management command to simulate the nightly scheduling pipeline.
+
+Creates a throwaway test database, fills it with a synthetic workload and
+replays N virtual days of create_recurring_task_instances,
+create_tasks_from_registrations and refresh_boundary_notifications with a frozen
+clock, reporting rows created, queries issued and time spent per day. The
+throwaway database is destroyed afterwards; the real database is never touched.
+
+Usage:
+    python manage.py simulate_scheduling --days 30
+    python manage.py simulate_scheduling --homes 1000 --tasks-per-home 10 --components-per-home 5
+    python manage.py simulate_scheduling --extra-monthly-tasks 5 --completion-rate 0.7
+    python manage.py simulate_scheduling --days 90 --row-mode --json
+"""
+
+import json
+from datetime import date
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+from owner.simulation import frozen_clock, simulate_days
+from owner.workload import add_recurring_tasks, create_workload_templates, generate_workload
+
+
+class Command(BaseCommand):
+    help = 'Replay virtual days of the scheduling pipeline against a throwaway database'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=30,
+            help='Number of days to simulate',
+        )
+        parser.add_argument(
+            '--start-date',
+            help='First simulated day (YYYY-MM-DD, defaults to today)',
+        )
+        parser.add_argument(
+            '--homes',
+            type=int,
+            default=100,
+            help='Number of synthetic homes',
+        )
+        parser.add_argument(
+            '--tasks-per-home',
+            type=int,
+            default=10,
+            help='Recurring tasks per home',
+        )
+        parser.add_argument(
+            '--components-per-home',
+            type=int,
+            default=3,
+            help='Home components per home (registered against a synthetic template catalog)',
+        )
+        parser.add_argument(
+            '--extra-monthly-tasks',
+            type=int,
+            default=0,
+            help='Extra monthly recurring tasks to give every user',
+        )
+        parser.add_argument(
+            '--completion-rate',
+            type=float,
+            default=0.0,
+            help='Share of each day\'s due tasks that users complete (0-1)',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            help='Batch size for recurring instances (defaults to RECURRING_TASK_BATCH_SIZE)',
+        )
+        parser.add_argument(
+            '--row-mode',
+            action='store_true',
+            help='Create recurring instances row by row instead of in batches',
+        )
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=0,
+            help='Random seed for the workload and task completion',
+        )
+        parser.add_argument(
+            '--json',
+            action='store_true',
+            help='Print one JSON object per simulated day',
+        )
+
+    def handle(self, *args, **options):
+        try:
+            start_date = (
+                date.fromisoformat(options['start_date']) if options['start_date']
+                else timezone.now().date()
+            )
+        except ValueError:
+            raise CommandError('--start-date must be in YYYY-MM-DD format')
+
+        batch_size = None if options['row_mode'] else (
+            options['batch_size'] or settings.RECURRING_TASK_BATCH_SIZE
+        )
+
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+
+        try:
+            with frozen_clock(start_date):
+                self.populate(options)
+            self.stdout.write(f"Simulating {options['days']} days from {start_date}")
+
+            results = simulate_days(
+                start_date,
+                options['days'],
+                batch_size=batch_size,
+                completion_rate=options['completion_rate'],
+                seed=options['seed'],
+                on_day=self.write_json_day if options['json'] else self.write_day,
+            )
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+        if not options['json']:
+            self.write_totals(results)
+
+    def populate(self, options):
+        create_workload_templates(seed=options['seed'])
+        counts = generate_workload(
+            homes=options['homes'],
+            tasks_per_home=options['tasks_per_home'],
+            seed=options['seed'],
+            components_per_home=options['components_per_home'],
+        )
+        extra = 0
+        if options['extra_monthly_tasks']:
+            extra = add_recurring_tasks(options['extra_monthly_tasks'], seed=options['seed'])
+
+        self.stdout.write(
+            f"Workload: {counts['homes']} homes, {sum(counts['tasks'].values()) + extra} recurring tasks, "
+            f"{counts['components']} components, {counts['registrations']} registrations"
+        )
+
+    def write_json_day(self, stats):
+        self.stdout.write(json.dumps(stats, default=str))
+
+    def write_day(self, stats):
+        stages = '  '.join(
+            f"{name} {stage['queries']}q/{stage['seconds']}s"
+            for name, stage in stats['stages'].items()
+        )
+        rows = stats['rows']
+        self.stdout.write(
+            f"{stats['date']}  +{rows['tasks']} tasks  +{rows['notifications']} notifications  "
+            f"{stats['queries']} queries  {stats['seconds']}s  ({stages})"
+        )
+
+    def write_totals(self, results):
+        if not results:
+            return
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Total: {sum(r['rows']['tasks'] for r in results)} tasks, "
+                f"{sum(r['rows']['notifications'] for r in results)} notifications, "
+                f"{sum(r['queries'] for r in results)} queries, "
+                f"{round(sum(r['seconds'] for r in results), 3)}s; "
+                f"slowest day {max(r['seconds'] for r in results)}s"
+            )
+        )
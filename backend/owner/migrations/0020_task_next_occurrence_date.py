@@ -0,0 +1,208 @@
+# Generated by Django 5.2.1 on 2026-10-17 03:01
+
+from calendar import monthrange
+from datetime import date, timedelta
+
+from django.db import migrations, models
+from django.db.models import Max
+
+
+# Frozen copy of owner.recurrence.next_occurrence as of this migration, so
+# later changes to the engine don't change what this data migration computes
+
+WEEK_INDEX = {'first': 0, 'second': 1, 'third': 2, 'fourth': 3, 'fifth': 4, 'last': -1}
+
+RELATIVE_WEEKDAYS = {'Sunday': 6, 'Monday': 0, 'Tuesday': 1, 'Wednesday': 2,
+                     'Thursday': 3, 'Friday': 4, 'Saturday': 5}
+
+MAX_MONTHS_SEARCHED = 365
+
+
+def next_month(year, month):
+    if month == 12:
+        return year + 1, 1
+    return year, month + 1
+
+
+def relative_day_of_month(year, month, week, day_name):
+    week_index = WEEK_INDEX.get(week)
+    if week_index is None:
+        return None
+
+    first_weekday, days_in_month = monthrange(year, month)
+
+    if day_name == 'day':
+        day = days_in_month if week_index == -1 else week_index + 1
+        return date(year, month, day)
+
+    target = RELATIVE_WEEKDAYS.get(day_name)
+    if target is None:
+        return None
+
+    weekday = (target + 6) % 7
+    first = 1 + (weekday - first_weekday) % 7
+
+    if week_index == -1:
+        day = first + 7 * ((days_in_month - first) // 7)
+    else:
+        day = first + 7 * week_index
+        if day > days_in_month:
+            return None
+
+    return date(year, month, day)
+
+
+def next_weekly(task, current_date, has_previous):
+    interval = task.recurrence_interval or 1
+    days_of_week = task.recurrence_days_of_week or []
+
+    mask = 0
+    for day in days_of_week:
+        day = int(day)
+        if 0 <= day <= 6:
+            mask |= 1 << ((day + 6) % 7)
+
+    if interval < 1 or (days_of_week and mask == 0):
+        return current_date + timedelta(days=1)
+
+    if not days_of_week:
+        offset = 7
+    else:
+        offset = next(k for k in range(1, 8) if mask & (1 << ((current_date.weekday() + k) % 7)))
+
+    if has_previous and offset == 7:
+        offset = 7 * interval
+
+    return current_date + timedelta(days=offset)
+
+
+def next_monthly(task, current_date):
+    candidate_date = current_date + timedelta(days=1)
+    days_of_month = task.recurrence_days_of_month or []
+    year, month = candidate_date.year, candidate_date.month
+
+    if days_of_month and isinstance(days_of_month[0], dict):
+        week = days_of_month[0].get('week', 'first')
+        day_name = days_of_month[0].get('day', 'day')
+        if week not in WEEK_INDEX or (day_name != 'day' and day_name not in RELATIVE_WEEKDAYS):
+            return candidate_date
+
+        target_date = relative_day_of_month(year, month, week, day_name)
+        if target_date and target_date >= candidate_date:
+            return target_date
+        for _ in range(MAX_MONTHS_SEARCHED - 1):
+            year, month = next_month(year, month)
+            target_date = relative_day_of_month(year, month, week, day_name)
+            if target_date:
+                return target_date
+        return candidate_date
+
+    if days_of_month:
+        month_days = []
+        for day in days_of_month:
+            try:
+                day = int(day)
+            except ValueError:
+                continue
+            if 1 <= day <= 31:
+                month_days.append(day)
+    else:
+        month_days = [current_date.day]
+
+    if not month_days:
+        return candidate_date
+
+    days_in_month = monthrange(year, month)[1]
+    for day in month_days:
+        if candidate_date.day <= day <= days_in_month:
+            return date(year, month, day)
+
+    while True:
+        year, month = next_month(year, month)
+        days_in_month = monthrange(year, month)[1]
+        for day in month_days:
+            if day <= days_in_month:
+                return date(year, month, day)
+
+
+def next_occurrence(task, current_date, has_previous=False):
+    pattern = task.recurrence_pattern
+
+    if pattern == 'daily':
+        return current_date + timedelta(days=task.recurrence_interval)
+
+    if pattern == 'weekly':
+        return next_weekly(task, current_date, has_previous)
+
+    if pattern == 'monthly':
+        return next_monthly(task, current_date)
+
+    if pattern == 'yearly':
+        try:
+            return current_date.replace(year=current_date.year + task.recurrence_interval)
+        except ValueError:
+            return current_date.replace(year=current_date.year + task.recurrence_interval, day=28)
+
+    return current_date + timedelta(days=1)
+
+
+def populate_next_occurrence_date(apps, schema_editor):
+    """
+    Compute next_occurrence_date for existing recurring tasks, starting from
+    each task's latest instance (or its own due date if it has none).
+    """
+    Task = apps.get_model('owner', 'Task')
+    RecurringTaskInstance = apps.get_model('owner', 'RecurringTaskInstance')
+
+    latest_due_dates = dict(
+        RecurringTaskInstance.objects.values('recurring_task_id')
+        .annotate(latest_due_date=Max('instance_task__due_date'))
+        .values_list('recurring_task_id', 'latest_due_date')
+    )
+
+    recurring_tasks = Task.objects.filter(is_recurring=True, parent_task__isnull=True)
+    batch = []
+
+    for task in recurring_tasks.iterator(chunk_size=1000):
+        latest_due_date = latest_due_dates.get(task.id)
+        try:
+            if latest_due_date:
+                next_date = next_occurrence(task, latest_due_date, has_previous=True)
+            else:
+                next_date = next_occurrence(task, task.due_date)
+        except Exception:
+            # Malformed rules never produced instances; leave them unscheduled
+            continue
+
+        if task.recurrence_end_date and next_date > task.recurrence_end_date:
+            continue
+
+        task.next_occurrence_date = next_date
+        batch.append(task)
+
+        if len(batch) >= 1000:
+            Task.objects.bulk_update(batch, ['next_occurrence_date'])
+            batch = []
+
+    if batch:
+        Task.objects.bulk_update(batch, ['next_occurrence_date'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('owner', '0019_migrate_users_to_homes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='task',
+            name='next_occurrence_date',
+            field=models.DateField(blank=True, help_text='Due date of the next instance of a recurring task', null=True),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(condition=models.Q(('is_recurring', True), ('parent_task__isnull', True)), fields=['next_occurrence_date'], name='task_next_occurrence_idx'),
+        ),
+        migrations.RunPython(populate_next_occurrence_date, migrations.RunPython.noop),
+    ]
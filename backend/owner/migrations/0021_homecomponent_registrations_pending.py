@@ -0,0 +1,18 @@
+# Generated by Django 5.2.1 on 2026-10-17 04:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('owner', '0020_task_next_occurrence_date'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='homecomponent',
+            name='registrations_pending',
+            field=models.BooleanField(default=False, help_text='Task template matching for this component has not finished yet'),
+        ),
+    ]
@@ -0,0 +1,77 @@
+# Generated by Django 5.2.1 on 2026-10-17 04:40
+
+from calendar import monthrange
+from datetime import date
+
+from django.db import migrations, models
+from django.db.models import Max
+
+
+def add_months(day, months):
+    """
+    Frozen copy of owner.recurrence.add_months as of this migration: add
+    calendar months, landing on the last day of shorter months.
+    """
+    month_index = day.month - 1 + months
+    year, month = day.year + month_index // 12, month_index % 12 + 1
+    return date(year, month, min(day.day, monthrange(year, month)[1]))
+
+
+def populate_next_task_due(apps, schema_editor):
+    """
+    Turn next_task_due into the scheduling key: the latest task's due date
+    plus the registration's frequency in calendar months. Registrations with
+    no task yet are left null, which the registration job treats as due.
+    """
+    TaskRegistration = apps.get_model('owner', 'TaskRegistration')
+    Task = apps.get_model('owner', 'Task')
+
+    registrations = TaskRegistration.objects.select_related('task_template').order_by('id')
+    last_id = 0
+
+    while True:
+        chunk = list(registrations.filter(id__gt=last_id)[:1000])
+        if not chunk:
+            break
+        last_id = chunk[-1].id
+
+        latest_due_dates = {
+            (task['user_id'], task['home_component_id'], task['title']): task['latest_due_date']
+            for task in Task.objects.filter(
+                home_component_id__in={r.home_component_id for r in chunk},
+                title__in={r.task_template.title for r in chunk},
+            ).values('user_id', 'home_component_id', 'title').annotate(latest_due_date=Max('due_date'))
+        }
+
+        for registration in chunk:
+            latest_due_date = latest_due_dates.get(
+                (registration.user_id, registration.home_component_id, registration.task_template.title)
+            )
+            frequency_months = registration.frequency_months
+            if frequency_months is None:
+                frequency_months = registration.task_template.frequency_months
+            registration.next_task_due = (
+                add_months(latest_due_date, frequency_months) if latest_due_date else None
+            )
+
+        TaskRegistration.objects.bulk_update(chunk, ['next_task_due'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('owner', '0021_homecomponent_registrations_pending'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='taskregistration',
+            name='next_task_due',
+            field=models.DateField(blank=True, help_text='Date the next task should be generated (null = check task history)', null=True),
+        ),
+        migrations.AddIndex(
+            model_name='taskregistration',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['next_task_due'], name='taskreg_next_task_due_idx'),
+        ),
+        migrations.RunPython(populate_next_task_due, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.1 on 2026-10-17 05:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('owner', '0023_backfillcheckpoint'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='homecomponent',
+            index=models.Index(fields=['category', 'id'], name='homecomponent_category_idx'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.1 on 2026-10-17 06:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('owner', '0024_homecomponent_category_idx'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(condition=models.Q(('status__in', ['pending', 'in-progress'])), fields=['due_date'], name='task_open_due_date_idx'),
+        ),
+    ]
@@ -1,6 +1,7 @@
 from django.db import models
 from django.contrib.auth import get_user_model
 from django.core.exceptions import ValidationError
+from django.utils import timezone
 
 User = get_user_model()
 
@@ -240,11 +241,16 @@ class HomeComponent(models.Model):
     notes = models.TextField(blank=True)
     last_maintenance = models.DateField(null=True, blank=True)
     next_maintenance = models.DateField(null=True, blank=True)
+    registrations_pending = models.BooleanField(default=False, help_text="Task template matching for this component has not finished yet")
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Template catalog changes re-match one category at a time, in ID order
+            models.Index(fields=['category', 'id'], name='homecomponent_category_idx'),
+        ]
 
     def __str__(self):
         return f"{self.name} - {self.category}"
@@ -369,12 +375,27 @@ class Task(models.Model):
     recurrence_days_of_month = models.JSONField(default=list, blank=True, help_text="Selected days of month or relative day pattern for monthly recurrence")
     recurrence_end_date = models.DateField(null=True, blank=True, help_text="Date when recurring task stops (null = never)")
     parent_task = models.ForeignKey('self', on_delete=models.CASCADE, null=True, blank=True, related_name='recurring_instances')
+    # Materialized due date of the next instance to create (null = nothing left to schedule)
+    next_occurrence_date = models.DateField(null=True, blank=True, help_text="Due date of the next instance of a recurring task")
 
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(
+                fields=['next_occurrence_date'],
+                name='task_next_occurrence_idx',
+                condition=models.Q(is_recurring=True, parent_task__isnull=True),
+            ),
+            # The daily notification job only looks at open tasks on a few due dates
+            models.Index(
+                fields=['due_date'],
+                name='task_open_due_date_idx',
+                condition=models.Q(status__in=['pending', 'in-progress']),
+            ),
+        ]
 
     def __str__(self):
         return f"{self.title} - {self.status}"
@@ -517,7 +538,7 @@ class TaskRegistration(models.Model):
 
     # Task generation tracking
     last_task_generated = models.DateField(null=True, blank=True)
-    next_task_due = models.DateField(null=True, blank=True)
+    next_task_due = models.DateField(null=True, blank=True, help_text="Date the next task should be generated (null = check task history)")
 
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -525,6 +546,14 @@ class TaskRegistration(models.Model):
     class Meta:
         ordering = ['-created_at']
         unique_together = ['home_component', 'task_template']
+        indexes = [
+            # The registration job only ever looks at active registrations that are due
+            models.Index(
+                fields=['next_task_due'],
+                name='taskreg_next_task_due_idx',
+                condition=models.Q(is_active=True),
+            ),
+        ]
 
     def __str__(self):
         return f"{self.task_template.title} for {self.home_component.name}"
@@ -534,6 +563,65 @@ class TaskRegistration(models.Model):
         return self.frequency_months if self.frequency_months is not None else self.task_template.frequency_months
 
 
+class BackfillCheckpoint(models.Model):
+    """
+    Progress of a long-running, resumable backfill. Everything up to and
+    including last_id has been processed.
+    """
+    name = models.CharField(max_length=255, unique=True, help_text="Backfill name plus any filters it was run with")
+    last_id = models.BigIntegerField(default=0)
+    processed = models.IntegerField(default=0)
+    created = models.IntegerField(default=0)
+    completed_at = models.DateTimeField(null=True, blank=True)
+    started_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.name} (last ID {self.last_id})"
+
+
+class EmailOutbox(models.Model):
+    """
+    An outgoing email waiting to be sent by the outbox worker. Callers insert
+    rows instead of sending mail themselves; the idempotency key keeps a
+    logical email from being queued twice.
+    """
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('sending', 'Sending'),
+        ('sent', 'Sent'),
+        ('failed', 'Failed'),
+    ]
+
+    idempotency_key = models.CharField(max_length=255, unique=True)
+    to = models.JSONField(default=list, help_text="Recipient email addresses")
+    from_email = models.CharField(max_length=255, blank=True, help_text="Sender (blank = DEFAULT_FROM_EMAIL)")
+    subject = models.TextField()
+    body = models.TextField(blank=True)
+    html_body = models.TextField(blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    attempts = models.IntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            # The outbox worker only looks for mail that is waiting to go out
+            models.Index(
+                fields=['next_attempt_at'],
+                name='emailoutbox_pending_idx',
+                condition=models.Q(status__in=['pending', 'sending']),
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.subject} to {', '.join(self.to)} ({self.status})"
+
+
 class Appointment(models.Model):
     STATUS_CHOICES = [
         ('pending', 'Pending'),
@@ -642,7 +730,8 @@ class Notification(models.Model):
         ('due_soon', 'Due Soon (Next 7 Days)'),
     ]
 
-    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='notifications')
+    # Lookups by user are covered by the composite indexes below
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='notifications', db_index=False)
     task = models.ForeignKey(Task, on_delete=models.CASCADE, related_name='notifications')
     notification_type = models.CharField(max_length=20, choices=NOTIFICATION_TYPES)
     title = models.CharField(max_length=255)
@@ -654,11 +743,65 @@ class Notification(models.Model):
     class Meta:
         ordering = ['-created_at']
         unique_together = ['user', 'task', 'notification_type']
+        indexes = [
+            # The notification list: a user's notifications, newest first
+            models.Index(fields=['user', '-created_at'], name='notification_user_created_idx'),
+            # Counter recounts only look at unread notifications
+            models.Index(
+                fields=['user', 'notification_type'],
+                name='notification_unread_idx',
+                condition=models.Q(is_read=False),
+            ),
+        ]
 
     def __str__(self):
         return f"{self.get_notification_type_display()} - {self.user.email} - {self.task.title}"
 
 
+class NotificationArchive(models.Model):
+    """
+    Notifications moved out of the Notification table by the retention job:
+    read ones past NOTIFICATION_RETENTION_DAYS and those of completed or
+    dismissed tasks.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='archived_notifications')
+    task = models.ForeignKey(
+        Task, on_delete=models.SET_NULL, null=True, blank=True, related_name='archived_notifications'
+    )
+    notification_type = models.CharField(max_length=20, choices=Notification.NOTIFICATION_TYPES)
+    title = models.CharField(max_length=255)
+    message = models.TextField()
+    is_read = models.BooleanField(default=False)
+    created_at = models.DateTimeField()
+    read_at = models.DateTimeField(null=True, blank=True)
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"{self.get_notification_type_display()} - {self.user.email} (archived)"
+
+
+class NotificationCounter(models.Model):
+    """
+    A user's unread notification counts per notification type, kept up to date
+    as notifications are written so the polling endpoints read a single row.
+    """
+    user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='notification_counter')
+    overdue = models.PositiveIntegerField(default=0)
+    due_today = models.PositiveIntegerField(default=0)
+    due_soon = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    @property
+    def total(self):
+        return self.overdue + self.due_today + self.due_soon
+
+    def __str__(self):
+        return f"Unread notifications for {self.user.email}: {self.total}"
+
+
 class NotificationPreference(models.Model):
     """
     Stores user preferences for notifications
@@ -1,122 +1,392 @@
 """
 Notification service for managing and sending notifications
 """
+import logging
+import threading
+from contextlib import contextmanager
+from functools import lru_cache
 from django.utils import timezone
 from datetime import timedelta
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from .models import Task, Notification, NotificationPreference
-from django.db.models import Q
+from django.db import transaction
+from django.template.loader import get_template, render_to_string
+from django.utils.safestring import mark_safe
+from .events import queue_counter_events
+from .fanout import filter_id_range
+from .models import Task, Notification, NotificationArchive, NotificationCounter, NotificationPreference
+from .outbox import build_outbox_email, queue_emails
+from django.db.models import Count, F, Q
+from django.db.models.functions import Greatest
 
 User = get_user_model()
+logger = logging.getLogger(__name__)
 
+# Task statuses that still get reminders
+OPEN_TASK_STATUSES = ['pending', 'in-progress']
 
-def get_upcoming_and_overdue_tasks(user):
+# Notifications of tasks in these statuses are archived regardless of age
+CLOSED_TASK_STATUSES = ['completed', 'dismissed']
+
+
+# Notification type -> (title format, message format)
+NOTIFICATION_TEMPLATES = {
+    'overdue': (
+        'Overdue: {title}',
+        'Task "{title}" was due on {due_date}',
+    ),
+    'due_today': (
+        'Due Today: {title}',
+        'Task "{title}" is due today!',
+    ),
+    'due_soon': (
+        'Coming Up: {title}',
+        'Task "{title}" is due on {due_date}',
+    ),
+}
+
+
+def get_notification_preferences(user_ids):
+    """
+    Get the notification preferences of a batch of users, creating the
+    missing ones with their defaults in one statement.
+
+    Args:
+        user_ids: list of user IDs
+
+    Returns:
+        dict: user ID -> NotificationPreference
+    """
+    prefs = {pref.user_id: pref for pref in NotificationPreference.objects.filter(user_id__in=user_ids)}
+    missing = [NotificationPreference(user_id=user_id) for user_id in user_ids if user_id not in prefs]
+    if missing:
+        # ignore_conflicts covers preferences created concurrently since the lookup
+        NotificationPreference.objects.bulk_create(missing, ignore_conflicts=True)
+        prefs.update((pref.user_id, pref) for pref in missing)
+    return prefs
+
+
+def get_notification_type(due_date, today, pref):
+    """
+    Work out which in-app notification an open task due on due_date should
+    have today, given its owner's preferences.
+
+    Returns:
+        str notification type, or None if it should have none
+    """
+    if due_date < today:
+        return 'overdue' if pref.inapp_overdue_tasks else None
+    if not pref.inapp_due_soon_tasks or due_date > today + timedelta(days=7):
+        return None
+    return 'due_today' if due_date == today else 'due_soon'
+
+
+def build_notification(task_id, user_id, title, due_date, notification_type):
+    """
+    Build an unsaved Notification of the given type for a task.
+    """
+    title_format, message_format = NOTIFICATION_TEMPLATES[notification_type]
+    context = {'title': title, 'due_date': due_date.strftime("%B %d, %Y")}
+    return Notification(
+        user_id=user_id,
+        task_id=task_id,
+        notification_type=notification_type,
+        title=title_format.format(**context),
+        message=message_format.format(**context),
+    )
+
+
+def get_archived_notification_keys(task_ids):
+    """
+    (task ID, notification type) pairs of some tasks whose notification was
+    archived after being read. These count as already notified, like the read
+    notifications they were before archiving. Unread ones archived with a
+    closed task don't, so reopening the task brings its notification back.
+    """
+    return set(
+        NotificationArchive.objects.filter(task_id__in=task_ids, is_read=True)
+        .values_list('task_id', 'notification_type')
+    )
+
+
+def sync_task_notifications(task_ids):
     """
-    Get upcoming tasks (next 7 days) and overdue tasks for a user
+    Bring the in-app notifications of some tasks in line with their current
+    due date, status and title: create the one each task should have now,
+    rewrite it if its text is out of date and delete unread notifications
+    that no longer apply. Read notifications are kept as history.
+
+    Args:
+        task_ids: list of task IDs
 
     Returns:
-        dict: Contains 'overdue', 'due_today', 'due_soon' lists
+        dict with 'created', 'updated' and 'deleted' counts
     """
+    result = {'created': 0, 'updated': 0, 'deleted': 0}
+    task_ids = list(task_ids)
+    if not task_ids:
+        return result
+
     today = timezone.now().date()
-    next_week = today + timedelta(days=7)
+    tasks = list(
+        Task.objects.filter(id__in=task_ids, user__isnull=False)
+        .values_list('id', 'user_id', 'title', 'due_date', 'status')
+    )
+    prefs = get_notification_preferences({user_id for _, user_id, _, _, _ in tasks})
+
+    wanted = {}
+    for task_id, user_id, title, due_date, status in tasks:
+        notification_type = (
+            get_notification_type(due_date, today, prefs[user_id])
+            if status in OPEN_TASK_STATUSES else None
+        )
+        if notification_type:
+            wanted[task_id] = build_notification(task_id, user_id, title, due_date, notification_type)
+
+    stale = []
+    changed = []
+    for notification in Notification.objects.filter(task_id__in=task_ids).only(
+        'id', 'user_id', 'task_id', 'notification_type', 'title', 'message', 'is_read'
+    ):
+        current = wanted.get(notification.task_id)
+        if current is not None and current.notification_type == notification.notification_type:
+            del wanted[notification.task_id]
+            if (notification.title, notification.message) != (current.title, current.message):
+                notification.title, notification.message = current.title, current.message
+                changed.append(notification)
+        elif not notification.is_read:
+            stale.append(notification.id)
+
+    # Notifications archived after they were read are not created again
+    if wanted:
+        archived = get_archived_notification_keys(list(wanted))
+        wanted = {
+            task_id: notification for task_id, notification in wanted.items()
+            if (task_id, notification.notification_type) not in archived
+        }
+
+    with transaction.atomic(), defer_notification_recount() as counted_users:
+        if stale:
+            result['deleted'], _ = Notification.objects.filter(id__in=stale).delete()
+        if changed:
+            result['updated'] = Notification.objects.bulk_update(changed, ['title', 'message'])
+        # ignore_conflicts covers notifications created concurrently since the lookup
+        Notification.objects.bulk_create(wanted.values(), ignore_conflicts=True)
+        counted_users.update(notification.user_id for notification in wanted.values())
+        result['created'] = len(wanted)
+
+    return result
+
+
+def queue_notification_sync(task_ids):
+    """
+    Sync the notifications of some tasks once the current transaction commits.
+    Used by writes that change tasks' due dates or statuses.
+    """
+    task_ids = list(task_ids)
+    if task_ids:
+        transaction.on_commit(lambda: sync_task_notifications(task_ids))
 
-    # Get all non-completed tasks for the user
-    all_tasks = Task.objects.filter(
-        user=user,
-        status__in=['pending', 'in-progress']
-    ).order_by('due_date')
 
-    overdue_tasks = all_tasks.filter(due_date__lt=today)
-    due_today_tasks = all_tasks.filter(due_date=today)
-    due_soon_tasks = all_tasks.filter(due_date__gt=today, due_date__lte=next_week)
+def recount_notifications(user_ids):
+    """
+    Recompute the unread counters of some users from their notifications,
+    with one grouped count and one upsert. The users' counter rows are locked
+    first, so concurrent recounts for the same user run one after the other.
 
-    return {
-        'overdue': list(overdue_tasks),
-        'due_today': list(due_today_tasks),
-        'due_soon': list(due_soon_tasks),
-    }
+    Args:
+        user_ids: iterable of user IDs
+    """
+    user_ids = sorted(set(user_ids))
+    if not user_ids:
+        return
+
+    list(
+        NotificationCounter.objects.select_for_update().filter(user_id__in=user_ids)
+        .order_by('user_id').values_list('id', flat=True)
+    )
+
+    counts = {user_id: dict.fromkeys(NOTIFICATION_TEMPLATES, 0) for user_id in user_ids}
+    for row in (
+        Notification.objects.filter(user_id__in=user_ids, is_read=False)
+        .values('user_id', 'notification_type').annotate(count=Count('id')).order_by()
+    ):
+        counts[row['user_id']][row['notification_type']] = row['count']
+
+    NotificationCounter.objects.bulk_create(
+        [NotificationCounter(user_id=user_id, **user_counts) for user_id, user_counts in counts.items()],
+        update_conflicts=True,
+        unique_fields=['user'],
+        update_fields=[*NOTIFICATION_TEMPLATES, 'updated_at'],
+    )
+    queue_counter_events(user_ids)
+
+
+def adjust_notification_counter(user_id, notification_type, delta):
+    """
+    Add delta to one of a user's unread counters. Inside
+    defer_notification_recount() the user is collected for a recount instead.
+    A user without a counter row is left alone; it is counted when first read.
+    """
+    counted_users = getattr(_deferred, 'user_ids', None)
+    if counted_users is not None:
+        counted_users.add(user_id)
+        return
 
+    NotificationCounter.objects.filter(user_id=user_id).update(
+        **{notification_type: Greatest(F(notification_type) + delta, 0)},
+        updated_at=timezone.now(),
+    )
+    queue_counter_events([user_id])
 
-def create_notifications_for_user(user):
+
+_deferred = threading.local()
+
+
+@contextmanager
+def defer_notification_recount():
+    """
+    Collect the users whose notifications a bulk write touches and recount
+    their counters once at the end of the block, inside the caller's
+    transaction. Nested blocks share the outer collection.
+    """
+    counted_users = getattr(_deferred, 'user_ids', None)
+    if counted_users is not None:
+        yield counted_users
+        return
+
+    counted_users = _deferred.user_ids = set()
+    try:
+        yield counted_users
+    finally:
+        _deferred.user_ids = None
+
+    recount_notifications(counted_users)
+
+
+def get_notification_counter(user):
+    """
+    Get a user's unread notification counter, counting it on first use.
+
+    Returns:
+        NotificationCounter object
     """
-    Create in-app notifications for a user based on their tasks
+    counter = NotificationCounter.objects.filter(user=user).first()
+    if counter is None:
+        with transaction.atomic():
+            recount_notifications([user.pk])
+        counter = NotificationCounter.objects.get(user=user)
+    return counter
+
+
+def refresh_boundary_notifications(days=1, user_id_range=None, batch_size=None):
+    """
+    Daily pass for the notifications that change only because the date did:
+    tasks that just became overdue, are due today or just came within seven
+    days. Everything else is kept up to date as tasks are written.
 
     Args:
-        user: The user object
+        days: number of day boundaries to cover (more than 1 catches up missed runs)
+        user_id_range: optional [start_id, end_id) range of user IDs to limit the pass to
+        batch_size: tasks per chunk (defaults to NOTIFICATION_BATCH_SIZE)
 
     Returns:
-        dict: Count of created notifications by type
+        dict with 'created', 'updated' and 'deleted' counts
     """
-    tasks_data = get_upcoming_and_overdue_tasks(user)
-    created_counts = {
-        'overdue': 0,
-        'due_today': 0,
-        'due_soon': 0,
-    }
+    batch_size = batch_size or settings.NOTIFICATION_BATCH_SIZE
+    result = {'created': 0, 'updated': 0, 'deleted': 0}
+    today = timezone.now().date()
+    next_week = today + timedelta(days=7)
 
-    # Get or create notification preferences
-    pref, _ = NotificationPreference.objects.get_or_create(user=user)
-
-    # Create overdue notifications if enabled
-    if pref.inapp_overdue_tasks:
-        for task in tasks_data['overdue']:
-            notification, created = Notification.objects.get_or_create(
-                user=user,
-                task=task,
-                notification_type='overdue',
-                defaults={
-                    'title': f'Overdue: {task.title}',
-                    'message': f'Task "{task.title}" was due on {task.due_date.strftime("%B %d, %Y")}',
-                }
-            )
-            if created:
-                created_counts['overdue'] += 1
-
-    # Create due today notifications if enabled
-    if pref.inapp_due_soon_tasks:
-        for task in tasks_data['due_today']:
-            notification, created = Notification.objects.get_or_create(
-                user=user,
-                task=task,
-                notification_type='due_today',
-                defaults={
-                    'title': f'Due Today: {task.title}',
-                    'message': f'Task "{task.title}" is due today!',
-                }
-            )
-            if created:
-                created_counts['due_today'] += 1
-
-    # Create due soon notifications if enabled
-    if pref.inapp_due_soon_tasks:
-        for task in tasks_data['due_soon']:
-            notification, created = Notification.objects.get_or_create(
-                user=user,
-                task=task,
-                notification_type='due_soon',
-                defaults={
-                    'title': f'Coming Up: {task.title}',
-                    'message': f'Task "{task.title}" is due on {task.due_date.strftime("%B %d, %Y")}',
-                }
-            )
-            if created:
-                created_counts['due_soon'] += 1
-
-    return created_counts
-
-
-def should_send_email_notification(user):
-    """
-    Check if a user should receive email notifications based on their preferences and frequency
+    tasks = Task.objects.filter(
+        Q(due_date__gte=today - timedelta(days=days), due_date__lte=today)
+        | Q(due_date__gt=next_week - timedelta(days=days), due_date__lte=next_week),
+        status__in=OPEN_TASK_STATUSES,
+        user__isnull=False,
+    )
+    if user_id_range:
+        tasks = filter_id_range(tasks, user_id_range, field='user_id')
+    task_ids = tasks.order_by('id').values_list('id', flat=True)
+
+    last_id = 0
+    while True:
+        chunk = list(task_ids.filter(id__gt=last_id)[:batch_size])
+        if not chunk:
+            break
+        last_id = chunk[-1]
+
+        for key, value in sync_task_notifications(chunk).items():
+            result[key] += value
+
+    return result
+
+
+def archive_notifications(retention_days=None, batch_size=None):
+    """
+    Move read notifications older than the retention period, and the
+    notifications of completed or dismissed tasks, into NotificationArchive.
+    Archived notifications of open tasks are not recreated by the sync.
+    Works in keyset chunks of batch_size, each copied and deleted in its own
+    transaction, so the job can be stopped and rerun at any point.
 
     Args:
-        user: The user object
+        retention_days: age in days after which read notifications are archived
+            (defaults to NOTIFICATION_RETENTION_DAYS)
+        batch_size: notifications per chunk (defaults to NOTIFICATION_ARCHIVE_BATCH_SIZE)
 
     Returns:
-        bool: True if email should be sent
+        dict with 'archived' count
+    """
+    retention_days = retention_days or settings.NOTIFICATION_RETENTION_DAYS
+    batch_size = batch_size or settings.NOTIFICATION_ARCHIVE_BATCH_SIZE
+    result = {'archived': 0}
+    cutoff = timezone.now() - timedelta(days=retention_days)
+
+    candidate_ids = Notification.objects.filter(
+        Q(is_read=True, created_at__lt=cutoff) | Q(task__status__in=CLOSED_TASK_STATUSES)
+    ).order_by('id').values_list('id', flat=True)
+
+    last_id = 0
+    while True:
+        chunk = list(candidate_ids.filter(id__gt=last_id)[:batch_size])
+        if not chunk:
+            break
+        last_id = chunk[-1]
+
+        # Unread notifications deleted here are recounted once per chunk
+        with transaction.atomic(), defer_notification_recount():
+            notifications = list(Notification.objects.select_for_update().filter(id__in=chunk))
+            NotificationArchive.objects.bulk_create([
+                NotificationArchive(
+                    user_id=notification.user_id,
+                    task_id=notification.task_id,
+                    notification_type=notification.notification_type,
+                    title=notification.title,
+                    message=notification.message,
+                    is_read=notification.is_read,
+                    created_at=notification.created_at,
+                    read_at=notification.read_at,
+                )
+                for notification in notifications
+            ])
+            Notification.objects.filter(id__in=[notification.id for notification in notifications]).delete()
+
+        result['archived'] += len(notifications)
+
+    return result
+
+
+def is_email_due(pref, now):
     """
-    pref, _ = NotificationPreference.objects.get_or_create(user=user)
+    Check a user's preferences to see whether an email notification is due now.
 
+    Args:
+        pref: NotificationPreference object
+        now: current datetime
+
+    Returns:
+        bool: True if email should be sent
+    """
     # If emails are disabled, don't send
     if not pref.email_overdue_tasks and not pref.email_due_soon_tasks:
         return False
@@ -126,8 +396,6 @@ def should_send_email_notification(user):
         return False
 
     # Check last email sent based on frequency
-    now = timezone.now()
-
     if pref.email_frequency == 'daily':
         if pref.last_email_sent:
             last_sent = pref.last_email_sent
@@ -142,266 +410,146 @@ def should_send_email_notification(user):
     return True
 
 
-def get_email_notification_content(user):
-    """
-    Get the content for an email notification (HTML formatted)
+DIGEST_SUBJECT = "Your Weekly Home Maintenance Reminder"
 
-    Args:
-        user: The user object
+# Stands in for the per-user body when the static digest shell is rendered
+DIGEST_BODY_MARKER = '<!-- digest body -->'
+
+
+@lru_cache(maxsize=None)
+def get_digest_shell():
+    """
+    Render the static part of the digest email (styles, header, call to action
+    and footer) once per process.
 
     Returns:
-        dict: Contains 'subject', 'html_message', 'tasks_data'
+        tuple of the HTML before and after the per-user body
     """
-    pref, _ = NotificationPreference.objects.get_or_create(user=user)
-    tasks_data = get_upcoming_and_overdue_tasks(user)
+    shell = render_to_string('owner/email/weekly_digest.html', {'body': mark_safe(DIGEST_BODY_MARKER)})
+    head, tail = shell.split(DIGEST_BODY_MARKER)
+    return head, tail
 
-    # Filter based on preferences
-    if not pref.email_overdue_tasks:
-        tasks_data['overdue'] = []
-    if not pref.email_due_soon_tasks:
-        tasks_data['due_today'] = []
-        tasks_data['due_soon'] = []
 
-    # Only include non-empty categories
-    has_content = any([tasks_data['overdue'], tasks_data['due_today'], tasks_data['due_soon']])
+@lru_cache(maxsize=None)
+def get_digest_body_template():
+    """
+    Compile the per-user digest body template once per process.
+    """
+    return get_template('owner/email/weekly_digest_body.html')
 
-    if not has_content:
-        return None
 
-    subject = "Your Weekly Home Maintenance Reminder"
-
-    # Build HTML email
-    user_name = user.first_name or user.email.split('@')[0]
-
-    html_message = f"""
-    <html>
-    <head>
-        <style>
-            body {{
-                font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', Roboto, 'Helvetica Neue', Arial, sans-serif;
-                line-height: 1.6;
-                color: #333;
-                max-width: 600px;
-                margin: 0;
-                padding: 0;
-            }}
-            .container {{
-                max-width: 600px;
-                margin: 0 auto;
-                background-color: #ffffff;
-            }}
-            .header {{
-                background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-                color: white;
-                padding: 30px 20px;
-                text-align: center;
-            }}
-            .header h1 {{
-                margin: 0;
-                font-size: 24px;
-            }}
-            .content {{
-                padding: 30px 20px;
-            }}
-            .greeting {{
-                font-size: 16px;
-                margin-bottom: 20px;
-            }}
-            .task-section {{
-                margin-bottom: 25px;
-            }}
-            .task-section h2 {{
-                font-size: 18px;
-                margin: 0 0 15px 0;
-                display: flex;
-                align-items: center;
-                gap: 10px;
-            }}
-            .overdue h2 {{
-                color: #dc2626;
-            }}
-            .due-today h2 {{
-                color: #ea580c;
-            }}
-            .due-soon h2 {{
-                color: #16a34a;
-            }}
-            .task-list {{
-                list-style: none;
-                padding: 0;
-                margin: 0;
-            }}
-            .task-item {{
-                background-color: #f9fafb;
-                border-left: 4px solid #e5e7eb;
-                padding: 12px 15px;
-                margin-bottom: 10px;
-                border-radius: 4px;
-            }}
-            .overdue .task-item {{
-                border-left-color: #dc2626;
-                background-color: #fef2f2;
-            }}
-            .due-today .task-item {{
-                border-left-color: #ea580c;
-                background-color: #fffbf0;
-            }}
-            .due-soon .task-item {{
-                border-left-color: #16a34a;
-                background-color: #f0fdf4;
-            }}
-            .task-title {{
-                font-weight: 600;
-                color: #1f2937;
-            }}
-            .task-date {{
-                font-size: 14px;
-                color: #6b7280;
-                margin-top: 5px;
-            }}
-            .cta {{
-                text-align: center;
-                margin: 30px 0;
-            }}
-            .cta-button {{
-                display: inline-block;
-                background-color: #667eea;
-                color: white;
-                padding: 12px 30px;
-                text-decoration: none;
-                border-radius: 6px;
-                font-weight: 600;
-                transition: background-color 0.2s;
-            }}
-            .cta-button:hover {{
-                background-color: #5568d3;
-            }}
-            .footer {{
-                background-color: #f3f4f6;
-                padding: 20px;
-                text-align: center;
-                font-size: 12px;
-                color: #6b7280;
-                border-top: 1px solid #e5e7eb;
-            }}
-            .footer-text {{
-                margin: 5px 0;
-            }}
-            .empty-message {{
-                text-align: center;
-                color: #6b7280;
-                padding: 20px;
-                font-style: italic;
-            }}
-        </style>
-    </head>
-    <body>
-        <div class="container">
-            <div class="header">
-                <h1>🏠 Homedex Home Maintenance</h1>
-                <p style="margin: 10px 0 0 0;">Weekly Task Reminder</p>
-            </div>
-
-            <div class="content">
-                <div class="greeting">
-                    <p>Hi {user_name},</p>
-                    <p>Here's your weekly update on home maintenance tasks. Stay on top of your home care!</p>
-                </div>
-    """
-
-    # Overdue tasks
-    if tasks_data['overdue']:
-        html_message += f"""
-                <div class="task-section overdue">
-                    <h2>🔴 Overdue Tasks ({len(tasks_data['overdue'])})</h2>
-                    <ul class="task-list">
-        """
-        for task in tasks_data['overdue']:
-            days_overdue = (timezone.now().date() - task.due_date).days
-            html_message += f"""
-                        <li class="task-item">
-                            <div class="task-title">{task.title}</div>
-                            <div class="task-date">Due: {task.due_date.strftime('%B %d, %Y')} ({days_overdue} days ago)</div>
-                        </li>
-            """
-        html_message += """
-                    </ul>
-                </div>
-        """
-
-    # Due today
-    if tasks_data['due_today']:
-        html_message += f"""
-                <div class="task-section due-today">
-                    <h2>🟡 Due Today ({len(tasks_data['due_today'])})</h2>
-                    <ul class="task-list">
-        """
-        for task in tasks_data['due_today']:
-            html_message += f"""
-                        <li class="task-item">
-                            <div class="task-title">{task.title}</div>
-                            <div class="task-date">Today!</div>
-                        </li>
-            """
-        html_message += """
-                    </ul>
-                </div>
-        """
-
-    # Due soon
-    if tasks_data['due_soon']:
-        html_message += f"""
-                <div class="task-section due-soon">
-                    <h2>🟢 Coming Up in Next 7 Days ({len(tasks_data['due_soon'])})</h2>
-                    <ul class="task-list">
-        """
-        for task in tasks_data['due_soon']:
-            days_until = (task.due_date - timezone.now().date()).days
-            html_message += f"""
-                        <li class="task-item">
-                            <div class="task-title">{task.title}</div>
-                            <div class="task-date">Due: {task.due_date.strftime('%B %d, %Y')} (in {days_until} days)</div>
-                        </li>
-            """
-        html_message += """
-                    </ul>
-                </div>
-        """
-
-    html_message += """
-                <div class="cta">
-                    <a href="https://app.homedex.app/account/notifications" class="cta-button">View All Tasks</a>
-                </div>
-
-                <p style="color: #6b7280; font-size: 14px;">
-                    Keep your home in great shape by staying on top of maintenance tasks. Log in to Homedex anytime to update task statuses, add notes, or create new tasks.
-                </p>
-            </div>
-
-            <div class="footer">
-                <p class="footer-text">© 2025 Homedex. All rights reserved.</p>
-                <p class="footer-text">Made with ❤️ in Boston</p>
-                <p class="footer-text">
-                    <a href="https://app.homedex.app/account/notifications" style="color: #667eea; text-decoration: none;">Manage Notification Preferences</a>
-                </p>
-            </div>
-        </div>
-    </body>
-    </html>
+def filter_email_tasks(tasks_data, pref):
+    """
+    Drop the task groups a user has turned off email notifications for.
     """
-
     return {
-        'subject': subject,
-        'html_message': html_message,
-        'tasks_data': tasks_data,
+        'overdue': tasks_data['overdue'] if pref.email_overdue_tasks else [],
+        'due_today': tasks_data['due_today'] if pref.email_due_soon_tasks else [],
+        'due_soon': tasks_data['due_soon'] if pref.email_due_soon_tasks else [],
     }
-def update_email_sent_timestamp(user):
+
+
+def render_email_digest(user, tasks_data, today):
     """
-    Update the last_email_sent timestamp for a user
+    Render a user's digest email from the cached shell and body template.
 
     Args:
         user: The user object
+        tasks_data: dict with 'overdue', 'due_today' and 'due_soon' task lists
+        today: datetime.date the digest is for
+
+    Returns:
+        str: HTML message
+    """
+    def rows(tasks):
+        return [
+            {'title': task.title, 'due_date': task.due_date, 'days': abs((task.due_date - today).days)}
+            for task in tasks
+        ]
+
+    head, tail = get_digest_shell()
+    body = get_digest_body_template().render({
+        'user_name': user.first_name or user.email.split('@')[0],
+        'overdue': rows(tasks_data['overdue']),
+        'due_today': rows(tasks_data['due_today']),
+        'due_soon': rows(tasks_data['due_soon']),
+    })
+    return head + body + tail
+
+
+def get_upcoming_and_overdue_tasks_for_users(user_ids, today):
+    """
+    Get the overdue, due-today and due-soon (next 7 days) open tasks of a
+    batch of users with one query.
+
+    Returns:
+        dict: user ID -> dict with 'overdue', 'due_today' and 'due_soon' lists
+    """
+    tasks_by_user = {user_id: {'overdue': [], 'due_today': [], 'due_soon': []} for user_id in user_ids}
+    tasks = Task.objects.filter(
+        user_id__in=user_ids,
+        status__in=OPEN_TASK_STATUSES,
+        due_date__lte=today + timedelta(days=7),
+    ).only('id', 'user_id', 'title', 'due_date').order_by('due_date')
+
+    for task in tasks:
+        if task.due_date < today:
+            group = 'overdue'
+        elif task.due_date == today:
+            group = 'due_today'
+        else:
+            group = 'due_soon'
+        tasks_by_user[task.user_id][group].append(task)
+
+    return tasks_by_user
+
+
+def send_email_digests(users):
     """
-    pref, _ = NotificationPreference.objects.get_or_create(user=user)
-    pref.last_email_sent = timezone.now()
-    pref.save()
+    Queue the digest email for every user in a batch who is due one. Preferences
+    and tasks for the whole batch are loaded up front, the emails go into the
+    outbox in one insert and last_email_sent is stamped in one update.
+
+    Args:
+        users: list of user objects
+
+    Returns:
+        dict with 'queued_count'
+    """
+    result = {'queued_count': 0}
+    now = timezone.now()
+    today = now.date()
+
+    prefs = get_notification_preferences([user.id for user in users])
+    users = [user for user in users if user.email and is_email_due(prefs[user.id], now)]
+    if not users:
+        return result
+
+    tasks_by_user = get_upcoming_and_overdue_tasks_for_users([user.id for user in users], today)
+    emails = []
+    queued_user_ids = []
+    for user in users:
+        tasks_data = filter_email_tasks(tasks_by_user[user.id], prefs[user.id])
+        if not any(tasks_data.values()):
+            continue
+
+        queued_user_ids.append(user.id)
+        emails.append(build_outbox_email(
+            f'digest:{user.id}:{today.isoformat()}',
+            DIGEST_SUBJECT,
+            "",  # Plain text fallback (empty since we're using HTML)
+            [user.email],
+            html_body=render_email_digest(user, tasks_data, today),
+        ))
+
+    if not emails:
+        return result
+
+    with transaction.atomic():
+        queue_emails(emails)
+        NotificationPreference.objects.filter(user_id__in=queued_user_ids).update(
+            last_email_sent=now, updated_at=now
+        )
+
+    result['queued_count'] = len(emails)
+    return result
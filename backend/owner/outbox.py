@@ -0,0 +1,211 @@
+"""
+Durable outbox for outgoing email.
+
+Callers queue EmailOutbox rows (inside their own transaction) instead of
+talking to the mail provider. A Celery task on the dedicated 'email' queue
+claims due rows with SELECT ... FOR UPDATE SKIP LOCKED, sends them over one
+backend connection per batch and reschedules failures with exponential
+backoff, so a slow or failing provider never holds up a request or a job.
+"""
+
+import logging
+from datetime import timedelta
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from .models import EmailOutbox
+
+logger = logging.getLogger(__name__)
+
+# Rows stuck in 'sending' this long belong to a worker that died mid-batch
+SENDING_TIMEOUT = timedelta(minutes=15)
+
+
+def build_outbox_email(idempotency_key, subject, body, to, html_body='', from_email=''):
+    """
+    Build an unsaved EmailOutbox row.
+
+    Args:
+        idempotency_key: unique key for this logical email
+        subject: subject line
+        body: plain text body
+        to: list of recipient addresses
+        html_body: optional HTML alternative
+        from_email: optional sender (blank = DEFAULT_FROM_EMAIL)
+    """
+    return EmailOutbox(
+        idempotency_key=idempotency_key,
+        subject=subject,
+        body=body,
+        html_body=html_body,
+        to=list(to),
+        from_email=from_email or '',
+    )
+
+
+def queue_emails(emails):
+    """
+    Insert outbox rows, skipping any whose idempotency key is already queued,
+    and wake the outbox worker once the current transaction commits.
+
+    Args:
+        emails: list of unsaved EmailOutbox objects (see build_outbox_email)
+    """
+    if not emails:
+        return
+
+    EmailOutbox.objects.bulk_create(emails, batch_size=500, ignore_conflicts=True)
+    transaction.on_commit(wake_outbox_worker)
+
+
+def queue_email(idempotency_key, subject, body, to, html_body='', from_email=''):
+    """
+    Queue one email. Arguments as for build_outbox_email.
+    """
+    queue_emails([build_outbox_email(idempotency_key, subject, body, to, html_body, from_email)])
+
+
+def wake_outbox_worker():
+    """
+    Ask the outbox worker to drain now rather than at its next scheduled run.
+    """
+    from .tasks import drain_email_outbox_task
+    try:
+        drain_email_outbox_task.delay()
+    except Exception as e:
+        # The periodic drain picks the mail up anyway
+        logger.error(f"Error queueing email outbox drain: {str(e)}", exc_info=True)
+
+
+def get_retry_delay(attempts):
+    """
+    Delay before the next attempt after a number of failed attempts:
+    EMAIL_OUTBOX_RETRY_DELAY seconds, doubling each time, capped at a day.
+    """
+    return timedelta(seconds=min(settings.EMAIL_OUTBOX_RETRY_DELAY * 2 ** (attempts - 1), 24 * 60 * 60))
+
+
+def claim_outbox_batch(batch_size):
+    """
+    Claim due outbox rows for this worker. Rows locked by another worker are
+    skipped, so several workers can drain the outbox side by side.
+
+    Returns:
+        list of claimed EmailOutbox objects
+    """
+    now = timezone.now()
+
+    with transaction.atomic():
+        emails = list(
+            EmailOutbox.objects.select_for_update(skip_locked=True).filter(
+                Q(status='pending', next_attempt_at__lte=now)
+                | Q(status='sending', updated_at__lt=now - SENDING_TIMEOUT)
+            ).order_by('next_attempt_at')[:batch_size]
+        )
+        EmailOutbox.objects.filter(id__in=[email.id for email in emails]).update(
+            status='sending', attempts=F('attempts') + 1, updated_at=now
+        )
+
+    for email in emails:
+        email.attempts += 1
+    return emails
+
+
+def record_failure(email, error, now, result):
+    """
+    Reschedule a claimed outbox row after a failed attempt with backoff, or
+    mark it failed once it has used up EMAIL_OUTBOX_MAX_ATTEMPTS.
+    """
+    email.last_error = str(error)
+    if email.attempts >= settings.EMAIL_OUTBOX_MAX_ATTEMPTS:
+        email.status = 'failed'
+        result['failed'] += 1
+        logger.error(f"Giving up on email {email.idempotency_key}: {str(error)}")
+    else:
+        email.status = 'pending'
+        email.next_attempt_at = now + get_retry_delay(email.attempts)
+        result['retried'] += 1
+
+
+def send_outbox_batch(emails):
+    """
+    Send claimed outbox rows over one mail backend connection and record the
+    outcome of each. If the connection can't be opened, every row in the
+    batch counts as a failed attempt.
+
+    Returns:
+        dict with 'sent', 'retried' and 'failed' counts
+    """
+    result = {'sent': 0, 'retried': 0, 'failed': 0}
+    now = timezone.now()
+    connection = get_connection()
+
+    try:
+        connection.open()
+    except Exception as e:
+        logger.error(f"Error opening mail connection for {len(emails)} outbox emails: {str(e)}")
+        for email in emails:
+            record_failure(email, e, now, result)
+    else:
+        try:
+            for email in emails:
+                message = EmailMultiAlternatives(
+                    subject=email.subject,
+                    body=email.body,
+                    from_email=email.from_email or settings.DEFAULT_FROM_EMAIL,
+                    to=email.to,
+                    connection=connection,
+                )
+                if email.html_body:
+                    message.attach_alternative(email.html_body, 'text/html')
+
+                try:
+                    message.send()
+                except Exception as e:
+                    record_failure(email, e, now, result)
+                    continue
+
+                email.status = 'sent'
+                email.sent_at = now
+                result['sent'] += 1
+        finally:
+            try:
+                connection.close()
+            except Exception as e:
+                logger.warning(f"Error closing mail connection: {str(e)}")
+
+    for email in emails:
+        email.updated_at = now
+    EmailOutbox.objects.bulk_update(
+        emails, ['status', 'next_attempt_at', 'last_error', 'sent_at', 'updated_at']
+    )
+    return result
+
+
+def drain_email_outbox(batch_size=None, max_batches=None):
+    """
+    Send due outbox mail, one claimed batch at a time, until none is left.
+
+    Args:
+        batch_size: rows per batch (defaults to EMAIL_OUTBOX_BATCH_SIZE)
+        max_batches: optional limit on the number of batches
+
+    Returns:
+        dict with 'sent', 'retried' and 'failed' counts
+    """
+    batch_size = batch_size or settings.EMAIL_OUTBOX_BATCH_SIZE
+    result = {'sent': 0, 'retried': 0, 'failed': 0}
+    batches = 0
+
+    while max_batches is None or batches < max_batches:
+        emails = claim_outbox_batch(batch_size)
+        if not emails:
+            break
+        batches += 1
+
+        for key, value in send_outbox_batch(emails).items():
+            result[key] += value
+
+    return result
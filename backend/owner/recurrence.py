@@ -0,0 +1,364 @@
+"""
+Recurrence engine for recurring tasks.
+
+Computes the next occurrence of a recurrence rule arithmetically instead of
+walking the calendar one day (or one month) at a time. The results match the
+historical day-walking implementation in recurring_tasks, including its quirks,
+so the engine can be dropped in without moving anyone's due dates.
+"""
+
+import threading
+from bisect import bisect_left
+from calendar import monthrange
+from collections import OrderedDict
+from datetime import date, timedelta
+
+# Maps the "week" part of a relative monthly pattern to an occurrence index
+WEEK_INDEX = {'first': 0, 'second': 1, 'third': 2, 'fourth': 3, 'fifth': 4, 'last': -1}
+
+# Weekday numbers used by relative monthly patterns. These have always been
+# compared against standard weekdays (0=Sunday), so 'Monday' resolves to the
+# day before Monday. Kept as-is so existing schedules do not shift.
+RELATIVE_WEEKDAYS = {'Sunday': 6, 'Monday': 0, 'Tuesday': 1, 'Wednesday': 2,
+                     'Thursday': 3, 'Friday': 4, 'Saturday': 5}
+
+# The legacy monthly search gave up after this many months
+MAX_MONTHS_SEARCHED = 365
+
+# Number of compiled rules kept in memory per process
+RULE_CACHE_SIZE = 10000
+
+
+def _next_month(year, month):
+    if month == 12:
+        return year + 1, 1
+    return year, month + 1
+
+
+def add_months(day, months):
+    """
+    Add calendar months to a date, landing on the last day of shorter months.
+
+    Args:
+        day: datetime.date
+        months: int number of months to add
+
+    Returns:
+        datetime.date object
+    """
+    month_index = day.month - 1 + months
+    year, month = day.year + month_index // 12, month_index % 12 + 1
+    return date(year, month, min(day.day, monthrange(year, month)[1]))
+
+
+def relative_day_of_month(year, month, week, day_name):
+    """
+    Get the specific date for a relative monthly pattern.
+
+    Args:
+        year: int
+        month: int (1-12)
+        week: str ('first', 'second', 'third', 'fourth', 'fifth', 'last')
+        day_name: str ('day', 'Sunday', 'Monday', ..., 'Saturday')
+
+    Returns:
+        datetime.date object or None if invalid
+    """
+    week_index = WEEK_INDEX.get(week)
+    if week_index is None:
+        return None
+
+    first_weekday, days_in_month = monthrange(year, month)
+
+    if day_name == 'day':
+        # Nth day of the month
+        day = days_in_month if week_index == -1 else week_index + 1
+        return date(year, month, day)
+
+    target = RELATIVE_WEEKDAYS.get(day_name)
+    if target is None:
+        return None
+
+    # Convert the standard weekday (0=Sunday) to date.weekday() (0=Monday)
+    weekday = (target + 6) % 7
+    first = 1 + (weekday - first_weekday) % 7
+
+    if week_index == -1:
+        day = first + 7 * ((days_in_month - first) // 7)
+    else:
+        day = first + 7 * week_index
+        if day > days_in_month:
+            return None
+
+    return date(year, month, day)
+
+
+class CompiledRule:
+    """
+    A task's recurrence rule parsed once into the values the engine needs:
+    a weekday bitmask (with the day offset for each starting weekday), the
+    selected days of the month, and the relative-week spec for monthly rules.
+    """
+
+    __slots__ = (
+        'pattern', 'interval', 'weekday_mask', 'weekday_offsets',
+        'month_days', 'month_days_sorted', 'relative',
+    )
+
+    def __init__(self, task):
+        self.pattern = task.recurrence_pattern
+        self.interval = task.recurrence_interval
+        self.weekday_mask = None
+        self.weekday_offsets = None
+        self.month_days = None
+        self.month_days_sorted = False
+        self.relative = None
+
+        if self.pattern == 'weekly':
+            self._compile_weekly(task.recurrence_days_of_week or [])
+        elif self.pattern == 'monthly':
+            self._compile_monthly(task.recurrence_days_of_month or [])
+
+    def _compile_weekly(self, days_of_week):
+        if not days_of_week:
+            # Falls back to the weekday of the current date, known only when evaluated
+            return
+
+        mask = 0
+        for day in days_of_week:
+            day = int(day)
+            if 0 <= day <= 6:
+                # Bit n is date.weekday() n (0=Monday); the rule stores 0=Sunday
+                mask |= 1 << ((day + 6) % 7)
+        self.weekday_mask = mask
+
+        if mask:
+            # Days until the nearest selected weekday (1-7) from each weekday
+            self.weekday_offsets = tuple(
+                next(k for k in range(1, 8) if mask & (1 << ((weekday + k) % 7)))
+                for weekday in range(7)
+            )
+
+    def _compile_monthly(self, days_of_month):
+        if not days_of_month:
+            # Falls back to the day of the current date, known only when evaluated
+            return
+
+        if isinstance(days_of_month[0], dict):
+            # Relative pattern: {"type": "relative", "week": "first", "day": "Monday"}
+            pattern = days_of_month[0]
+            week = pattern.get('week', 'first')
+            day_name = pattern.get('day', 'day')
+            if week in WEEK_INDEX and (day_name == 'day' or day_name in RELATIVE_WEEKDAYS):
+                self.relative = (week, day_name)
+            else:
+                self.relative = False
+            return
+
+        days = []
+        for day in days_of_month:
+            try:
+                day = int(day)
+            except ValueError:
+                # Not a day number; the legacy search skipped these too
+                continue
+            if 1 <= day <= 31:
+                days.append(day)
+
+        self.month_days = tuple(days)
+        # Days are tried in the order they were selected; when that order is
+        # ascending the first match is simply the smallest day that fits
+        self.month_days_sorted = all(a <= b for a, b in zip(days, days[1:]))
+
+    def next_after(self, current_date, has_previous=False):
+        """
+        Calculate the occurrence that follows current_date.
+
+        Args:
+            current_date: datetime.date of the latest instance (or the task's own due date)
+            has_previous: True if current_date comes from an existing instance
+
+        Returns:
+            datetime.date object for the next occurrence
+        """
+        if self.pattern == 'daily':
+            return current_date + timedelta(days=self.interval)
+
+        if self.pattern == 'weekly':
+            return self._next_weekly(current_date, has_previous)
+
+        if self.pattern == 'monthly':
+            candidate_date = current_date + timedelta(days=1)
+            if self.relative is not None:
+                return self._next_monthly_relative(candidate_date)
+            month_days = self.month_days
+            if month_days is None:
+                # Fallback to current day of month if none specified
+                month_days = (current_date.day,)
+            return self._next_monthly_absolute(candidate_date, month_days)
+
+        if self.pattern == 'yearly':
+            try:
+                return current_date.replace(year=current_date.year + self.interval)
+            except ValueError:
+                # Handle leap year edge case (Feb 29)
+                return current_date.replace(year=current_date.year + self.interval, day=28)
+
+        return current_date + timedelta(days=1)
+
+    def _next_weekly(self, current_date, has_previous):
+        interval = self.interval or 1
+        if interval < 1 or self.weekday_mask == 0:
+            return current_date + timedelta(days=1)
+
+        if self.weekday_offsets is None:
+            # No days selected: repeat on the current weekday
+            offset = 7
+        else:
+            offset = self.weekday_offsets[current_date.weekday()]
+
+        if has_previous and offset == 7:
+            # Only the current weekday is selected: skip ahead a whole interval
+            offset = 7 * interval
+
+        return current_date + timedelta(days=offset)
+
+    def _next_monthly_absolute(self, candidate_date, month_days):
+        if not month_days:
+            return candidate_date
+
+        year, month = candidate_date.year, candidate_date.month
+        days_in_month = monthrange(year, month)[1]
+
+        if self.month_days_sorted or len(month_days) == 1:
+            index = bisect_left(month_days, candidate_date.day)
+            if index < len(month_days) and month_days[index] <= days_in_month:
+                return date(year, month, month_days[index])
+            while True:
+                year, month = _next_month(year, month)
+                if month_days[0] <= monthrange(year, month)[1]:
+                    return date(year, month, month_days[0])
+
+        for day in month_days:
+            if candidate_date.day <= day <= days_in_month:
+                return date(year, month, day)
+
+        while True:
+            year, month = _next_month(year, month)
+            days_in_month = monthrange(year, month)[1]
+            for day in month_days:
+                if day <= days_in_month:
+                    return date(year, month, day)
+
+    def _next_monthly_relative(self, candidate_date):
+        if not self.relative:
+            return candidate_date
+
+        week, day_name = self.relative
+        year, month = candidate_date.year, candidate_date.month
+        target_date = relative_day_of_month(year, month, week, day_name)
+        if target_date and target_date >= candidate_date:
+            return target_date
+
+        # Only a missing fifth weekday can skip a month, so this ends quickly
+        for _ in range(MAX_MONTHS_SEARCHED - 1):
+            year, month = _next_month(year, month)
+            target_date = relative_day_of_month(year, month, week, day_name)
+            if target_date:
+                return target_date
+
+        return candidate_date
+
+
+class RuleCache:
+    """
+    Bounded LRU cache of compiled rules keyed by (task id, updated_at), so a
+    rule is parsed once per version no matter how often it is evaluated.
+    """
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._rules = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, task):
+        task_id = getattr(task, 'pk', None)
+        updated_at = getattr(task, 'updated_at', None)
+        if task_id is None or updated_at is None:
+            # Unsaved tasks have no stable version to cache under
+            return CompiledRule(task)
+
+        key = (task_id, updated_at)
+        with self._lock:
+            rule = self._rules.get(key)
+            if rule is not None:
+                self._rules.move_to_end(key)
+                return rule
+
+        rule = CompiledRule(task)
+
+        with self._lock:
+            self._rules[key] = rule
+            if len(self._rules) > self.maxsize:
+                self._rules.popitem(last=False)
+        return rule
+
+    def clear(self):
+        with self._lock:
+            self._rules.clear()
+
+
+# Shared by the nightly job, the occurrences endpoint and anything else using the engine
+rule_cache = RuleCache(RULE_CACHE_SIZE)
+
+
+def compile_rule(task):
+    """
+    Get the compiled recurrence rule for a task, reusing it while the task is unchanged.
+
+    Args:
+        task: Task object with recurrence settings
+
+    Returns:
+        CompiledRule object
+    """
+    return rule_cache.get(task)
+
+
+def next_occurrence(task, current_date, has_previous=False):
+    """
+    Calculate the occurrence that follows current_date for a task's recurrence rule.
+
+    Args:
+        task: Task object with recurrence settings
+        current_date: datetime.date of the latest instance (or the task's own due date)
+        has_previous: True if current_date comes from an existing instance
+
+    Returns:
+        datetime.date object for the next occurrence
+    """
+    return compile_rule(task).next_after(current_date, has_previous)
+
+
+def iter_occurrences(task, first_date, until):
+    """
+    Yield first_date and each occurrence that follows it, up to and including until.
+
+    Args:
+        task: Task object with recurrence settings
+        first_date: datetime.date of the first occurrence to yield
+        until: datetime.date after which to stop
+
+    Yields:
+        datetime.date objects in ascending order
+    """
+    rule = compile_rule(task)
+    current_date = first_date
+    while current_date <= until:
+        yield current_date
+
+        following_date = rule.next_after(current_date, has_previous=True)
+        if following_date <= current_date:
+            # A rule that does not move forward would repeat the same date forever
+            return
+        current_date = following_date
@@ -3,36 +3,28 @@ Utilities for handling recurring tasks.
 This module manages automatic creation and email notifications for recurring tasks.
 """
 
+import hashlib
 import logging
-from datetime import datetime, timedelta
+import threading
+from contextlib import contextmanager
+from datetime import timedelta
 from django.conf import settings
-from django.core.mail import send_mail
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Max, Q
 from django.utils import timezone
+from .fanout import filter_id_range, get_id_ranges
 from .models import Task, RecurringTaskInstance, TaskRegistration, HomeComponent
+from .events import queue_task_events
+from .notification_service import queue_notification_sync
+from .outbox import build_outbox_email, queue_emails
+from .recurrence import add_months, iter_occurrences, next_occurrence, relative_day_of_month
+from .template_matching import get_template_index, match_templates
 
 logger = logging.getLogger(__name__)
 
-
-def get_next_weekday(current_date, target_day_of_week):
-    """
-    Get the next occurrence of a specific day of the week.
-
-    Args:
-        current_date: datetime.date object
-        target_day_of_week: 0-6 (0=Sunday, 6=Saturday)
-
-    Returns:
-        datetime.date object for the next occurrence
-    """
-    current_dow = current_date.weekday()
-    # Convert Django weekday (0=Monday) to standard weekday (0=Sunday)
-    django_target = (target_day_of_week + 6) % 7
-
-    days_ahead = django_target - current_dow
-    if days_ahead <= 0:  # Target day already happened this week
-        days_ahead += 7
-
-    return current_date + timedelta(days=days_ahead)
+# Seconds to keep expanded recurring task occurrences in the cache
+OCCURRENCE_CACHE_TIMEOUT = 60 * 60
 
 
 def get_relative_day_of_month(year, month, week, day_name):
@@ -48,70 +40,7 @@ def get_relative_day_of_month(year, month, week, day_name):
     Returns:
         datetime.date object or None if invalid
     """
-    from calendar import monthcalendar, monthrange
-
-    # Get the calendar for the month
-    cal = monthcalendar(year, month)
-
-    if day_name == 'day':
-        # Find the Nth day of the month (1st, 2nd, etc.)
-        week_map = {'first': 0, 'second': 1, 'third': 2, 'fourth': 3, 'fifth': 4, 'last': -1}
-        week_index = week_map.get(week)
-
-        if week_index is None:
-            return None
-
-        # Get all days of the month
-        days = [day for week_cal in cal for day in week_cal if day != 0]
-
-        try:
-            if week_index == -1:
-                target_day = days[-1]
-            else:
-                target_day = days[week_index]
-            return datetime(year, month, target_day).date()
-        except IndexError:
-            return None
-    else:
-        # Find the Nth occurrence of a specific weekday
-        day_map = {'Sunday': 6, 'Monday': 0, 'Tuesday': 1, 'Wednesday': 2,
-                   'Thursday': 3, 'Friday': 4, 'Saturday': 5}
-        target_weekday = day_map.get(day_name)
-
-        if target_weekday is None:
-            return None
-
-        week_map = {'first': 0, 'second': 1, 'third': 2, 'fourth': 3, 'fifth': 4, 'last': -1}
-        week_index = week_map.get(week)
-
-        if week_index is None:
-            return None
-
-        # Find all occurrences of the target weekday in this month
-        occurrences = []
-        for week_cal in cal:
-            # week_cal is [Monday, Tuesday, ..., Sunday]
-            # We need to map to standard weekday (0=Sunday)
-            for day_idx, day in enumerate(week_cal):
-                if day == 0:
-                    continue
-                django_dow = day_idx
-                standard_dow = (django_dow + 1) % 7
-
-                if standard_dow == target_weekday:
-                    occurrences.append(day)
-
-        if not occurrences:
-            return None
-
-        try:
-            if week_index == -1:
-                target_day = occurrences[-1]
-            else:
-                target_day = occurrences[week_index]
-            return datetime(year, month, target_day).date()
-        except IndexError:
-            return None
+    return relative_day_of_month(year, month, week, day_name)
 
 
 def calculate_next_due_date(task):
@@ -124,8 +53,6 @@ def calculate_next_due_date(task):
     Returns:
         datetime.date object for the next due date, or None if recurrence should stop
     """
-    today = timezone.now().date()
-
     # Find the latest instance of this recurring task
     latest_instance = RecurringTaskInstance.objects.filter(
         recurring_task=task
@@ -136,118 +63,137 @@ def calculate_next_due_date(task):
     else:
         current_date = task.due_date
 
-    # Start from tomorrow or later
-    candidate_date = current_date + timedelta(days=1)
-
-    if task.recurrence_pattern == 'daily':
-        # Add the interval
-        return candidate_date + timedelta(days=task.recurrence_interval - 1)
-
-    elif task.recurrence_pattern == 'weekly':
-        # Find the next occurrence of the selected days
-        days_of_week = task.recurrence_days_of_week or []
-
-        if not days_of_week:
-            # Fallback to current day of week if none specified
-            days_of_week = [(current_date.weekday() + 1) % 7]  # Convert Django weekday to standard
-
-        # Convert to standard weekday format if needed
-        days_of_week = [int(d) for d in days_of_week]
-
-        # Find the next matching day
-        search_date = candidate_date
-        weeks_searched = 0
-        max_weeks = (task.recurrence_interval or 1) * 2 + 2
-
-        while weeks_searched < max_weeks:
-            django_dow = search_date.weekday()
-            standard_dow = (django_dow + 1) % 7
-
-            if standard_dow in days_of_week:
-                # Check if this is the right week (interval)
-                if latest_instance:
-                    # Calculate weeks difference
-                    days_diff = (search_date - current_date).days
-                    if days_diff > 0 and days_diff % (7 * (task.recurrence_interval or 1)) < 7:
-                        return search_date
-                else:
-                    return search_date
-
-            search_date += timedelta(days=1)
-            if search_date.weekday() == (current_date.weekday()):
-                weeks_searched += 1
-
-        # Fallback - return the first matching day of the interval
-        for i in range(7 * (task.recurrence_interval or 1)):
-            check_date = candidate_date + timedelta(days=i)
-            standard_dow = (check_date.weekday() + 1) % 7
-            if standard_dow in days_of_week:
-                return check_date
-
-        return candidate_date
-
-    elif task.recurrence_pattern == 'monthly':
-        days_of_month = task.recurrence_days_of_month or []
-
-        if not days_of_month:
-            # Fallback to current day of month if none specified
-            days_of_month = [current_date.day]
-
-        search_date = candidate_date
-
-        for _ in range(365):  # Search up to a year
-            current_month_start = datetime(search_date.year, search_date.month, 1).date()
-
-            if isinstance(days_of_month[0], dict):
-                # Relative pattern: {"type": "relative", "week": "first", "day": "Monday"}
-                pattern = days_of_month[0]
-                target_date = get_relative_day_of_month(
-                    search_date.year,
-                    search_date.month,
-                    pattern.get('week', 'first'),
-                    pattern.get('day', 'day')
-                )
-
-                if target_date and target_date >= search_date:
-                    return target_date
-            else:
-                # Absolute pattern: list of days [1, 15, 20]
-                for day in days_of_month:
-                    try:
-                        target_date = datetime(search_date.year, search_date.month, int(day)).date()
-                        if target_date >= search_date:
-                            return target_date
-                    except ValueError:
-                        # Invalid day for this month (e.g., Feb 30)
-                        continue
-
-            # Move to next month
-            if search_date.month == 12:
-                search_date = datetime(search_date.year + 1, 1, 1).date()
-            else:
-                search_date = datetime(search_date.year, search_date.month + 1, 1).date()
+    return next_occurrence(task, current_date, has_previous=latest_instance is not None)
+
 
-        return candidate_date
+def within_recurrence_end(task, due_date):
+    """Check whether a due date falls on or before the task's recurrence end date."""
+    return task.recurrence_end_date is None or due_date <= task.recurrence_end_date
 
-    elif task.recurrence_pattern == 'yearly':
-        # Add years
+
+def refresh_next_occurrence_date(task):
+    """
+    Recompute and store next_occurrence_date for a task.
+    Called when a recurring task is created or its recurrence rule changes.
+
+    Args:
+        task: Task object
+
+    Returns:
+        datetime.date object for the stored next occurrence, or None
+    """
+    next_date = None
+
+    if task.is_recurring and task.parent_task_id is None:
         try:
-            return current_date.replace(year=current_date.year + task.recurrence_interval)
-        except ValueError:
-            # Handle leap year edge case (Feb 29)
-            return current_date.replace(year=current_date.year + task.recurrence_interval, day=28)
+            next_date = calculate_next_due_date(task)
+        except Exception as e:
+            # A malformed rule can never be scheduled; don't fail the save over it
+            logger.error(f"Error calculating next occurrence for task {task.id}: {str(e)}")
+        if next_date is not None and not within_recurrence_end(task, next_date):
+            next_date = None
 
-    return candidate_date
+    if next_date != task.next_occurrence_date:
+        Task.objects.filter(pk=task.pk).update(next_occurrence_date=next_date)
+        task.next_occurrence_date = next_date
 
+    return next_date
 
 
-def create_recurring_task_instances(dry_run=False):
+def get_due_recurring_tasks(today):
+    """
+    Get recurring tasks whose next occurrence is on or before today.
+
+    Args:
+        today: datetime.date object
+
+    Returns:
+        QuerySet of recurring parent tasks
+    """
+    return Task.objects.filter(
+        is_recurring=True,
+        parent_task__isnull=True,
+        next_occurrence_date__lte=today,
+    ).select_related('user')
+
+
+def get_recurring_task_shards(today, shard_size):
+    """
+    Split the due recurring tasks into primary key ranges of at most shard_size tasks.
+
+    Args:
+        today: datetime.date object
+        shard_size: maximum number of due tasks per shard
+
+    Returns:
+        list of [start_id, end_id) pairs; end_id is None for the last shard
+    """
+    return get_id_ranges(get_due_recurring_tasks(today), shard_size)
+
+
+def build_recurring_instance(task, due_date, status='pending'):
+    """Build (without saving) a new instance of a recurring task."""
+    return Task(
+        user=task.user,
+        title=task.title,
+        description=task.description,
+        category=task.category,
+        priority=task.priority,
+        status=status,
+        due_date=due_date,
+        is_recurring=False,
+        parent_task=task
+    )
+
+
+def plan_recurring_task(task, today, catch_up=False, collapse=False):
+    """
+    Work out which occurrences of a due recurring task to create.
+
+    Args:
+        task: recurring parent Task with next_occurrence_date set
+        today: date to catch up to
+        catch_up: If True, every occurrence missed up to today instead of one
+        collapse: With catch_up, only the latest missed occurrence
+
+    Returns:
+        (due dates oldest first, following next_occurrence_date) pair; the
+        due dates are empty when the recurrence has ended
+    """
+    next_due_date = task.next_occurrence_date
+
+    # Check if recurrence should end
+    if not within_recurrence_end(task, next_due_date):
+        return [], None
+
+    if catch_up:
+        until = min(today, task.recurrence_end_date or today)
+        due_dates = list(iter_occurrences(task, next_due_date, until))
+        if collapse:
+            due_dates = due_dates[-1:]
+    else:
+        due_dates = [next_due_date]
+
+    following_date = next_occurrence(task, due_dates[-1], has_previous=True)
+    if not within_recurrence_end(task, following_date):
+        following_date = None
+    return due_dates, following_date
+
+
+def create_recurring_task_instances(dry_run=False, batch_size=None, id_range=None, catch_up=False, collapse=False):
     """
     Create instances of recurring tasks that are due.
     This should be called by a scheduled task (celery beat or cron job).
 
     Args:
         dry_run: If True, only report what would be created without creating
+        batch_size: If set, process due tasks in chunks of this size with bulk
+                    queries and queue the notification emails for a worker
+        id_range: Optional [start_id, end_id) pair limiting the run to one shard;
+                  end_id may be None for an open-ended range
+        catch_up: If True, create every occurrence missed up to today in one pass
+                  (implies batch mode); superseded occurrences are created dismissed
+        collapse: With catch_up, only create the latest missed occurrence
 
     Returns:
         dict with 'created' count and 'errors' list
@@ -255,46 +201,82 @@ def create_recurring_task_instances(dry_run=False):
     today = timezone.now().date()
     result = {'created': 0, 'errors': []}
 
-    # Find all recurring tasks
-    recurring_tasks = Task.objects.filter(is_recurring=True, parent_task__isnull=True)
+    # Only recurring tasks whose next occurrence has come due
+    recurring_tasks = get_due_recurring_tasks(today)
+
+    if id_range:
+        recurring_tasks = filter_id_range(recurring_tasks, id_range)
+
+    if catch_up and not batch_size:
+        batch_size = settings.RECURRING_TASK_BATCH_SIZE
+
+    if batch_size:
+        last_id = 0
+        while True:
+            chunk = list(recurring_tasks.filter(id__gt=last_id).order_by('id')[:batch_size])
+            if not chunk:
+                break
+            create_recurring_task_instance_batch(
+                chunk,
+                dry_run=dry_run,
+                result=result,
+                catch_up=catch_up,
+                collapse=collapse,
+            )
+            last_id = chunk[-1].id
+        return result
 
     for task in recurring_tasks:
-        try:
-            # Calculate the next due date based on the task's recurrence settings
-            next_due_date = calculate_next_due_date(task)
+        create_recurring_task_instance(task, dry_run=dry_run, result=result)
 
-            if next_due_date is None:
-                continue
+    return result
 
-            # Check if we should create a new instance
-            should_create = False
 
-            if next_due_date <= today:
-                # Check if recurrence should end
-                if task.recurrence_end_date is None or next_due_date <= task.recurrence_end_date:
-                    should_create = True
+def create_recurring_task_instance(task, dry_run=False, result=None, catch_up=False, collapse=False):
+    """
+    Create the due instances of one recurring task in their own transaction.
+    Also used to retry the tasks of a failed batch chunk one by one, so an
+    error is only reported against the task that caused it.
 
-            if should_create:
-                if not dry_run:
-                    # Dismiss previous active tasks of the same parent task
-                    previous_instances = Task.objects.filter(
-                        parent_task=task,
-                        status__in=['pending', 'in-progress']
-                    )
-                    previous_instances.update(status='dismissed')
-
-                    # Create new task instance
-                    new_task = Task.objects.create(
-                        user=task.user,
-                        title=task.title,
-                        description=task.description,
-                        category=task.category,
-                        priority=task.priority,
-                        status='pending',
-                        due_date=next_due_date,
-                        is_recurring=False,
-                        parent_task=task
+    Args:
+        task: recurring parent Task object with next_occurrence_date set
+        dry_run: If True, only report what would be created without creating
+        result: dict with 'created' count and 'errors' list to add to
+        catch_up: If True, create every occurrence missed up to today instead of one
+        collapse: With catch_up, only create the latest missed occurrence
+
+    Returns:
+        dict with 'created' count and 'errors' list
+    """
+    if result is None:
+        result = {'created': 0, 'errors': []}
+
+    try:
+        due_dates, following_date = plan_recurring_task(task, timezone.now().date(), catch_up, collapse)
+
+        if not due_dates:
+            if not dry_run:
+                Task.objects.filter(pk=task.pk).update(next_occurrence_date=None)
+            return result
+
+        if not dry_run:
+            with transaction.atomic():
+                # Dismiss previous active tasks of the same parent task
+                previous_ids = list(Task.objects.filter(
+                    parent_task=task,
+                    status__in=['pending', 'in-progress']
+                ).values_list('id', flat=True))
+                Task.objects.filter(id__in=previous_ids).update(status='dismissed')
+                queue_notification_sync(previous_ids)
+
+                # Missed occurrences are superseded by the latest one straight away
+                for due_date in due_dates:
+                    new_task = build_recurring_instance(
+                        task,
+                        due_date,
+                        status='pending' if due_date == due_dates[-1] else 'dismissed',
                     )
+                    new_task.save()
 
                     # Create tracking record
                     RecurringTaskInstance.objects.create(
@@ -302,12 +284,57 @@ def create_recurring_task_instances(dry_run=False):
                         instance_task=new_task
                     )
 
-                    result['created'] += 1
+                Task.objects.filter(pk=task.pk).update(next_occurrence_date=following_date)
+
+                # Email notification for the latest occurrence, sent by the outbox worker once this commits
+                email = build_recurring_task_email(task.user, new_task) if task.user else None
+                if email:
+                    queue_emails([email])
 
-                    # Send email notification
-                    send_recurring_task_email(task.user, new_task)
-                else:
-                    result['created'] += 1
+        result['created'] += len(due_dates)
+
+    except Exception as e:
+        result['errors'].append({
+            'task_id': task.id,
+            'task_title': task.title,
+            'error': str(e)
+        })
+
+    return result
+
+
+def create_recurring_task_instance_batch(tasks, dry_run=False, result=None, catch_up=False, collapse=False):
+    """
+    Create instances for a chunk of due recurring tasks with a fixed number of queries:
+    one UPDATE to dismiss previous instances, one INSERT each for the new tasks,
+    their tracking records and their emails, and one UPDATE to advance
+    next_occurrence_date. The emails go into the outbox in the same transaction.
+
+    Args:
+        tasks: list of recurring parent Task objects with next_occurrence_date set
+        dry_run: If True, only report what would be created without creating
+        result: dict with 'created' count and 'errors' list to add to
+        catch_up: If True, create every occurrence missed up to today instead of one
+        collapse: With catch_up, only create the latest missed occurrence
+
+    Returns:
+        dict with 'created' count and 'errors' list
+    """
+    if result is None:
+        result = {'created': 0, 'errors': []}
+
+    today = timezone.now().date()
+    planned = []  # (task, due dates) pairs to create, oldest first
+    advanced = []  # parents whose next_occurrence_date changes
+
+    for task in tasks:
+        try:
+            due_dates, following_date = plan_recurring_task(task, today, catch_up, collapse)
+
+            if due_dates:
+                planned.append((task, due_dates))
+            task.next_occurrence_date = following_date
+            advanced.append(task)
 
         except Exception as e:
             result['errors'].append({
@@ -316,24 +343,82 @@ def create_recurring_task_instances(dry_run=False):
                 'error': str(e)
             })
 
+    if dry_run:
+        result['created'] += sum(len(due_dates) for _, due_dates in planned)
+        return result
+
+    new_tasks = []
+
+    try:
+        with transaction.atomic():
+            if planned:
+                # Dismiss previous active tasks of the same parent tasks
+                dismissed_ids = list(Task.objects.filter(
+                    parent_task__in=[task for task, _ in planned],
+                    status__in=['pending', 'in-progress']
+                ).values_list('id', flat=True))
+                Task.objects.filter(id__in=dismissed_ids).update(status='dismissed')
+
+                # Missed occurrences are superseded by the latest one straight away
+                new_tasks = Task.objects.bulk_create([
+                    build_recurring_instance(
+                        task,
+                        due_date,
+                        status='pending' if due_date == due_dates[-1] else 'dismissed',
+                    )
+                    for task, due_dates in planned
+                    for due_date in due_dates
+                ])
+
+                RecurringTaskInstance.objects.bulk_create([
+                    RecurringTaskInstance(recurring_task=new_task.parent_task, instance_task=new_task)
+                    for new_task in new_tasks
+                ])
+
+                # Bulk writes skip the Task signals, so sync their notifications here
+                queue_notification_sync(dismissed_ids + [new_task.id for new_task in new_tasks])
+                queue_task_events(new_tasks)
+
+                # Only the latest occurrence of each task is announced
+                emails = [
+                    build_recurring_task_email(new_task.parent_task.user, new_task)
+                    for new_task in new_tasks
+                    if new_task.status == 'pending' and new_task.parent_task.user
+                ]
+                queue_emails([email for email in emails if email])
+
+            if advanced:
+                Task.objects.bulk_update(advanced, ['next_occurrence_date'])
+
+    except Exception as e:
+        # Retry the chunk one task at a time so only the failing ones are reported.
+        # The tasks are reloaded since their next_occurrence_date was advanced above.
+        logger.warning(f"Recurring task chunk of {len(advanced)} failed, retrying one by one: {str(e)}")
+        for task in Task.objects.filter(id__in=[task.id for task in advanced]).order_by('id'):
+            create_recurring_task_instance(task, result=result, catch_up=catch_up, collapse=collapse)
+        return result
+
+    result['created'] += len(new_tasks)
     return result
 
 
-def send_recurring_task_email(user, task):
+def build_recurring_task_email(user, task):
     """
-    Send an email notification to the user about a newly created recurring task.
+    Build the outbox email telling a user about a newly created recurring task.
 
     Args:
         user: User object
         task: Task object (the newly created instance)
+
+    Returns:
+        unsaved EmailOutbox object, or None if the user has no email address
     """
-    try:
-        if not user.email:
-            return
+    if not user.email:
+        return None
 
-        subject = f"New Task: {task.title}"
+    subject = f"New Task: {task.title}"
 
-        message = f"""
+    message = f"""
 Hi {user.first_name or user.username},
 
 A new task has been automatically created from your recurring task schedule:
@@ -350,40 +435,33 @@ You can view and manage this task in your Homedex dashboard.
 
 Best regards,
 The Homedex Team
-        """
+    """
 
-        html_message = f"""
+    html_message = f"""
 <html>
-    <body>
-        <p>Hi {user.first_name or user.username},</p>
-        <p>A new task has been automatically created from your recurring task schedule:</p>
+<body>
+    <p>Hi {user.first_name or user.username},</p>
+    <p>A new task has been automatically created from your recurring task schedule:</p>
 
-        <div style="border-left: 4px solid #007bff; padding-left: 15px; margin: 20px 0;">
-            <p><strong>Task:</strong> {task.title}</p>
-            <p><strong>Category:</strong> {task.category}</p>
-            <p><strong>Priority:</strong> <span style="text-transform: capitalize;">{task.priority}</span></p>
-            <p><strong>Due Date:</strong> {task.due_date.strftime('%B %d, %Y')}</p>
+    <div style="border-left: 4px solid #007bff; padding-left: 15px; margin: 20px 0;">
+        <p><strong>Task:</strong> {task.title}</p>
+        <p><strong>Category:</strong> {task.category}</p>
+        <p><strong>Priority:</strong> <span style="text-transform: capitalize;">{task.priority}</span></p>
+        <p><strong>Due Date:</strong> {task.due_date.strftime('%B %d, %Y')}</p>
 
-            {f'<p><strong>Description:</strong></p><p>{task.description}</p>' if task.description else ''}
-        </div>
+        {f'<p><strong>Description:</strong></p><p>{task.description}</p>' if task.description else ''}
+    </div>
 
-        <p>You can view and manage this task in your <a href="https://app.homedex.app/tasks">Homedex dashboard</a>.</p>
+    <p>You can view and manage this task in your <a href="https://app.homedex.app/tasks">Homedex dashboard</a>.</p>
 
-        <p>Best regards,<br>The Homedex Team</p>
-    </body>
+    <p>Best regards,<br>The Homedex Team</p>
+</body>
 </html>
-        """
-
-        send_mail(
-            subject,
-            message,
-            settings.DEFAULT_FROM_EMAIL,
-            [user.email],
-            html_message=html_message,
-            fail_silently=True
-        )
-    except Exception as e:
-        print(f"Error sending email for task {task.id}: {str(e)}")
+    """
+
+    return build_outbox_email(
+        f'recurring-task:{task.id}', subject, message, [user.email], html_body=html_message
+    )
 
 
 def get_recurring_task_stats(user):
@@ -411,99 +489,605 @@ def get_recurring_task_stats(user):
     }
 
 
-def create_tasks_from_registrations(registrations=None):
+def get_recurring_task_occurrences(home, start_date, end_date):
+    """
+    Get the occurrences of a home's recurring tasks between two dates.
+    Instances that already exist are returned as they are; future occurrences are
+    expanded from each task's recurrence rule in memory without creating rows.
+    Expansions are cached per home and rule version.
+
+    Args:
+        home: Home object
+        start_date: datetime.date of the first day to include
+        end_date: datetime.date of the last day to include
+
+    Returns:
+        list of occurrence dicts ordered by due date
+    """
+    recurring_tasks = list(
+        Task.objects.filter(home=home, is_recurring=True, parent_task__isnull=True).order_by('id')
+    )
+    if not recurring_tasks:
+        return []
+
+    # Any edit to a rule bumps updated_at, and each new instance moves next_occurrence_date
+    rule_version = hashlib.md5(''.join(
+        f'{task.id}:{task.updated_at.isoformat()}:{task.next_occurrence_date};'
+        for task in recurring_tasks
+    ).encode()).hexdigest()
+    cache_key = f'task-occurrences:{home.id}:{rule_version}:{start_date}:{end_date}'
+
+    virtual = cache.get(cache_key)
+    if virtual is None:
+        virtual = []
+        for task in recurring_tasks:
+            if task.next_occurrence_date is None:
+                continue
+
+            until = min(end_date, task.recurrence_end_date or end_date)
+            try:
+                due_dates = [
+                    due_date for due_date in iter_occurrences(task, task.next_occurrence_date, until)
+                    if due_date >= start_date
+                ]
+            except Exception as e:
+                logger.error(f"Error expanding occurrences for task {task.id}: {str(e)}")
+                continue
+
+            virtual.extend(
+                {
+                    'task_id': task.id,
+                    'instance_id': None,
+                    'title': task.title,
+                    'category': task.category,
+                    'priority': task.priority,
+                    'status': 'pending',
+                    'due_date': due_date.isoformat(),
+                    'is_virtual': True,
+                }
+                for due_date in due_dates
+            )
+        cache.set(cache_key, virtual, OCCURRENCE_CACHE_TIMEOUT)
+
+    instances = Task.objects.filter(
+        parent_task__in=recurring_tasks,
+        due_date__gte=start_date,
+        due_date__lte=end_date,
+    )
+
+    materialized = [
+        {
+            'task_id': instance.parent_task_id,
+            'instance_id': instance.id,
+            'title': instance.title,
+            'category': instance.category,
+            'priority': instance.priority,
+            'status': instance.status,
+            'due_date': instance.due_date.isoformat(),
+            'is_virtual': False,
+        }
+        for instance in instances
+    ]
+
+    return sorted(materialized + virtual, key=lambda o: (o['due_date'], o['task_id']))
+
+
+def register_component_templates(component):
+    """
+    Create TaskRegistrations for every active TaskTemplate that matches a
+    HomeComponent, then generate any tasks that are due for the new ones.
+
+    Args:
+        component: HomeComponent object
+
+    Returns:
+        list of newly created TaskRegistration objects
+    """
+    logger.info(f"Creating task registrations for HomeComponent: {component.name} ({component.category})")
+
+    created_registrations = []
+    matched_count = 0
+
+    # Find templates that match this component (only its category is searched)
+    for template in match_templates(component):
+        matched_count += 1
+        logger.info(f"  ✓ Matched template: {template.title}")
+
+        # Create a TaskRegistration if it doesn't already exist
+        registration, created_reg = TaskRegistration.objects.get_or_create(
+            home_component=component,
+            task_template=template,
+            defaults={
+                'user': component.user,
+                'frequency_months': None,  # Will use template default
+                'is_active': True,
+            }
+        )
+
+        if created_reg:
+            logger.info(f"    → Created new TaskRegistration (ID: {registration.id})")
+            created_registrations.append(registration)
+        else:
+            logger.info(f"    → TaskRegistration already exists (ID: {registration.id})")
+
+    if matched_count == 0:
+        logger.info(f"  No matching templates found for {component.name}")
+    else:
+        logger.info(f"Total matches: {matched_count} templates")
+
+    # Immediately generate tasks for newly created registrations
+    if created_registrations:
+        logger.info(f"Generating initial tasks for {len(created_registrations)} new registrations")
+        result = create_tasks_from_registrations(
+            registrations=TaskRegistration.objects.filter(id__in=[r.id for r in created_registrations])
+        )
+        logger.info(f"Task generation result: {result}")
+
+    return created_registrations
+
+
+def register_components_bulk(components, create_tasks=True):
+    """
+    Bulk version of register_component_templates for many components at once:
+    match them against the template index, bulk create the missing
+    TaskRegistrations and generate the initial tasks for them.
+
+    Args:
+        components: list of saved HomeComponent objects
+        create_tasks: also generate initial tasks for the new registrations
+
+    Returns:
+        dict with 'matched', 'registrations', 'tasks' and 'errors' counts
+    """
+    result = {'matched': 0, 'registrations': 0, 'tasks': 0, 'errors': 0}
+    if not components:
+        return result
+
+    template_index = get_template_index()
+    existing = set(
+        TaskRegistration.objects.filter(home_component__in=components)
+        .values_list('home_component_id', 'task_template_id')
+    )
+
+    new_registrations = []
+    for component in components:
+        for template in template_index.match(component):
+            result['matched'] += 1
+            if (component.id, template.id) not in existing:
+                new_registrations.append(TaskRegistration(
+                    home_component=component,
+                    task_template=template,
+                    user=component.user,
+                    home=component.home,
+                ))
+
+    # ignore_conflicts covers registrations created concurrently since the lookup
+    TaskRegistration.objects.bulk_create(new_registrations, batch_size=1000, ignore_conflicts=True)
+    result['registrations'] = len(new_registrations)
+
+    if new_registrations and create_tasks:
+        task_result = create_tasks_from_registrations(
+            registrations=TaskRegistration.objects.filter(
+                home_component_id__in={r.home_component_id for r in new_registrations},
+                last_task_generated__isnull=True,  # Never generated a task yet
+            )
+        )
+        result['tasks'] = task_result['created']
+        result['errors'] = task_result['errors']
+
+    return result
+
+
+def rematch_components(components):
+    """
+    Bring the TaskRegistrations of some components in line with the current
+    template catalog: create registrations for new matches and deactivate the
+    ones whose template no longer matches. Inactive registrations are left
+    alone, since they may have been switched off by the user.
+
+    Args:
+        components: list of saved HomeComponent objects
+
+    Returns:
+        dict with 'created', 'deactivated' and 'tasks' counts
+    """
+    result = {'created': 0, 'deactivated': 0, 'tasks': 0}
+    if not components:
+        return result
+
+    template_index = get_template_index()
+    matched = {
+        (component.id, template.id)
+        for component in components
+        for template in template_index.match(component)
+    }
+    existing = {
+        (component_id, template_id): (registration_id, is_active)
+        for registration_id, component_id, template_id, is_active in TaskRegistration.objects.filter(
+            home_component__in=components
+        ).values_list('id', 'home_component_id', 'task_template_id', 'is_active')
+    }
+
+    deactivate = [reg_id for pair, (reg_id, active) in existing.items() if active and pair not in matched]
+
+    components_by_id = {component.id: component for component in components}
+    new_registrations = [
+        TaskRegistration(
+            home_component_id=component_id,
+            task_template_id=template_id,
+            user_id=components_by_id[component_id].user_id,
+            home_id=components_by_id[component_id].home_id,
+        )
+        for component_id, template_id in matched - existing.keys()
+    ]
+
+    with transaction.atomic():
+        # ignore_conflicts covers registrations created concurrently since the lookup
+        TaskRegistration.objects.bulk_create(new_registrations, batch_size=1000, ignore_conflicts=True)
+        result['deactivated'] = TaskRegistration.objects.filter(id__in=deactivate).update(
+            is_active=False, updated_at=timezone.now()
+        )
+    result['created'] = len(new_registrations)
+
+    if new_registrations:
+        task_result = create_tasks_from_registrations(
+            registrations=TaskRegistration.objects.filter(
+                home_component_id__in={r.home_component_id for r in new_registrations},
+                last_task_generated__isnull=True,  # Never generated a task yet
+            )
+        )
+        result['tasks'] = task_result['created']
+
+    return result
+
+
+def rematch_category(category, batch_size=None):
+    """
+    Re-match every HomeComponent in one category against the template catalog,
+    in primary key chunks. Used after templates in that category change, so the
+    cost follows the size of the category rather than the whole component table.
+
+    Args:
+        category: HomeComponent category
+        batch_size: Components per chunk (defaults to TASK_REGISTRATION_BATCH_SIZE)
+
+    Returns:
+        dict with 'components', 'created', 'deactivated' and 'tasks' counts
+    """
+    batch_size = batch_size or settings.TASK_REGISTRATION_BATCH_SIZE
+    result = {'components': 0, 'created': 0, 'deactivated': 0, 'tasks': 0}
+    components = HomeComponent.objects.filter(category=category).order_by('id')
+
+    last_id = 0
+    while True:
+        chunk = list(components.filter(id__gt=last_id)[:batch_size])
+        if not chunk:
+            break
+        last_id = chunk[-1].id
+
+        result['components'] += len(chunk)
+        for key, value in rematch_components(chunk).items():
+            result[key] += value
+
+    logger.info(f"Re-matched {category} components: {result}")
+    return result
+
+
+# Work collected by the defer_* context managers for the current thread
+_deferred = threading.local()
+
+
+@contextmanager
+def _collect(name, empty):
+    """
+    Collect deferred work under the given name for the duration of the block.
+    Yields the collection; nested blocks share the outer one.
+    """
+    pending = getattr(_deferred, name, None)
+    if pending is not None:
+        yield pending
+        return
+
+    setattr(_deferred, name, empty)
+    try:
+        yield empty
+    finally:
+        setattr(_deferred, name, None)
+
+
+def queue_category_rematch(categories):
+    """
+    Re-match the components of the given categories once the current
+    transaction commits, in Celery when TASK_REGISTRATION_ASYNC is set.
+    Inside defer_category_rematch() the categories are collected instead.
+    """
+    categories = {category for category in categories if category}
+    pending = getattr(_deferred, 'categories', None)
+    if pending is not None:
+        pending.update(categories)
+        return
+
+    def run():
+        from .tasks import rematch_category_task
+        for category in sorted(categories):
+            if not settings.TASK_REGISTRATION_ASYNC:
+                rematch_category(category)
+                continue
+            try:
+                rematch_category_task.delay(category)
+            except Exception as e:
+                logger.error(f"Error queueing re-match of {category} components: {str(e)}", exc_info=True)
+                rematch_category(category)
+
+    if categories:
+        transaction.on_commit(run)
+
+
+@contextmanager
+def defer_category_rematch():
+    """
+    Collect the categories queued for re-matching while a batch of template
+    changes (such as an import) runs, and queue each of them once at the end.
+    Clearing the yielded set drops the collected work.
+    """
+    outer = getattr(_deferred, 'categories', None) is not None
+    with _collect('categories', set()) as categories:
+        yield categories
+
+    if not outer:
+        queue_category_rematch(categories)
+
+
+def register_components_by_id(component_ids, batch_size=None):
+    """
+    Match components against the template catalog, create their registrations
+    and initial tasks in chunks, then clear their registrations_pending flag.
+
+    Args:
+        component_ids: IDs of saved HomeComponents
+        batch_size: Components per chunk (defaults to TASK_REGISTRATION_BATCH_SIZE)
+
+    Returns:
+        dict with 'components', 'matched', 'registrations', 'tasks' and 'errors' counts
+    """
+    batch_size = batch_size or settings.TASK_REGISTRATION_BATCH_SIZE
+    result = {'components': 0, 'matched': 0, 'registrations': 0, 'tasks': 0, 'errors': 0}
+    component_ids = sorted(set(component_ids))
+
+    for start in range(0, len(component_ids), batch_size):
+        chunk_ids = component_ids[start:start + batch_size]
+        components = list(HomeComponent.objects.filter(id__in=chunk_ids).select_related('user', 'home'))
+
+        result['components'] += len(components)
+        for key, value in register_components_bulk(components).items():
+            result[key] += value
+        HomeComponent.objects.filter(id__in=chunk_ids, registrations_pending=True).update(
+            registrations_pending=False
+        )
+
+    logger.info(f"Registered {result['components']} components: {result}")
+    return result
+
+
+def queue_component_registration(component_ids):
+    """
+    Register components with their matching templates once the current
+    transaction commits, in one Celery task when TASK_REGISTRATION_ASYNC is set.
+    """
+    component_ids = list(component_ids)
+    if not component_ids:
+        return
+
+    def run():
+        from .tasks import register_components_task
+        if not settings.TASK_REGISTRATION_ASYNC:
+            register_components_by_id(component_ids)
+            return
+        try:
+            register_components_task.delay(component_ids)
+        except Exception as e:
+            logger.error(f"Error queueing registration of {len(component_ids)} components: {str(e)}", exc_info=True)
+            register_components_by_id(component_ids)
+
+    transaction.on_commit(run)
+
+
+def deferred_component_registrations():
+    """
+    Get the list collecting new component IDs inside defer_component_registration(),
+    or None outside one.
+    """
+    return getattr(_deferred, 'components', None)
+
+
+@contextmanager
+def defer_component_registration():
+    """
+    Bulk-ingest mode for HomeComponents: the per-row registration signal only
+    records the IDs of components created inside the block, and they are all
+    matched and registered in one bulk pass at the end.
+    Clearing the yielded list drops the collected work.
+    """
+    outer = deferred_component_registrations() is not None
+    with _collect('components', []) as component_ids:
+        yield component_ids
+
+    if not outer:
+        queue_component_registration(component_ids)
+
+
+def create_tasks_from_registrations(registrations=None, batch_size=None):
     """
     Create tasks from TaskRegistrations that are due.
 
+    A registration is due once next_task_due (the latest task's due date plus
+    the frequency in calendar months) has arrived. Registrations are processed
+    in primary key chunks. For each chunk the latest due date of every
+    (user, component, title) is fetched in one grouped query, new tasks are
+    bulk created and the registrations' tracking fields are bulk updated.
+
     Args:
         registrations: QuerySet of TaskRegistrations to process.
-                      If None, processes all active registrations.
+                      If None, processes the active registrations that are due.
+        batch_size: Registrations per chunk (defaults to TASK_REGISTRATION_BATCH_SIZE)
 
     Returns:
         Dictionary with 'created', 'skipped', 'errors', and 'total' counts.
     """
     if registrations is None:
-        # Get all active task registrations
-        registrations = TaskRegistration.objects.filter(is_active=True).select_related(
-            'task_template', 'home_component', 'user'
-        )
-    else:
-        # Ensure proper prefetching for efficiency
-        registrations = registrations.select_related(
-            'task_template', 'home_component', 'user'
-        )
+        # Only active registrations that are due, or have never been scheduled
+        registrations = get_due_registrations(timezone.now().date())
+
+    # Ensure proper prefetching for efficiency
+    registrations = registrations.select_related(
+        'task_template', 'home_component', 'user'
+    ).order_by('id')
+    batch_size = batch_size or settings.TASK_REGISTRATION_BATCH_SIZE
+
+    result = {'created': 0, 'skipped': 0, 'errors': 0}
+    last_id = 0
+
+    while True:
+        chunk = list(registrations.filter(id__gt=last_id)[:batch_size])
+        if not chunk:
+            break
+        last_id = chunk[-1].id
+
+        create_tasks_from_registration_batch(chunk, result)
+
+    result['total'] = result['created'] + result['skipped'] + result['errors']
+    return result
+
 
-    created_count = 0
-    skipped_count = 0
-    error_count = 0
+def get_due_registrations(today):
+    """
+    Get the active TaskRegistrations whose next task is due, plus those not yet
+    scheduled (next_task_due is null until the first run looks at them).
+
+    Args:
+        today: datetime.date
+
+    Returns:
+        QuerySet of TaskRegistrations
+    """
+    return TaskRegistration.objects.filter(is_active=True).filter(
+        Q(next_task_due__lte=today) | Q(next_task_due__isnull=True)
+    )
+
+
+def get_latest_registration_due_dates(registrations):
+    """
+    Get the latest task due date for each registration's (user, component, title).
+
+    Args:
+        registrations: list of TaskRegistration objects with task_template loaded
+
+    Returns:
+        dict mapping (user_id, home_component_id, title) to the latest due date
+    """
+    latest_tasks = Task.objects.filter(
+        home_component_id__in={r.home_component_id for r in registrations},
+        title__in={r.task_template.title for r in registrations},
+    ).values('user_id', 'home_component_id', 'title').annotate(latest_due_date=Max('due_date'))
+
+    return {
+        (task['user_id'], task['home_component_id'], task['title']): task['latest_due_date']
+        for task in latest_tasks
+    }
+
+
+def create_tasks_from_registration_batch(registrations, result):
+    """
+    Create the due tasks for one chunk of registrations.
+
+    Args:
+        registrations: list of TaskRegistration objects with related objects loaded
+        result: dict of 'created', 'skipped' and 'errors' counts to add to
+    """
+    today = timezone.now().date()
+    now = timezone.now()
+    latest_due_dates = get_latest_registration_due_dates(registrations)
+
+    new_tasks = []
+    generated = []  # registrations that get a new task
+    rescheduled = []  # registrations not due yet whose next_task_due was wrong or unknown
+    reasons = []
 
     for registration in registrations:
         try:
             # Get the effective frequency (override or template default)
             frequency_months = registration.get_frequency_months()
+            key = (registration.user_id, registration.home_component_id, registration.task_template.title)
 
-            # Find the most recent task for this registration
-            recent_task = Task.objects.filter(
-                user=registration.user,
-                home_component=registration.home_component,
-                title=registration.task_template.title,
-            ).order_by('-due_date').first()
-
-            should_create = False
-            reason = ""
+            # The most recent task for this registration
+            latest_due_date = latest_due_dates.get(key)
 
-            if recent_task is None:
+            if latest_due_date is None:
                 # No previous task exists
-                should_create = True
                 reason = "No previous task found"
             else:
-                # Check if previous task is older than frequency
-                days_elapsed = (timezone.now().date() - recent_task.due_date).days
-                days_threshold = frequency_months * 30  # Approximate month as 30 days
-
-                if days_elapsed >= days_threshold:
-                    should_create = True
-                    reason = f"Last task due on {recent_task.due_date} ({days_elapsed} days ago)"
-
-            if should_create:
-                # Create new task
-                new_due_date = timezone.now().date() + timedelta(days=7)
-
-                task = Task.objects.create(
-                    user=registration.user,
-                    title=registration.task_template.title,
-                    description=registration.task_template.description,
-                    category=registration.task_template.category,
-                    priority='medium',  # Default priority from template could be added if needed
-                    status='pending',
-                    due_date=new_due_date,
-                    home_component=registration.home_component,
-                    is_recurring=False,
-                )
-
-                # Update registration tracking
-                registration.last_task_generated = timezone.now().date()
-                registration.next_task_due = new_due_date
-                registration.save()
-
-                created_count += 1
-                logger.info(
-                    f"✓ Created task '{task.title}' for {registration.home_component.name} "
-                    f"({reason})"
-                )
-            else:
-                skipped_count += 1
+                # The next task is due a whole number of calendar months after the last one
+                next_task_due = add_months(latest_due_date, frequency_months)
+
+                if today < next_task_due:
+                    result['skipped'] += 1
+                    if registration.next_task_due != next_task_due:
+                        registration.next_task_due = next_task_due
+                        registration.updated_at = now
+                        rescheduled.append(registration)
+                    continue
+                reason = f"Last task due on {latest_due_date} ({(today - latest_due_date).days} days ago)"
+
+            new_due_date = today + timedelta(days=7)
+            new_tasks.append(Task(
+                user=registration.user,
+                title=registration.task_template.title,
+                description=registration.task_template.description,
+                category=registration.task_template.category,
+                priority='medium',  # Default priority from template could be added if needed
+                status='pending',
+                due_date=new_due_date,
+                home_component=registration.home_component,
+                is_recurring=False,
+            ))
+
+            # Later registrations for the same component and title see this task
+            latest_due_dates[key] = new_due_date
+
+            # Update registration tracking
+            registration.last_task_generated = today
+            registration.next_task_due = add_months(new_due_date, frequency_months)
+            registration.updated_at = now
+            generated.append(registration)
+            reasons.append(reason)
 
         except Exception as e:
-            error_count += 1
+            result['errors'] += 1
             logger.error(
                 f"✗ Error creating task for registration {registration.id}: {str(e)}",
                 exc_info=True
             )
 
-    return {
-        'created': created_count,
-        'skipped': skipped_count,
-        'errors': error_count,
-        'total': created_count + skipped_count + error_count,
-    }
+    if not new_tasks and not rescheduled:
+        return
+
+    try:
+        with transaction.atomic():
+            Task.objects.bulk_create(new_tasks)
+            TaskRegistration.objects.bulk_update(
+                generated + rescheduled, ['last_task_generated', 'next_task_due', 'updated_at']
+            )
+            # Bulk writes skip the Task signals, so sync their notifications here
+            queue_notification_sync([task.id for task in new_tasks])
+            queue_task_events(new_tasks)
+    except Exception as e:
+        result['errors'] += len(new_tasks)
+        logger.error(f"✗ Error creating tasks for {len(new_tasks)} registrations: {str(e)}", exc_info=True)
+        return
+
+    result['created'] += len(new_tasks)
+    for task, registration, reason in zip(new_tasks, generated, reasons):
+        logger.info(
+            f"✓ Created task '{task.title}' for {registration.home_component.name} "
+            f"({reason})"
+        )
@@ -155,11 +155,11 @@ class HomeComponentSerializer(serializers.ModelSerializer):
             'id', 'name', 'category', 'brand', 'model', 'sku',
             'year_installed', 'purchase_date', 'purchase_price',
             'warranty_expiration', 'location', 'location_fk', 'location_name', 'condition', 'notes',
-            'last_maintenance', 'next_maintenance', 'created_at',
+            'last_maintenance', 'next_maintenance', 'registrations_pending', 'created_at',
             'updated_at', 'images', 'attachments', 'documents', 'image_files',
             'attachment_files'
         ]
-        read_only_fields = ['created_at', 'updated_at', 'location_name']
+        read_only_fields = ['registrations_pending', 'created_at', 'updated_at', 'location_name']
 
     def get_documents(self, obj):
         """Get documents associated with this component"""
@@ -223,10 +223,10 @@ class TaskSerializer(serializers.ModelSerializer):
             'id', 'title', 'description', 'category', 'priority',
             'status', 'due_date', 'is_recurring', 'recurrence_pattern',
             'recurrence_interval', 'recurrence_days_of_week', 'recurrence_days_of_month',
-            'recurrence_end_date', 'parent_task',
+            'recurrence_end_date', 'parent_task', 'next_occurrence_date',
             'created_at', 'updated_at', 'home_component', 'home_component_name'
         ]
-        read_only_fields = ['created_at', 'updated_at', 'parent_task', 'home_component_name']
+        read_only_fields = ['created_at', 'updated_at', 'parent_task', 'next_occurrence_date', 'home_component_name']
 
 
 class DocumentDetailSerializer(serializers.ModelSerializer):
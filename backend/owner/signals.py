@@ -1,65 +1,271 @@
 import logging
-from django.db.models.signals import post_save
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
 from django.dispatch import receiver
-from .models import HomeComponent, TaskTemplate, TaskRegistration
-from .recurring_tasks import create_tasks_from_registrations
+from .events import queue_task_events
+from .models import HomeComponent, Notification, NotificationPreference, Task, TaskRegistration, TaskTemplate
+from .notification_service import OPEN_TASK_STATUSES, adjust_notification_counter, queue_notification_sync
+from .recurring_tasks import (
+    deferred_component_registrations,
+    queue_category_rematch,
+    refresh_next_occurrence_date,
+    register_component_templates,
+)
+from .template_matching import invalidate_template_index
 
 logger = logging.getLogger(__name__)
 
 
+@receiver(pre_save, sender=HomeComponent)
+def mark_registrations_pending(sender, instance, **kwargs):
+    """
+    Flag new components as awaiting template matching when that runs in Celery,
+    so the API can report it until the task finishes.
+    """
+    if instance._state.adding and settings.TASK_REGISTRATION_ASYNC:
+        instance.registrations_pending = True
+
+
 @receiver(post_save, sender=HomeComponent)
 def create_task_registrations(sender, instance, created, **kwargs):
     """
     When a HomeComponent is created, find all matching TaskTemplates
     and create TaskRegistration records for them. Then immediately generate
     any tasks that are due.
+
+    With TASK_REGISTRATION_ASYNC this is queued to Celery once the
+    transaction commits, keeping it out of the request. Inside
+    defer_component_registration() it is left to the batch.
     """
     if not created:
         # Only run on creation, not on update
         return
 
-    logger.info(f"Creating task registrations for HomeComponent: {instance.name} ({instance.category})")
-
-    # Get all active task templates
-    active_templates = TaskTemplate.objects.filter(is_active=True)
-
-    created_registrations = []
-    matched_count = 0
-
-    # Find templates that match this component
-    for template in active_templates:
-        if template.matches_component(instance):
-            matched_count += 1
-            logger.info(f"  ✓ Matched template: {template.title}")
-
-            # Create a TaskRegistration if it doesn't already exist
-            registration, created_reg = TaskRegistration.objects.get_or_create(
-                home_component=instance,
-                task_template=template,
-                defaults={
-                    'user': instance.user,
-                    'frequency_months': None,  # Will use template default
-                    'is_active': True,
-                }
-            )
-
-            if created_reg:
-                logger.info(f"    → Created new TaskRegistration (ID: {registration.id})")
-                created_registrations.append(registration)
-            else:
-                logger.info(f"    → TaskRegistration already exists (ID: {registration.id})")
-
-    if matched_count == 0:
-        logger.info(f"  No matching templates found for {instance.name}")
-    else:
-        logger.info(f"Total matches: {matched_count} templates")
-
-    # Immediately generate tasks for newly created registrations
-    if created_registrations:
-        logger.info(f"Generating initial tasks for {len(created_registrations)} new registrations")
-        result = create_tasks_from_registrations(
-            registrations=TaskRegistration.objects.filter(id__in=[r.id for r in created_registrations])
-        )
-        logger.info(f"Task generation result: {result}")
+    pending = deferred_component_registrations()
+    if pending is not None:
+        # Bulk ingest: registered together when the batch ends
+        pending.append(instance.pk)
+        return
+
+    if not settings.TASK_REGISTRATION_ASYNC:
+        register_component_templates(instance)
+        return
+
+    component_id = instance.pk
+
+    def enqueue():
+        from .tasks import register_component_templates_task
+        try:
+            register_component_templates_task.delay(component_id)
+        except Exception as e:
+            logger.error(f"Error queueing task registrations for component {component_id}: {str(e)}", exc_info=True)
+            register_component_templates_task(component_id)
+
+    transaction.on_commit(enqueue)
+
+
+@receiver(post_save, sender=TaskTemplate)
+@receiver(post_delete, sender=TaskTemplate)
+def refresh_template_index(sender, instance, **kwargs):
+    """
+    Rebuild the template matching index after any change to the catalog.
+    """
+    invalidate_template_index()
+
+
+# TaskTemplate fields that decide which components a template matches
+TEMPLATE_MATCHING_FIELDS = ('category', 'match_keywords', 'match_brands', 'is_active')
+
+
+@receiver(pre_save, sender=TaskTemplate)
+def remember_template_changes(sender, instance, **kwargs):
+    """
+    Keep the stored values of fields whose changes need follow-up work after save.
+    """
+    instance._previous_values = (
+        TaskTemplate.objects.filter(pk=instance.pk).values(
+            'frequency_months', *TEMPLATE_MATCHING_FIELDS
+        ).first()
+        if instance.pk else None
+    )
+
+
+@receiver(post_save, sender=TaskTemplate)
+def reschedule_template_registrations(sender, instance, created, **kwargs):
+    """
+    When a template's frequency changes, clear next_task_due on registrations
+    that use it so the registration job reschedules them from task history.
+    """
+    previous = getattr(instance, '_previous_values', None)
+    if created or not previous or previous['frequency_months'] == instance.frequency_months:
+        return
+
+    instance.registrations.filter(frequency_months__isnull=True).update(next_task_due=None)
+
+
+@receiver(post_save, sender=TaskTemplate)
+def rematch_template_components(sender, instance, created, **kwargs):
+    """
+    When a template is added or its matching rules change, re-match the
+    components of the affected categories (the old one as well, if the
+    category changed) after commit.
+    """
+    previous = getattr(instance, '_previous_values', None)
+    if created or not previous:
+        if instance.is_active:
+            queue_category_rematch([instance.category])
+        return
+
+    if any(previous[field] != getattr(instance, field) for field in TEMPLATE_MATCHING_FIELDS):
+        queue_category_rematch([previous['category'], instance.category])
+
+
+@receiver(pre_save, sender=TaskRegistration)
+def reschedule_registration(sender, instance, update_fields=None, **kwargs):
+    """
+    Clear next_task_due when a registration's frequency override changes.
+    Partial saves (update_fields) are left alone.
+    """
+    if instance._state.adding or update_fields is not None:
+        return
+
+    previous_frequency = TaskRegistration.objects.filter(pk=instance.pk).values_list(
+        'frequency_months', flat=True
+    ).first()
+    if previous_frequency != instance.frequency_months:
+        instance.next_task_due = None
+
+
+@receiver(post_save, sender=Task)
+def update_next_occurrence_date(sender, instance, created, update_fields=None, **kwargs):
+    """
+    Keep the materialized next_occurrence_date of a recurring task in step
+    with its recurrence rule whenever the task is saved.
+    """
+    if update_fields is not None and set(update_fields) <= {'next_occurrence_date'}:
+        return
+
+    if not instance.is_recurring and instance.next_occurrence_date is None:
+        # Plain tasks and recurring instances have nothing to schedule
+        return
+
+    refresh_next_occurrence_date(instance)
+
+
+# Task fields that decide a task's in-app notification
+TASK_NOTIFICATION_FIELDS = ('due_date', 'status', 'title')
+
+
+@receiver(pre_save, sender=Task)
+def remember_task_changes(sender, instance, update_fields=None, **kwargs):
+    """
+    Keep the stored values of the fields notifications depend on.
+    """
+    if instance._state.adding or (
+        update_fields is not None and not set(update_fields) & set(TASK_NOTIFICATION_FIELDS)
+    ):
+        instance._previous_values = None
+        return
+
+    instance._previous_values = Task.objects.filter(pk=instance.pk).values(*TASK_NOTIFICATION_FIELDS).first()
+
+
+@receiver(post_save, sender=Task)
+def sync_task_notifications_on_save(sender, instance, created, **kwargs):
+    """
+    When a task is created or its due date, status or title changes, update
+    its in-app notifications after commit instead of waiting for the daily job.
+    """
+    previous = getattr(instance, '_previous_values', None)
+    if created or (previous and any(previous[field] != getattr(instance, field) for field in TASK_NOTIFICATION_FIELDS)):
+        queue_notification_sync([instance.pk])
+
+
+@receiver(post_save, sender=Task)
+def publish_task_saved(sender, instance, **kwargs):
+    """
+    Tell the user's open event streams that a task changed.
+    """
+    queue_task_events([instance])
+
+
+@receiver(post_delete, sender=Task)
+def publish_task_deleted(sender, instance, **kwargs):
+    """
+    Tell the user's open event streams that a task was deleted.
+    """
+    queue_task_events([instance], action='deleted')
+
 
+@receiver(pre_save, sender=Notification)
+def remember_notification_state(sender, instance, **kwargs):
+    """
+    Keep the stored values the unread counters depend on.
+    """
+    instance._previous_values = (
+        Notification.objects.filter(pk=instance.pk).values('user_id', 'notification_type', 'is_read').first()
+        if instance.pk else None
+    )
+
+
+@receiver(post_save, sender=Notification)
+def count_saved_notification(sender, instance, created, **kwargs):
+    """
+    Move the user's unread counters when a notification is created, read or
+    changes type. Bulk writes recount instead (see defer_notification_recount).
+    """
+    previous = getattr(instance, '_previous_values', None)
+    before = (
+        (previous['user_id'], previous['notification_type'])
+        if previous and not previous['is_read'] else None
+    )
+    after = (instance.user_id, instance.notification_type) if not instance.is_read else None
+    if before == after:
+        return
+
+    if before:
+        adjust_notification_counter(*before, -1)
+    if after:
+        adjust_notification_counter(*after, 1)
+
+
+@receiver(post_delete, sender=Notification)
+def count_deleted_notification(sender, instance, **kwargs):
+    """
+    Take a deleted unread notification off the user's counters.
+    """
+    if not instance.is_read:
+        adjust_notification_counter(instance.user_id, instance.notification_type, -1)
+
+
+@receiver(pre_save, sender=NotificationPreference)
+def remember_preference_changes(sender, instance, **kwargs):
+    """
+    Keep the stored in-app notification settings.
+    """
+    instance._previous_values = (
+        NotificationPreference.objects.filter(pk=instance.pk).values(
+            'inapp_overdue_tasks', 'inapp_due_soon_tasks'
+        ).first()
+        if instance.pk else None
+    )
+
+
+@receiver(post_save, sender=NotificationPreference)
+def sync_notifications_on_preference_change(sender, instance, created, **kwargs):
+    """
+    When a user turns in-app notifications on or off, resync the notifications
+    of their open tasks.
+    """
+    previous = getattr(instance, '_previous_values', None)
+    if created or not previous:
+        return
+    if (previous['inapp_overdue_tasks'], previous['inapp_due_soon_tasks']) == (
+        instance.inapp_overdue_tasks, instance.inapp_due_soon_tasks
+    ):
+        return
 
+    queue_notification_sync(
+        Task.objects.filter(user_id=instance.user_id, status__in=OPEN_TASK_STATUSES).values_list('id', flat=True)
+    )
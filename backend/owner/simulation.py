@@ -0,0 +1,141 @@
+"""
+Time-travel simulator for the daily scheduling pipeline.
+
+Replays the nightly jobs one virtual day at a time with django.utils.timezone.now
+frozen at each simulated midnight, recording rows created, queries issued and
+time spent per stage. Meant to run against a throwaway database populated by
+owner.workload (see the simulate_scheduling command).
+"""
+
+import random
+import time
+from datetime import datetime, time as dt_time, timedelta, timezone as dt_timezone
+from unittest import mock
+from celery import current_app
+from django.test.utils import override_settings
+from .models import Notification, RecurringTaskInstance, Task
+from .notification_service import refresh_boundary_notifications, sync_task_notifications
+from .recurring_tasks import create_recurring_task_instances, create_tasks_from_registrations
+from .workload import count_queries
+
+
+def frozen_clock(day):
+    """
+    Patch django.utils.timezone.now to return midnight UTC of the given date.
+    """
+    moment = datetime.combine(day, dt_time.min, tzinfo=dt_timezone.utc)
+    return mock.patch('django.utils.timezone.now', return_value=moment)
+
+
+def _table_counts():
+    return {
+        'tasks': Task.objects.count(),
+        'recurring_instances': RecurringTaskInstance.objects.count(),
+        'notifications': Notification.objects.count(),
+    }
+
+
+def complete_due_tasks(day, completion_rate, rng):
+    """
+    Mark a share of the open tasks due on day as completed, standing in for
+    users working through their lists.
+
+    Returns:
+        int number of tasks completed
+    """
+    if completion_rate <= 0:
+        return 0
+
+    task_ids = list(
+        Task.objects.filter(due_date=day, status__in=['pending', 'in-progress'])
+        .values_list('id', flat=True)
+    )
+    completed_ids = [task_id for task_id in task_ids if rng.random() < completion_rate]
+    completed = Task.objects.filter(id__in=completed_ids).update(status='completed')
+    sync_task_notifications(completed_ids)
+    return completed
+
+
+def simulate_day(day, batch_size=None):
+    """
+    Run every nightly stage for one simulated day.
+
+    Returns:
+        dict with each stage's result, queries and seconds, plus the rows added that day
+    """
+    # Nightly stages in the order the beat schedule runs them
+    pipeline = [
+        ('recurring_instances', lambda: create_recurring_task_instances(batch_size=batch_size)),
+        ('registration_tasks', create_tasks_from_registrations),
+        ('notifications', refresh_boundary_notifications),
+    ]
+
+    before = _table_counts()
+    stages = {}
+
+    with frozen_clock(day):
+        for name, run in pipeline:
+            with count_queries() as queries:
+                start = time.perf_counter()
+                result = run()
+                seconds = time.perf_counter() - start
+
+            stages[name] = {
+                'result': result,
+                'queries': len(queries),
+                'seconds': round(seconds, 3),
+            }
+
+    after = _table_counts()
+    return {
+        'date': day.isoformat(),
+        'stages': stages,
+        'rows': {
+            'tasks': after['tasks'] - before['tasks'],
+            'recurring_instances': after['recurring_instances'] - before['recurring_instances'],
+            'notifications': after['notifications'] - before['notifications'],
+        },
+        'queries': sum(stage['queries'] for stage in stages.values()),
+        'seconds': round(sum(stage['seconds'] for stage in stages.values()), 3),
+    }
+
+
+def simulate_days(start_date, days, batch_size=None, completion_rate=0.0, seed=None, on_day=None):
+    """
+    Replay the nightly pipeline for a number of consecutive virtual days.
+
+    Celery tasks queued along the way (such as recurring task emails) run
+    eagerly and mail goes to the in-memory backend, so nothing leaves the process.
+
+    Args:
+        start_date: datetime.date of the first simulated day
+        days: number of days to simulate
+        batch_size: batch size for create_recurring_task_instances (None = row mode)
+        completion_rate: share of each day's due tasks users complete before the next night
+        seed: optional random seed for task completion
+        on_day: optional callback receiving each day's stats as it finishes
+
+    Returns:
+        list of per-day stats dicts
+    """
+    rng = random.Random(seed)
+    results = []
+    always_eager = current_app.conf.task_always_eager
+    current_app.conf.task_always_eager = True
+
+    try:
+        with override_settings(EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend'):
+            for offset in range(days):
+                day = start_date + timedelta(days=offset)
+                stats = simulate_day(day, batch_size=batch_size)
+
+                with frozen_clock(day):
+                    stats['completed'] = complete_due_tasks(day, completion_rate, rng)
+
+                results.append(stats)
+                if on_day:
+                    on_day(stats)
+    finally:
+        current_app.conf.task_always_eager = always_eager
+
+    return results
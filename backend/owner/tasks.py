@@ -2,16 +2,25 @@
 Celery tasks for the owner app
 """
 import logging
-from celery import shared_task
+from celery import chord, shared_task
 from django.contrib.auth import get_user_model
-from django.core.mail import send_mail
 from django.conf import settings
-from .recurring_tasks import create_recurring_task_instances, create_tasks_from_registrations
+from django.utils import timezone
+from .fanout import filter_id_range, get_id_ranges, merge_results
+from .models import HomeComponent
+from .outbox import drain_email_outbox
+from .recurring_tasks import (
+    create_recurring_task_instances,
+    create_tasks_from_registrations,
+    get_recurring_task_shards,
+    register_component_templates,
+    register_components_by_id,
+    rematch_category,
+)
 from .notification_service import (
-    create_notifications_for_user,
-    should_send_email_notification,
-    get_email_notification_content,
-    update_email_sent_timestamp
+    archive_notifications,
+    refresh_boundary_notifications,
+    send_email_digests,
 )
 
 User = get_user_model()
@@ -19,74 +28,152 @@ logger = logging.getLogger(__name__)
 
 
 @shared_task
-def create_recurring_task_instances_task():
+def create_recurring_task_instances_task(catch_up=False, collapse=False):
     """
     Celery task to create recurring task instances.
     Scheduled to run daily at 12:00 AM UTC.
+
+    Splits the due recurring tasks into primary key shards and fans them out to
+    the worker pool as a chord; merge_recurring_task_results combines the results.
+    Pass catch_up=True (and optionally collapse=True) to recover from scheduler downtime.
     """
-    result = create_recurring_task_instances(dry_run=False)
-    return result
+    today = timezone.now().date()
+    shards = get_recurring_task_shards(today, settings.RECURRING_TASK_SHARD_SIZE)
+
+    if not shards:
+        return {'created': 0, 'errors': []}
+
+    chord(
+        create_recurring_task_instances_shard_task.s(id_range, catch_up=catch_up, collapse=collapse)
+        for id_range in shards
+    )(merge_recurring_task_results.s())
+
+    logger.info(f"Queued {len(shards)} recurring task shards")
+    return {'shards': len(shards)}
+
+
+@shared_task
+def create_recurring_task_instances_shard_task(id_range, catch_up=False, collapse=False):
+    """
+    Celery task to create recurring task instances for one [start_id, end_id) shard.
+    """
+    return create_recurring_task_instances(
+        dry_run=False,
+        batch_size=settings.RECURRING_TASK_BATCH_SIZE,
+        id_range=id_range,
+        catch_up=catch_up,
+        collapse=collapse,
+    )
+
+
+@shared_task
+def merge_recurring_task_results(results):
+    """
+    Chord callback that merges the shard results of create_recurring_task_instances_task.
+    """
+    merged = merge_results([{'created': 0, 'errors': []}, *results])
+
+    logger.info(
+        f"Recurring task instances created: {merged['created']} "
+        f"({len(merged['errors'])} errors)"
+    )
+    return merged
+
+
+def fan_out_over_users(shard_task, job, *args):
+    """
+    Stream user IDs into shards of USER_SHARD_SIZE users and run shard_task on
+    each one in the worker pool as a chord; merge_shard_results combines the results.
+
+    Args:
+        shard_task: Celery task taking a [start_id, end_id) user range and *args
+        job: job name used when logging the merged result
+
+    Returns:
+        dict with the number of shards queued
+    """
+    shards = get_id_ranges(User.objects.all(), settings.USER_SHARD_SIZE)
+    if shards:
+        chord(shard_task.s(id_range, *args) for id_range in shards)(merge_shard_results.s(job))
+
+    logger.info(f"Queued {len(shards)} {job} shards")
+    return {'shards': len(shards)}
+
+
+@shared_task
+def merge_shard_results(results, job):
+    """
+    Chord callback that adds up the shard results of a fan_out_over_users job.
+    """
+    merged = merge_results(results)
+    logger.info(f"{job} complete across {len(results)} shards: {merged}")
+    return merged
+
+
+@shared_task
+def create_notifications_task(days=1):
+    """
+    Celery task to move in-app notifications across day boundaries: tasks
+    that just became overdue, are due today or just came within seven days.
+    Task writes keep notifications current the rest of the time.
+    Scheduled to run daily; fans out over shards of users.
+
+    Args:
+        days: number of day boundaries to cover (more than 1 catches up missed runs)
+    """
+    return fan_out_over_users(create_notifications_shard_task, 'Notification refresh', days)
 
 
 @shared_task
-def create_notifications_task():
+def create_notifications_shard_task(id_range, days=1):
     """
-    Celery task to create in-app notifications for all users.
-    Scheduled to run daily.
+    Celery task to refresh boundary notifications for one [start_id, end_id) shard of users.
     """
-    users = User.objects.all()
-    total_created = {
-        'overdue': 0,
-        'due_today': 0,
-        'due_soon': 0,
-    }
+    return refresh_boundary_notifications(days=days, user_id_range=id_range)
 
-    for user in users:
-        try:
-            counts = create_notifications_for_user(user)
-            total_created['overdue'] += counts['overdue']
-            total_created['due_today'] += counts['due_today']
-            total_created['due_soon'] += counts['due_soon']
-        except Exception as e:
-            print(f"Error creating notifications for user {user.email}: {str(e)}")
 
-    return total_created
+@shared_task
+def archive_notifications_task():
+    """
+    Celery task to move old read notifications, and those of completed or
+    dismissed tasks, into the notification archive. Scheduled to run daily.
+    """
+    result = archive_notifications()
+    logger.info(f"Notification archive: {result}")
+    return result
 
 
 @shared_task
 def send_weekly_email_notifications_task():
     """
     Celery task to send weekly email notifications to users.
-    Scheduled to run weekly (e.g., Monday at 9:00 AM UTC).
-    """
-    users = User.objects.all()
-    sent_count = 0
-    error_count = 0
-
-    for user in users:
-        try:
-            if should_send_email_notification(user):
-                email_content = get_email_notification_content(user)
-
-                if email_content:
-                    send_mail(
-                        subject=email_content['subject'],
-                        message="",  # Plain text fallback (empty since we're using HTML)
-                        html_message=email_content['html_message'],
-                        from_email=settings.DEFAULT_FROM_EMAIL,
-                        recipient_list=[user.email],
-                        fail_silently=False,
-                    )
-                    update_email_sent_timestamp(user)
-                    sent_count += 1
-        except Exception as e:
-            print(f"Error sending email to user {user.email}: {str(e)}")
-            error_count += 1
-
-    return {
-        'sent_count': sent_count,
-        'error_count': error_count,
-    }
+    Scheduled to run weekly (e.g., Monday at 9:00 AM UTC); fans out over shards of users.
+    """
+    return fan_out_over_users(send_weekly_email_notifications_shard_task, 'Weekly email notifications')
+
+
+@shared_task
+def send_weekly_email_notifications_shard_task(id_range):
+    """
+    Celery task to queue weekly email notifications for one [start_id, end_id) shard of users.
+    """
+    users = filter_id_range(User.objects.all(), id_range).order_by('id')
+    result = {'queued_count': 0}
+
+    # Each batch shares one query per table and one outbox insert
+    batch = []
+    for user in users.iterator(chunk_size=settings.EMAIL_BATCH_SIZE):
+        batch.append(user)
+        if len(batch) == settings.EMAIL_BATCH_SIZE:
+            for key, value in send_email_digests(batch).items():
+                result[key] += value
+            batch = []
+
+    if batch:
+        for key, value in send_email_digests(batch).items():
+            result[key] += value
+
+    return result
 
 
 @shared_task
@@ -105,3 +192,49 @@ def create_tasks_from_registrations_task():
     return result
 
 
+
+@shared_task
+def register_component_templates_task(component_id):
+    """
+    Celery task to match a new HomeComponent to task templates and generate its
+    initial tasks. Queued on commit by the HomeComponent post_save signal.
+    """
+    component = HomeComponent.objects.filter(pk=component_id).select_related('user').first()
+    if component is None:
+        # Deleted before the worker got to it
+        return {'registrations': 0}
+
+    registrations = register_component_templates(component)
+    HomeComponent.objects.filter(pk=component_id).update(registrations_pending=False)
+    return {'registrations': len(registrations)}
+
+
+@shared_task
+def register_components_task(component_ids):
+    """
+    Celery task to match a batch of imported HomeComponents to task templates
+    in one bulk pass. Queued on commit at the end of a bulk ingest.
+    """
+    return register_components_by_id(component_ids)
+
+
+@shared_task
+def rematch_category_task(category):
+    """
+    Celery task to re-match the HomeComponents of one category after templates
+    in it were added, edited or imported. Queued on commit by the TaskTemplate
+    post_save signal.
+    """
+    return rematch_category(category)
+
+
+@shared_task
+def drain_email_outbox_task():
+    """
+    Celery task to send the mail waiting in the EmailOutbox. Routed to the
+    'email' queue; runs every minute and whenever new mail is queued.
+    """
+    result = drain_email_outbox()
+    if any(result.values()):
+        logger.info(f"Email outbox drained: {result}")
+    return result
@@ -0,0 +1,221 @@
+"""
+In-memory index of active TaskTemplates for matching home components.
+
+Templates are grouped by category with their brands and keywords lowercased
+once, so matching a component only looks at the templates of its own category.
+All keywords are compiled into one Aho-Corasick automaton, which finds every
+keyword in a component's text in a single pass.
+The index is rebuilt when the catalog fingerprint (template count and latest
+updated_at) changes, and dropped straight away when a template is saved or
+deleted in this process.
+"""
+
+from collections import deque
+from django.db.models import Count, Max
+from .models import TaskTemplate
+
+
+class KeywordAutomaton:
+    """
+    Aho-Corasick automaton over a set of keywords. find() reports every
+    keyword that occurs anywhere in a text, in one pass over the text.
+    """
+
+    def __init__(self, keywords):
+        self.keywords = list(keywords)
+        self.transitions = [{}]
+        self.fail = [0]
+        self.outputs = [()]
+
+        for keyword_id, keyword in enumerate(self.keywords):
+            node = 0
+            for char in keyword:
+                next_node = self.transitions[node].get(char)
+                if next_node is None:
+                    next_node = len(self.transitions)
+                    self.transitions[node][char] = next_node
+                    self.transitions.append({})
+                    self.fail.append(0)
+                    self.outputs.append(())
+                node = next_node
+            self.outputs[node] += (keyword_id,)
+
+        # Breadth-first, so each node's fail target is finished before the node
+        queue = deque(self.transitions[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, next_node in self.transitions[node].items():
+                fail = self.fail[node]
+                while fail and char not in self.transitions[fail]:
+                    fail = self.fail[fail]
+                fail = self.transitions[fail].get(char, 0)
+                self.fail[next_node] = fail
+                self.outputs[next_node] += self.outputs[fail]
+                queue.append(next_node)
+
+    def find(self, text):
+        """
+        Find the keywords that occur in text.
+
+        Args:
+            text: str to search
+
+        Returns:
+            set of keyword ids (positions in the keyword list)
+        """
+        transitions, fail, outputs = self.transitions, self.fail, self.outputs
+        found = set(outputs[0])
+        node = 0
+
+        for char in text:
+            while node and char not in transitions[node]:
+                node = fail[node]
+            node = transitions[node].get(char, 0)
+            if outputs[node]:
+                found.update(outputs[node])
+
+        return found
+
+
+class IndexedTemplate:
+    """
+    A TaskTemplate with its matching rules prepared for repeated use.
+    """
+
+    __slots__ = ('template', 'brands', 'keyword_ids')
+
+    def __init__(self, template, keyword_ids):
+        self.template = template
+        self.brands = tuple(str(brand).lower() for brand in template.match_brands or [])
+        self.keyword_ids = keyword_ids
+
+    def matches(self, brand, found_keywords):
+        """
+        Apply TaskTemplate.matches_component's brand and keyword rules to a
+        component already known to be in the template's category.
+
+        Args:
+            brand: the component's lowercased brand
+            found_keywords: ids of the keywords found in the component's text
+        """
+        if self.brands and not any(match_brand in brand for match_brand in self.brands):
+            return False
+
+        # matches_component retries keywords against the name alone, but the
+        # name is part of the searched text, so that retry can never add a match
+        if self.keyword_ids and self.keyword_ids.isdisjoint(found_keywords):
+            return False
+
+        return True
+
+
+class TemplateIndex:
+    """
+    Active templates grouped by category, in catalog order.
+    """
+
+    def __init__(self, templates, fingerprint=None):
+        self.fingerprint = fingerprint
+        self.by_category = {}
+        keyword_ids = {}
+
+        for template in templates:
+            template_keyword_ids = frozenset(
+                keyword_ids.setdefault(str(keyword).lower(), len(keyword_ids))
+                for keyword in template.match_keywords or []
+            )
+            self.by_category.setdefault(template.category, []).append(
+                IndexedTemplate(template, template_keyword_ids)
+            )
+
+        self.automaton = KeywordAutomaton(keyword_ids)
+
+    def __len__(self):
+        return sum(len(templates) for templates in self.by_category.values())
+
+    def match(self, component):
+        """
+        Find the templates that match a component.
+
+        Args:
+            component: HomeComponent object (saved or not)
+
+        Returns:
+            list of matching TaskTemplate objects
+        """
+        candidates = self.by_category.get(component.category)
+        if not candidates:
+            return []
+
+        brand = (component.brand or '').lower()
+        if any(candidate.keyword_ids for candidate in candidates):
+            found_keywords = self.automaton.find(component_search_text(component))
+        else:
+            found_keywords = frozenset()
+
+        return [
+            candidate.template for candidate in candidates
+            if candidate.matches(brand, found_keywords)
+        ]
+
+
+def component_search_text(component):
+    """
+    Lowercased text that template keywords are matched against.
+    """
+    return ' '.join([
+        component.name or '',
+        component.brand or '',
+        component.model or '',
+        component.notes or '',
+    ]).lower()
+
+
+_index = None
+
+
+def catalog_fingerprint():
+    """
+    Cheap summary of the template catalog that changes whenever a template is
+    added, deleted or saved.
+    """
+    stats = TaskTemplate.objects.aggregate(count=Count('id'), latest=Max('updated_at'))
+    return stats['count'], stats['latest']
+
+
+def get_template_index():
+    """
+    Get the template index, rebuilding it if the catalog has changed.
+
+    Returns:
+        TemplateIndex object
+    """
+    global _index
+
+    fingerprint = catalog_fingerprint()
+    index = _index
+    if index is None or index.fingerprint != fingerprint:
+        index = TemplateIndex(TaskTemplate.objects.filter(is_active=True), fingerprint)
+        _index = index
+    return index
+
+
+def invalidate_template_index():
+    """
+    Drop the cached index so the next lookup rebuilds it.
+    """
+    global _index
+    _index = None
+
+
+def match_templates(component):
+    """
+    Find the active templates that match a component.
+
+    Args:
+        component: HomeComponent object
+
+    Returns:
+        list of matching TaskTemplate objects
+    """
+    return get_template_index().match(component)
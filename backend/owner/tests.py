@@ -0,0 +1,1152 @@
+from datetime import date, datetime, timedelta
+from types import SimpleNamespace
+import asyncio
+import json
+from unittest.mock import patch
+
+import tablib
+
+from asgiref.sync import async_to_sync
+from celery import current_app
+from django.contrib.auth import get_user_model
+from django.core import mail
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APITestCase
+from django.utils import timezone
+
+from .admin import HomeComponentResource, TaskTemplateResource
+from .backfill import get_component_ranges, run_registration_backfill
+from .event_stream import EVENTS_PATH, broker, event_stream
+from .fanout import get_id_ranges, merge_results
+from .models import (
+    BackfillCheckpoint, EmailOutbox, Home, HomeComponent, HomeMembership, Notification, NotificationArchive,
+    NotificationCounter, NotificationPreference, Task,
+    TaskRegistration, TaskTemplate,
+)
+from .notification_service import (
+    archive_notifications, get_notification_counter, recount_notifications, send_email_digests,
+    sync_task_notifications,
+)
+from .outbox import drain_email_outbox, queue_email
+from .recurrence import add_months, compile_rule, next_occurrence, relative_day_of_month, rule_cache
+from .recurring_tasks import (
+    build_recurring_task_email,
+    create_recurring_task_instances,
+    create_tasks_from_registrations,
+    get_recurring_task_shards,
+)
+from .serializers import HomeComponentSerializer
+from .tasks import (
+    create_notifications_shard_task,
+    create_notifications_task,
+    merge_shard_results,
+    register_component_templates_task,
+    register_components_task,
+    send_weekly_email_notifications_task,
+)
+from .simulation import simulate_days
+from .template_matching import KeywordAutomaton, get_template_index, match_templates
+from .workload import benchmark_nightly_run, clear_workload, create_workload_templates, generate_workload
+
+
+def make_rule(pattern, interval=1, days_of_week=None, days_of_month=None):
+    return SimpleNamespace(
+        recurrence_pattern=pattern,
+        recurrence_interval=interval,
+        recurrence_days_of_week=days_of_week or [],
+        recurrence_days_of_month=days_of_month or [],
+    )
+
+
+class RecurrenceEngineTests(SimpleTestCase):
+    def test_daily_interval(self):
+        rule = make_rule('daily', interval=3)
+        self.assertEqual(next_occurrence(rule, date(2025, 1, 30)), date(2025, 2, 2))
+
+    def test_weekly_picks_nearest_selected_day(self):
+        # 2025-01-01 is a Wednesday; "1" and "5" are Monday and Friday
+        rule = make_rule('weekly', interval=2, days_of_week=['1', '5'])
+        self.assertEqual(next_occurrence(rule, date(2025, 1, 1)), date(2025, 1, 3))
+        self.assertEqual(next_occurrence(rule, date(2025, 1, 3), has_previous=True), date(2025, 1, 6))
+
+    def test_weekly_single_day_skips_interval_after_first_instance(self):
+        rule = make_rule('weekly', interval=2, days_of_week=['3'])
+        self.assertEqual(next_occurrence(rule, date(2025, 1, 1)), date(2025, 1, 8))
+        self.assertEqual(next_occurrence(rule, date(2025, 1, 1), has_previous=True), date(2025, 1, 15))
+
+    def test_monthly_absolute_days_in_selection_order(self):
+        rule = make_rule('monthly', days_of_month=[20, 5])
+        self.assertEqual(next_occurrence(rule, date(2025, 1, 1)), date(2025, 1, 20))
+        self.assertEqual(next_occurrence(rule, date(2025, 1, 20)), date(2025, 2, 20))
+
+    def test_monthly_absolute_skips_short_months(self):
+        rule = make_rule('monthly', days_of_month=[31])
+        self.assertEqual(next_occurrence(rule, date(2025, 1, 31)), date(2025, 3, 31))
+
+    def test_monthly_relative(self):
+        rule = make_rule('monthly', days_of_month=[{'type': 'relative', 'week': 'last', 'day': 'day'}])
+        self.assertEqual(next_occurrence(rule, date(2024, 1, 31)), date(2024, 2, 29))
+
+    def test_relative_weekday_keeps_legacy_mapping(self):
+        # 'Monday' has always resolved against standard weekdays, landing on Sunday
+        self.assertEqual(relative_day_of_month(2025, 6, 'first', 'Monday'), date(2025, 6, 1))
+        self.assertIsNone(relative_day_of_month(2025, 2, 'fifth', 'Monday'))
+
+    def test_yearly_leap_day(self):
+        rule = make_rule('yearly', interval=1)
+        self.assertEqual(next_occurrence(rule, date(2024, 2, 29)), date(2025, 2, 28))
+
+    def test_compiled_rule_reused_until_task_changes(self):
+        rule_cache.clear()
+        task = make_rule('monthly', days_of_month=['15', 'x', 40, 1])
+        task.pk, task.updated_at = 1, 'v1'
+
+        compiled = compile_rule(task)
+        self.assertEqual(compiled.month_days, (15, 1))
+        self.assertFalse(compiled.month_days_sorted)
+        self.assertIs(compile_rule(task), compiled)
+
+        task.recurrence_days_of_month, task.updated_at = [1, 15], 'v2'
+        self.assertEqual(next_occurrence(task, date(2025, 1, 1)), date(2025, 1, 15))
+        self.assertIsNot(compile_rule(task), compiled)
+
+    def test_compiled_weekly_mask(self):
+        compiled = compile_rule(make_rule('weekly', days_of_week=['0', '6', '9']))
+        # Sunday and Saturday as date.weekday() bits 6 and 5
+        self.assertEqual(compiled.weekday_mask, 0b1100000)
+        self.assertEqual(compiled.weekday_offsets[0], 5)
+
+
+class RecurringTaskInstanceTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            username='owner@example.com',
+            email='owner@example.com',
+            password='testpass123'
+        )
+        self.today = timezone.now().date()
+
+    def create_recurring_task(self, **kwargs):
+        defaults = {
+            'user': self.user,
+            'title': 'Water plants',
+            'due_date': self.today - timedelta(days=1),
+            'is_recurring': True,
+            'recurrence_pattern': 'daily',
+            'recurrence_interval': 1,
+        }
+        defaults.update(kwargs)
+        return Task.objects.create(**defaults)
+
+    def test_next_occurrence_date_set_on_create(self):
+        task = self.create_recurring_task()
+        task.refresh_from_db()
+        self.assertEqual(task.next_occurrence_date, self.today)
+
+    def test_next_occurrence_date_follows_rule_changes(self):
+        task = self.create_recurring_task()
+        task.recurrence_interval = 3
+        task.save()
+        task.refresh_from_db()
+        self.assertEqual(task.next_occurrence_date, self.today + timedelta(days=2))
+
+        task.recurrence_end_date = self.today
+        task.save()
+        task.refresh_from_db()
+        self.assertIsNone(task.next_occurrence_date)
+
+    def test_creates_due_instance_and_advances(self):
+        task = self.create_recurring_task()
+
+        result = create_recurring_task_instances()
+
+        self.assertEqual(result, {'created': 1, 'errors': []})
+        instance = task.recurring_instances.get()
+        self.assertEqual(instance.due_date, self.today)
+        self.assertEqual(EmailOutbox.objects.get().idempotency_key, f'recurring-task:{instance.id}')
+        task.refresh_from_db()
+        self.assertEqual(task.next_occurrence_date, self.today + timedelta(days=1))
+
+        # Nothing else is due until tomorrow
+        self.assertEqual(create_recurring_task_instances()['created'], 0)
+
+    def test_dry_run_does_not_write(self):
+        task = self.create_recurring_task()
+
+        result = create_recurring_task_instances(dry_run=True)
+
+        self.assertEqual(result['created'], 1)
+        self.assertFalse(task.recurring_instances.exists())
+
+    def test_batch_mode_matches_row_mode(self):
+        tasks = [self.create_recurring_task(title=f'Task {i}') for i in range(3)]
+
+        result = create_recurring_task_instances(batch_size=2)
+
+        self.assertEqual(result, {'created': 3, 'errors': []})
+        for task in tasks:
+            task.refresh_from_db()
+            self.assertEqual(task.next_occurrence_date, self.today + timedelta(days=1))
+            self.assertEqual(task.recurring_instances.get().due_date, self.today)
+        self.assertEqual(EmailOutbox.objects.count(), 3)
+
+    def test_batch_mode_query_count_independent_of_chunk_size(self):
+        self.create_recurring_task()
+        with CaptureQueriesContext(connection) as single:
+            create_recurring_task_instances(batch_size=50)
+
+        for i in range(10):
+            self.create_recurring_task(title=f'Task {i}', due_date=self.today - timedelta(days=2))
+        with CaptureQueriesContext(connection) as many:
+            result = create_recurring_task_instances(batch_size=50)
+
+        self.assertEqual(result['created'], 10)
+        self.assertEqual(len(single), len(many))
+
+    def test_shards_cover_due_tasks(self):
+        tasks = [self.create_recurring_task(title=f'Task {i}') for i in range(5)]
+        self.create_recurring_task(title='Not due', due_date=self.today + timedelta(days=3))
+
+        shards = get_recurring_task_shards(self.today, 2)
+
+        self.assertEqual(shards, [
+            [tasks[0].id, tasks[2].id],
+            [tasks[2].id, tasks[4].id],
+            [tasks[4].id, None],
+        ])
+        created = sum(
+            create_recurring_task_instances(id_range=shard)['created'] for shard in shards
+        )
+        self.assertEqual(created, 5)
+
+    def test_catch_up_creates_missed_occurrences(self):
+        task = self.create_recurring_task(due_date=self.today - timedelta(days=4))
+
+        result = create_recurring_task_instances(catch_up=True)
+
+        self.assertEqual(result, {'created': 4, 'errors': []})
+        instances = task.recurring_instances.order_by('due_date')
+        self.assertEqual(
+            [(i.due_date, i.status) for i in instances],
+            [(self.today - timedelta(days=n), 'dismissed') for n in (3, 2, 1)] + [(self.today, 'pending')]
+        )
+        self.assertEqual(
+            list(EmailOutbox.objects.values_list('idempotency_key', flat=True)),
+            [f'recurring-task:{instances.last().id}']
+        )
+        task.refresh_from_db()
+        self.assertEqual(task.next_occurrence_date, self.today + timedelta(days=1))
+
+    def test_catch_up_collapse_creates_latest_only(self):
+        task = self.create_recurring_task(
+            due_date=self.today - timedelta(days=4),
+            recurrence_end_date=self.today - timedelta(days=1),
+        )
+
+        result = create_recurring_task_instances(catch_up=True, collapse=True)
+
+        self.assertEqual(result['created'], 1)
+        self.assertEqual(task.recurring_instances.get().due_date, self.today - timedelta(days=1))
+        task.refresh_from_db()
+        self.assertIsNone(task.next_occurrence_date)
+
+    def test_collapse_requires_catch_up(self):
+        with self.assertRaises(CommandError):
+            call_command('create_recurring_task_instances', '--collapse')
+
+    def test_failed_chunk_retried_one_task_at_a_time(self):
+        tasks = [self.create_recurring_task(title=title) for title in ['Sweep', 'Broken', 'Mop']]
+        real_build = build_recurring_task_email
+
+        def build_email(user, task):
+            if task.title == 'Broken':
+                raise ValueError('template missing')
+            return real_build(user, task)
+
+        with patch('owner.recurring_tasks.build_recurring_task_email', side_effect=build_email):
+            result = create_recurring_task_instances(batch_size=10)
+
+        self.assertEqual(result['created'], 2)
+        self.assertEqual(
+            [(error['task_id'], error['error']) for error in result['errors']],
+            [(tasks[1].id, 'template missing')]
+        )
+        for task, advanced in zip(tasks, [True, False, True]):
+            task.refresh_from_db()
+            self.assertEqual(task.recurring_instances.exists(), advanced)
+            self.assertEqual(task.next_occurrence_date, self.today + timedelta(days=advanced))
+        self.assertEqual(EmailOutbox.objects.count(), 2)
+
+
+class RecurringWorkloadTests(TestCase):
+    def test_generated_workload_benchmark_rolls_back(self):
+        counts = generate_workload(homes=3, tasks_per_home=4, seed=7)
+
+        self.assertEqual(counts['homes'], 3)
+        self.assertEqual(sum(counts['tasks'].values()), 12)
+        tasks = Task.objects.filter(is_recurring=True)
+        self.assertFalse(tasks.filter(next_occurrence_date__isnull=True).exists())
+
+        stats = benchmark_nightly_run(batch_size=5)
+
+        self.assertEqual(stats['created'], tasks.filter(next_occurrence_date__lte=timezone.now().date()).count())
+        self.assertEqual(stats['errors'], 0)
+        self.assertFalse(Task.objects.filter(parent_task__isnull=False).exists())
+
+        clear_workload()
+        self.assertFalse(Task.objects.exists())
+
+    def test_simulation_replays_days_with_frozen_clock(self):
+        start_date = date(2030, 3, 1)
+        create_workload_templates(seed=1)
+        with patch('django.utils.timezone.now', return_value=timezone.make_aware(datetime(2030, 3, 1))):
+            generate_workload(homes=2, tasks_per_home=3, mix={'daily': 1}, seed=1,
+                              spread_days=0, components_per_home=2)
+
+        results = simulate_days(start_date, 3, batch_size=10)
+
+        self.assertEqual([r['date'] for r in results], ['2030-03-01', '2030-03-02', '2030-03-03'])
+        created = [r['stages']['recurring_instances']['result']['created'] for r in results]
+        instances = Task.objects.filter(parent_task__isnull=False)
+        # Daily tasks due on day one come round again from the second day on
+        self.assertEqual(created[0], 0)
+        self.assertGreater(created[1], 0)
+        self.assertEqual(sum(created), instances.count())
+        self.assertFalse(instances.exclude(due_date__range=(date(2030, 3, 2), date(2030, 3, 3))).exists())
+        self.assertGreater(results[0]['stages']['registration_tasks']['result']['created'], 0)
+
+
+class KeywordAutomatonTests(SimpleTestCase):
+    def test_finds_overlapping_and_nested_keywords(self):
+        automaton = KeywordAutomaton(['he', 'she', 'his', 'hers', 'heat pump', 'pump'])
+        self.assertEqual(automaton.find('ushers'), {0, 1, 3})
+        self.assertEqual(automaton.find('the heat pump'), {0, 4, 5})
+        self.assertEqual(automaton.find('furnace'), set())
+
+    def test_empty_keyword_always_found(self):
+        self.assertEqual(KeywordAutomaton(['', 'coil']).find('filter'), {0})
+
+
+class TemplateMatchingTests(TestCase):
+    def create_template(self, **kwargs):
+        defaults = {
+            'category': 'HVAC',
+            'title': 'Replace furnace filter',
+            'description': 'Swap the filter.',
+            'frequency_months': 3,
+            'time_estimate_minutes': 10,
+        }
+        defaults.update(kwargs)
+        return TaskTemplate.objects.create(**defaults)
+
+    def test_index_matches_like_matches_component(self):
+        templates = [
+            self.create_template(),
+            self.create_template(title='Service Carrier', match_brands=['carrier']),
+            self.create_template(title='Heat pump check', match_keywords=['Heat Pump', 'mini-split']),
+            self.create_template(title='Trane coil', match_brands=['TRANE'], match_keywords=['coil']),
+            self.create_template(category='Plumbing', title='Flush softener', match_keywords=['softener']),
+        ]
+        components = [
+            HomeComponent(name='Furnace', category='HVAC', brand='Carrier Corp'),
+            HomeComponent(name='Outdoor unit', category='HVAC', model='HEAT PUMP 3000'),
+            HomeComponent(name='Evaporator', category='HVAC', brand='Trane', notes='Coil cleaned'),
+            HomeComponent(name='Water Softener', category='Plumbing'),
+            HomeComponent(name='Sump', category='Sump Pump'),
+        ]
+
+        for component in components:
+            expected = [t for t in TaskTemplate.objects.all() if t.matches_component(component)]
+            self.assertEqual(match_templates(component), expected, component.name)
+        self.assertEqual(len(get_template_index()), len(templates))
+
+    def test_index_rebuilt_when_catalog_changes(self):
+        template = self.create_template(match_keywords=['furnace'])
+        component = HomeComponent(name='Furnace', category='HVAC')
+        self.assertEqual(match_templates(component), [template])
+
+        template.is_active = False
+        template.save()
+        self.assertEqual(match_templates(component), [])
+
+        # Bulk writes skip the signals but still change the catalog fingerprint
+        TaskTemplate.objects.bulk_create([TaskTemplate(
+            category='HVAC', title='Inspect furnace', description='Look it over.',
+            frequency_months=12, time_estimate_minutes=20,
+        )])
+        self.assertEqual([t.title for t in match_templates(component)], ['Inspect furnace'])
+
+    def test_component_create_cost_independent_of_catalog_size(self):
+        user = get_user_model().objects.create_user(username='owner@example.com', password='testpass123')
+        self.create_template(match_keywords=['furnace'])
+        HomeComponent.objects.create(user=user, name='Warmup', category='Other')
+
+        with CaptureQueriesContext(connection) as small:
+            HomeComponent.objects.create(user=user, name='Dishwasher', category='Appliances')
+
+        TaskTemplate.objects.bulk_create([
+            TaskTemplate(category='Roofing', title=f'Roof check {i}', description='Look.',
+                         frequency_months=12, time_estimate_minutes=5)
+            for i in range(50)
+        ])
+        get_template_index()
+
+        with CaptureQueriesContext(connection) as large:
+            HomeComponent.objects.create(user=user, name='Dryer', category='Appliances')
+
+        self.assertEqual(len(small), len(large))
+        self.assertFalse(TaskRegistration.objects.exists())
+
+    @patch('owner.tasks.register_component_templates_task.delay')
+    def test_registration_queued_after_commit(self, mock_delay):
+        user = get_user_model().objects.create_user(username='owner@example.com', password='testpass123')
+        template = self.create_template(match_keywords=['furnace'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            component = HomeComponent.objects.create(user=user, name='Furnace', category='HVAC')
+            self.assertFalse(mock_delay.called)
+
+        mock_delay.assert_called_once_with(component.id)
+        component.refresh_from_db()
+        self.assertTrue(HomeComponentSerializer(component).data['registrations_pending'])
+        self.assertFalse(TaskRegistration.objects.exists())
+
+        self.assertEqual(register_component_templates_task(component.id), {'registrations': 1})
+        component.refresh_from_db()
+        self.assertFalse(component.registrations_pending)
+        self.assertEqual(TaskRegistration.objects.get().task_template, template)
+        self.assertEqual(Task.objects.get().home_component, component)
+
+    @override_settings(TASK_REGISTRATION_ASYNC=False)
+    def test_registration_runs_inline_when_sync(self):
+        user = get_user_model().objects.create_user(username='owner@example.com', password='testpass123')
+        self.create_template(match_keywords=['furnace'])
+
+        component = HomeComponent.objects.create(user=user, name='Furnace', category='HVAC')
+
+        self.assertFalse(component.registrations_pending)
+        self.assertEqual(TaskRegistration.objects.filter(home_component=component).count(), 1)
+
+    @override_settings(TASK_REGISTRATION_ASYNC=False)
+    def test_template_change_rematches_affected_categories(self):
+        user = get_user_model().objects.create_user(username='owner@example.com', password='testpass123')
+        furnace, boiler, sink = HomeComponent.objects.bulk_create([
+            HomeComponent(user=user, name='Furnace', category='HVAC'),
+            HomeComponent(user=user, name='Boiler', category='HVAC'),
+            HomeComponent(user=user, name='Kitchen sink', category='Plumbing'),
+        ])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            template = self.create_template(match_keywords=['furnace'])
+        self.assertEqual(list(TaskRegistration.objects.values_list('home_component', flat=True)), [furnace.id])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            template.match_keywords = ['boiler']
+            template.save()
+        active = TaskRegistration.objects.filter(is_active=True).values_list('home_component', flat=True)
+        self.assertEqual(list(active), [boiler.id])
+        self.assertFalse(TaskRegistration.objects.get(home_component=furnace).is_active)
+
+        # Matching again does not switch back on a registration that is off
+        with self.captureOnCommitCallbacks(execute=True):
+            template.match_keywords = ['furnace', 'boiler']
+            template.save()
+        self.assertFalse(TaskRegistration.objects.get(home_component=furnace).is_active)
+        self.assertTrue(TaskRegistration.objects.get(home_component=boiler).is_active)
+
+        # Unrelated edits and other categories are left alone
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            template.description = 'Swap the filter every season.'
+            template.save()
+        self.assertEqual(callbacks, [])
+        self.assertFalse(TaskRegistration.objects.filter(home_component=sink).exists())
+
+    @patch('owner.tasks.register_component_templates_task.delay')
+    @patch('owner.tasks.register_components_task.delay')
+    def test_component_import_registers_in_one_batch(self, mock_bulk_delay, mock_delay):
+        self.create_template(match_keywords=['furnace'])
+        dataset = tablib.Dataset(headers=['name', 'category'])
+        for i in range(5):
+            dataset.append([f'Furnace {i}', 'HVAC'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            HomeComponentResource().import_data(dataset, dry_run=True)
+        with self.captureOnCommitCallbacks(execute=True):
+            result = HomeComponentResource().import_data(dataset)
+
+        self.assertFalse(result.has_errors())
+        self.assertFalse(mock_delay.called)
+        mock_bulk_delay.assert_called_once()
+        component_ids, = mock_bulk_delay.call_args.args
+        self.assertEqual(sorted(component_ids), list(HomeComponent.objects.order_by('id').values_list('id', flat=True)))
+        self.assertEqual(HomeComponent.objects.filter(registrations_pending=True).count(), 5)
+
+        with CaptureQueriesContext(connection) as queries:
+            counts = register_components_task(component_ids)
+
+        self.assertEqual((counts['components'], counts['registrations']), (5, 5))
+        self.assertLess(len(queries), 20)
+        self.assertFalse(HomeComponent.objects.filter(registrations_pending=True).exists())
+
+    @patch('owner.tasks.rematch_category_task.delay')
+    def test_import_rematches_each_category_once(self, mock_delay):
+        dataset = tablib.Dataset(headers=['category', 'title', 'description', 'frequency_months', 'time_estimate_minutes'])
+        for i in range(3):
+            dataset.append(['HVAC', f'HVAC task {i}', 'Do it.', 12, 10])
+        dataset.append(['Plumbing', 'Plumbing task', 'Do it.', 12, 10])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            TaskTemplateResource().import_data(dataset, dry_run=True)
+        self.assertFalse(mock_delay.called)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            result = TaskTemplateResource().import_data(dataset)
+
+        self.assertFalse(result.has_errors())
+        self.assertEqual(sorted(call.args[0] for call in mock_delay.call_args_list), ['HVAC', 'Plumbing'])
+
+
+class RegistrationTaskTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(username='owner@example.com', password='testpass123')
+        self.today = timezone.now().date()
+        self.template = TaskTemplate.objects.create(
+            category='HVAC', title='Replace furnace filter', description='Swap the filter.',
+            frequency_months=3, time_estimate_minutes=10,
+        )
+
+    def register(self, count):
+        components = HomeComponent.objects.bulk_create([
+            HomeComponent(user=self.user, name=f'Furnace {i}', category='HVAC') for i in range(count)
+        ])
+        TaskRegistration.objects.bulk_create([
+            TaskRegistration(user=self.user, home_component=component, task_template=self.template)
+            for component in components
+        ])
+        return components
+
+    def create_task(self, component, due_date):
+        return Task.objects.create(
+            user=self.user, home_component=component, title=self.template.title, due_date=due_date,
+        )
+
+    def test_creates_only_due_tasks(self):
+        fresh, stale, new = self.register(3)
+        self.create_task(fresh, self.today - timedelta(days=30))
+        self.create_task(stale, self.today - timedelta(days=100))
+
+        result = create_tasks_from_registrations(batch_size=2)
+
+        self.assertEqual(result, {'created': 2, 'skipped': 1, 'errors': 0, 'total': 3})
+        due_date = self.today + timedelta(days=7)
+        self.assertEqual(
+            set(Task.objects.filter(due_date=due_date).values_list('home_component', flat=True)),
+            {stale.id, new.id}
+        )
+        registration = TaskRegistration.objects.get(home_component=new)
+        self.assertEqual(
+            (registration.last_task_generated, registration.next_task_due),
+            (self.today, add_months(due_date, 3))
+        )
+        # Registrations that were not due are scheduled from their latest task
+        self.assertEqual(
+            TaskRegistration.objects.get(home_component=fresh).next_task_due,
+            add_months(self.today - timedelta(days=30), 3)
+        )
+
+        # Nothing is due again until the scheduled dates arrive, and nothing is scanned
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(create_tasks_from_registrations()['total'], 0)
+        self.assertEqual(len(queries), 1)
+
+    def test_uses_calendar_months(self):
+        self.template.frequency_months = 1
+        self.template.save()
+        component, = self.register(1)
+        self.create_task(component, date(2025, 1, 31))
+
+        with patch('django.utils.timezone.now', return_value=timezone.make_aware(datetime(2025, 2, 27))):
+            self.assertEqual(create_tasks_from_registrations()['created'], 0)
+        self.assertEqual(TaskRegistration.objects.get().next_task_due, date(2025, 2, 28))
+
+        with patch('django.utils.timezone.now', return_value=timezone.make_aware(datetime(2025, 2, 28))):
+            self.assertEqual(create_tasks_from_registrations()['created'], 1)
+
+    def test_frequency_change_reschedules(self):
+        component, = self.register(1)
+        self.create_task(component, self.today - timedelta(days=40))
+        create_tasks_from_registrations()
+        registration = TaskRegistration.objects.get()
+        self.assertGreater(registration.next_task_due, self.today)
+
+        self.template.frequency_months = 1
+        self.template.save()
+
+        registration.refresh_from_db()
+        self.assertIsNone(registration.next_task_due)
+        self.assertEqual(create_tasks_from_registrations()['created'], 1)
+
+    def test_duplicate_title_creates_one_task(self):
+        component, = self.register(1)
+        duplicate = TaskTemplate.objects.create(
+            category='HVAC', title=self.template.title, description='Same task, other source.',
+            frequency_months=6, time_estimate_minutes=10,
+        )
+        TaskRegistration.objects.create(user=self.user, home_component=component, task_template=duplicate)
+
+        result = create_tasks_from_registrations()
+
+        self.assertEqual((result['created'], result['skipped']), (1, 1))
+
+    def test_query_count_independent_of_registration_count(self):
+        self.register(1)
+        with CaptureQueriesContext(connection) as single:
+            create_tasks_from_registrations(registrations=TaskRegistration.objects.all())
+
+        TaskRegistration.objects.all().delete()
+        self.register(20)
+        with CaptureQueriesContext(connection) as many:
+            result = create_tasks_from_registrations(registrations=TaskRegistration.objects.all())
+
+        self.assertEqual(result['created'], 20)
+        self.assertEqual(len(single), len(many))
+
+
+class RegistrationBackfillTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(username='owner@example.com', password='testpass123')
+        TaskTemplate.objects.create(
+            category='HVAC', title='Replace furnace filter', description='Swap the filter.',
+            frequency_months=3, time_estimate_minutes=10,
+        )
+        self.components = HomeComponent.objects.bulk_create([
+            HomeComponent(user=self.user, name=f'Furnace {i}', category='HVAC') for i in range(5)
+        ])
+
+    def test_ranges_cover_components(self):
+        ids = [component.id for component in self.components]
+
+        ranges = get_component_ranges(HomeComponent.objects.all(), chunk_size=2)
+
+        self.assertEqual(ranges, [[ids[0], ids[2]], [ids[2], ids[4]], [ids[4], None]])
+        self.assertEqual(get_component_ranges(HomeComponent.objects.all(), 2, after_id=ids[3]), [[ids[4], None]])
+
+    def test_backfill_advances_checkpoint(self):
+        ranges = get_component_ranges(HomeComponent.objects.all(), chunk_size=2)
+
+        totals = run_registration_backfill('test', ranges[:2])
+
+        self.assertEqual((totals['components'], totals['registrations'], totals['tasks']), (4, 4, 4))
+        checkpoint = BackfillCheckpoint.objects.get(name='test')
+        self.assertEqual((checkpoint.last_id, checkpoint.completed_at), (self.components[4].id - 1, None))
+
+        # Resuming only picks up the remaining component, and repeats are harmless
+        ranges = get_component_ranges(HomeComponent.objects.all(), 2, after_id=checkpoint.last_id)
+        totals = run_registration_backfill('test', ranges + ranges)
+
+        self.assertEqual((totals['components'], totals['registrations']), (2, 1))
+        self.assertEqual(TaskRegistration.objects.count(), 5)
+        self.assertIsNotNone(BackfillCheckpoint.objects.get(name='test').completed_at)
+
+
+class NotificationGenerationTests(TestCase):
+    def setUp(self):
+        self.today = timezone.now().date()
+
+    def create_user(self, name, **task_offsets):
+        user = get_user_model().objects.create_user(username=f'{name}@example.com', email=f'{name}@example.com')
+        for title, offset in task_offsets.items():
+            Task.objects.create(user=user, title=title, due_date=self.today + timedelta(days=offset))
+        return user
+
+    def sync_all(self):
+        return sync_task_notifications(Task.objects.values_list('id', flat=True))
+
+    def test_creates_each_notification_once(self):
+        alice = self.create_user('alice', gutters=-3, filter=0, smoke=5, roof=30)
+        bob = self.create_user('bob', gutters=-1, filter=2)
+        NotificationPreference.objects.create(user=bob, inapp_overdue_tasks=False)
+
+        self.assertEqual(self.sync_all(), {'created': 4, 'updated': 0, 'deleted': 0})
+        self.assertEqual(self.sync_all(), {'created': 0, 'updated': 0, 'deleted': 0})
+        self.assertEqual(
+            sorted(Notification.objects.values_list('notification_type', flat=True)),
+            ['due_soon', 'due_soon', 'due_today', 'overdue']
+        )
+
+        overdue = Notification.objects.get(notification_type='overdue')
+        self.assertEqual((overdue.user, overdue.title), (alice, 'Overdue: gutters'))
+        self.assertEqual(
+            overdue.message,
+            f'Task "gutters" was due on {(self.today - timedelta(days=3)).strftime("%B %d, %Y")}'
+        )
+        self.assertEqual(NotificationPreference.objects.count(), 2)
+
+    def test_query_count_independent_of_user_count(self):
+        self.create_user('first', gutters=-3, filter=0)
+        with CaptureQueriesContext(connection) as single:
+            self.sync_all()
+
+        for i in range(20):
+            self.create_user(f'user{i}', gutters=-3, filter=0, smoke=5)
+        with CaptureQueriesContext(connection) as many:
+            result = self.sync_all()
+
+        self.assertEqual(result, {'created': 60, 'updated': 0, 'deleted': 0})
+        self.assertEqual(len(single), len(many))
+
+    def test_task_writes_update_notifications(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            user = self.create_user('alice', gutters=3, roof=30)
+        gutters = Task.objects.get(title='gutters')
+        roof = Task.objects.get(title='roof')
+        self.assertEqual(list(Notification.objects.values_list('task', 'notification_type')), [(gutters.id, 'due_soon')])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            roof.due_date = self.today
+            roof.save()
+            gutters.status = 'completed'
+            gutters.save()
+        self.assertEqual(list(Notification.objects.values_list('task', 'notification_type')), [(roof.id, 'due_today')])
+
+        # Read notifications are kept when they stop applying
+        Notification.objects.update(is_read=True)
+        with self.captureOnCommitCallbacks(execute=True):
+            roof.title = 'Clean roof'
+            roof.save()
+        with self.captureOnCommitCallbacks(execute=True):
+            roof.status = 'completed'
+            roof.save()
+        self.assertEqual(Notification.objects.get().title, 'Due Today: Clean roof')
+
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            user.tasks.update(status='pending')
+            Task.objects.get(title='gutters').save(update_fields=['description'])
+        self.assertEqual(callbacks, [])
+
+    def test_daily_job_moves_boundary_tasks(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.create_user('alice', gutters=0, filter=1, smoke=8, roof=30)
+
+        with patch('django.utils.timezone.now', return_value=timezone.now() + timedelta(days=1)):
+            with CaptureQueriesContext(connection) as queries:
+                result = create_notifications_shard_task([0, None])
+
+        self.assertEqual(result, {'created': 3, 'updated': 0, 'deleted': 2})
+        self.assertEqual(
+            sorted(Notification.objects.values_list('task__title', 'notification_type')),
+            [('filter', 'due_today'), ('gutters', 'overdue'), ('smoke', 'due_soon')]
+        )
+        self.assertLess(len(queries), 15)
+
+
+class EmailDigestTests(TestCase):
+    def test_sends_digests_in_one_batch(self):
+        today = timezone.now().date()
+        users = []
+        for i in range(3):
+            user = get_user_model().objects.create_user(
+                username=f'user{i}@example.com', email=f'user{i}@example.com', first_name=f'User{i}'
+            )
+            Task.objects.bulk_create([
+                Task(user=user, title='Clean <gutters>', due_date=today - timedelta(days=2)),
+                Task(user=user, title='Test smoke alarms', due_date=today + timedelta(days=3)),
+            ])
+            users.append(user)
+        NotificationPreference.objects.create(user=users[2], email_overdue_tasks=False)
+        Task.objects.filter(user=users[1]).update(status='completed')
+
+        with CaptureQueriesContext(connection) as queries:
+            result = send_email_digests(users)
+
+        self.assertEqual(result, {'queued_count': 2})
+        self.assertLess(len(queries), 10)
+        self.assertEqual(mail.outbox, [])
+        self.assertEqual(drain_email_outbox(), {'sent': 2, 'retried': 0, 'failed': 0})
+        first, third = mail.outbox
+        html = first.alternatives[0][0]
+        self.assertEqual((first.to, first.subject), (['user0@example.com'], 'Your Weekly Home Maintenance Reminder'))
+        self.assertIn('Hi User0,', html)
+        self.assertIn('Clean &lt;gutters&gt;', html)
+        self.assertIn(f"Due: {(today - timedelta(days=2)).strftime('%B %d, %Y')} (2 days ago)", html)
+        self.assertIn('(in 3 days)', html)
+        self.assertIn('.cta-button', html)
+        self.assertNotIn('gutters', third.alternatives[0][0])
+
+        # Stamped, so nothing is due again this week
+        self.assertEqual(send_email_digests(users), {'queued_count': 0})
+
+
+class EmailOutboxTests(TestCase):
+    def test_idempotency_key_queues_once(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            queue_email('contact-us:1', 'Hello', 'Body', ['owner@example.com'])
+            queue_email('contact-us:1', 'Hello again', 'Body', ['owner@example.com'])
+
+        self.assertEqual(len(callbacks), 2)
+        self.assertEqual(EmailOutbox.objects.get().subject, 'Hello')
+        self.assertEqual(drain_email_outbox(), {'sent': 1, 'retried': 0, 'failed': 0})
+        self.assertEqual(drain_email_outbox(), {'sent': 0, 'retried': 0, 'failed': 0})
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(EmailOutbox.objects.get().status, 'sent')
+
+    @override_settings(EMAIL_OUTBOX_MAX_ATTEMPTS=2, EMAIL_OUTBOX_RETRY_DELAY=60)
+    def test_failures_back_off_then_give_up(self):
+        queue_email('digest:1', 'Digest', 'Body', ['user@example.com'])
+        now = timezone.now()
+
+        with patch('owner.outbox.EmailMultiAlternatives.send', side_effect=OSError('connection refused')):
+            self.assertEqual(drain_email_outbox(), {'sent': 0, 'retried': 1, 'failed': 0})
+            email = EmailOutbox.objects.get()
+            self.assertEqual((email.status, email.attempts, email.last_error), ('pending', 1, 'connection refused'))
+            self.assertGreaterEqual(email.next_attempt_at, now + timedelta(seconds=60))
+
+            # Not due again until the backoff has passed
+            self.assertEqual(drain_email_outbox(), {'sent': 0, 'retried': 0, 'failed': 0})
+            with patch('django.utils.timezone.now', return_value=now + timedelta(minutes=5)):
+                self.assertEqual(drain_email_outbox(), {'sent': 0, 'retried': 0, 'failed': 1})
+
+        self.assertEqual(EmailOutbox.objects.get().status, 'failed')
+        self.assertEqual(mail.outbox, [])
+
+    @override_settings(EMAIL_OUTBOX_MAX_ATTEMPTS=2)
+    def test_connection_failure_backs_off_every_claimed_row(self):
+        queue_email('digest:1', 'Digest', 'Body', ['one@example.com'])
+        queue_email('digest:2', 'Digest', 'Body', ['two@example.com'])
+        now = timezone.now()
+
+        with patch('django.core.mail.backends.locmem.EmailBackend.open', side_effect=OSError('no route to host')):
+            self.assertEqual(drain_email_outbox(), {'sent': 0, 'retried': 2, 'failed': 0})
+            self.assertEqual(
+                set(EmailOutbox.objects.values_list('status', 'attempts', 'last_error')),
+                {('pending', 1, 'no route to host')}
+            )
+            with patch('django.utils.timezone.now', return_value=now + timedelta(minutes=5)):
+                self.assertEqual(drain_email_outbox(), {'sent': 0, 'retried': 0, 'failed': 2})
+
+        self.assertEqual(set(EmailOutbox.objects.values_list('status', flat=True)), {'failed'})
+
+
+class FanOutTests(TestCase):
+    def test_merge_results(self):
+        merged = merge_results([
+            {'sent_count': 2, 'errors': ['a'], 'created': {'overdue': 1}},
+            {'sent_count': 3, 'errors': ['b'], 'created': {'overdue': 2, 'due_soon': 1}},
+        ])
+
+        self.assertEqual(merged, {'sent_count': 5, 'errors': ['a', 'b'], 'created': {'overdue': 3, 'due_soon': 1}})
+
+    @override_settings(USER_SHARD_SIZE=2)
+    def test_user_jobs_fan_out_over_shards(self):
+        today = timezone.now().date()
+        users = [
+            get_user_model().objects.create_user(username=f'user{i}@example.com', email=f'user{i}@example.com')
+            for i in range(5)
+        ]
+        Task.objects.bulk_create([Task(user=user, title='Clean gutters', due_date=today) for user in users])
+        self.assertEqual(get_id_ranges(get_user_model().objects.all(), 2), [
+            [users[0].id, users[2].id], [users[2].id, users[4].id], [users[4].id, None],
+        ])
+
+        always_eager = current_app.conf.task_always_eager
+        current_app.conf.task_always_eager = True
+        try:
+            with patch('owner.tasks.merge_shard_results.run', wraps=merge_shard_results.run) as merge:
+                self.assertEqual(create_notifications_task(), {'shards': 3})
+                self.assertEqual(send_weekly_email_notifications_task(), {'shards': 3})
+        finally:
+            current_app.conf.task_always_eager = always_eager
+
+        self.assertEqual(Notification.objects.filter(notification_type='due_today').count(), 5)
+        self.assertEqual(merge.call_args_list[0].args[0][0], {'created': 2, 'updated': 0, 'deleted': 0})
+        self.assertEqual(merge.call_args_list[1].args[0][0], {'queued_count': 2})
+        self.assertEqual(EmailOutbox.objects.count(), 5)
+
+
+class NotificationCounterTests(APITestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(username='owner@example.com', email='owner@example.com')
+        self.client.force_authenticate(user=self.user)
+        today = timezone.now().date()
+        self.tasks = Task.objects.bulk_create([
+            Task(user=self.user, title='gutters', due_date=today - timedelta(days=2)),
+            Task(user=self.user, title='filter', due_date=today),
+            Task(user=self.user, title='smoke', due_date=today + timedelta(days=3)),
+            Task(user=self.user, title='roof', due_date=today + timedelta(days=5)),
+        ])
+        sync_task_notifications(Task.objects.values_list('id', flat=True))
+
+    def get_summary(self):
+        response = self.client.get('/api/v1/owner/notifications/summary/')
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_bulk_writes_update_counter(self):
+        self.assertEqual(self.get_summary(), {'overdue': 1, 'due_today': 1, 'due_soon': 2, 'total': 4})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.tasks[2].status = 'completed'
+            self.tasks[2].save()
+
+        self.assertEqual(self.get_summary(), {'overdue': 1, 'due_today': 1, 'due_soon': 1, 'total': 3})
+
+        # A cascade delete goes through the signals
+        self.tasks[0].delete()
+        counter = NotificationCounter.objects.get(user=self.user)
+        self.assertEqual((counter.overdue, counter.total), (0, 2))
+
+    def test_reads_update_counter(self):
+        notification = Notification.objects.get(notification_type='due_today')
+
+        response = self.client.post(f'/api/v1/owner/notifications/{notification.id}/mark_as_read/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.get_summary(), {'overdue': 1, 'due_today': 0, 'due_soon': 2, 'total': 3})
+
+        # Reading it again leaves the counter alone
+        self.client.post(f'/api/v1/owner/notifications/{notification.id}/mark_as_read/')
+        self.assertEqual(self.client.get('/api/v1/owner/notifications/unread_count/').data, {'unread_count': 3})
+
+        response = self.client.post('/api/v1/owner/notifications/mark_all_as_read/')
+        self.assertEqual(response.data, {'updated_count': 3})
+        self.assertEqual(self.get_summary(), {'overdue': 0, 'due_today': 0, 'due_soon': 0, 'total': 0})
+
+    def test_polling_cost_independent_of_notification_count(self):
+        with CaptureQueriesContext(connection) as few:
+            self.get_summary()
+
+        today = timezone.now().date()
+        Task.objects.bulk_create([
+            Task(user=self.user, title=f'task {i}', due_date=today - timedelta(days=1)) for i in range(30)
+        ])
+        sync_task_notifications(Task.objects.values_list('id', flat=True))
+
+        with CaptureQueriesContext(connection) as many:
+            self.assertEqual(self.get_summary()['overdue'], 31)
+        self.assertEqual(len(few), len(many))
+
+
+class NotificationArchiveTests(TestCase):
+    def test_archives_old_read_and_closed_task_notifications(self):
+        user = get_user_model().objects.create_user(username='owner@example.com', email='owner@example.com')
+        today = timezone.now().date()
+        tasks = Task.objects.bulk_create([
+            Task(user=user, title=title, due_date=today - timedelta(days=1))
+            for title in ['old read', 'recent read', 'unread', 'completed unread', 'dismissed read']
+        ])
+        sync_task_notifications(Task.objects.values_list('id', flat=True))
+        Notification.objects.filter(task__title__in=['old read', 'recent read', 'dismissed read']).update(is_read=True)
+        Notification.objects.filter(task__title='old read').update(created_at=timezone.now() - timedelta(days=91))
+        # Bulk updates skip the signals that keep notifications in line with tasks
+        Task.objects.filter(id=tasks[3].id).update(status='completed')
+        Task.objects.filter(id=tasks[4].id).update(status='dismissed')
+        recount_notifications([user.id])
+        self.assertEqual(get_notification_counter(user).overdue, 2)
+
+        with CaptureQueriesContext(connection) as queries:
+            result = archive_notifications(retention_days=90, batch_size=2)
+
+        self.assertEqual(result, {'archived': 3})
+        self.assertEqual(
+            sorted(Notification.objects.values_list('task__title', flat=True)), ['recent read', 'unread']
+        )
+        archived = NotificationArchive.objects.get(task=tasks[0])
+        self.assertEqual((archived.user, archived.is_read, archived.title), (user, True, 'Overdue: old read'))
+        self.assertLess(archived.created_at, timezone.now() - timedelta(days=90))
+        self.assertEqual(get_notification_counter(user).overdue, 1)
+        self.assertLess(len(queries), 20)
+
+        self.assertEqual(archive_notifications(retention_days=90), {'archived': 0})
+
+    def test_archived_read_notification_of_open_task_is_not_recreated(self):
+        user = get_user_model().objects.create_user(username='owner@example.com', email='owner@example.com')
+        task = Task.objects.create(user=user, title='gutters', due_date=timezone.now().date() - timedelta(days=1))
+        sync_task_notifications([task.id])
+        Notification.objects.update(is_read=True, created_at=timezone.now() - timedelta(days=91))
+        recount_notifications([user.id])
+
+        self.assertEqual(archive_notifications(retention_days=90), {'archived': 1})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            task.title = 'Clean gutters'
+            task.save()
+        self.assertEqual(sync_task_notifications([task.id])['created'], 0)
+
+        self.assertFalse(Notification.objects.exists())
+        self.assertEqual(get_notification_counter(user).total, 0)
+
+    def test_unread_notification_of_reopened_task_comes_back(self):
+        user = get_user_model().objects.create_user(username='owner@example.com', email='owner@example.com')
+        task = Task.objects.create(user=user, title='gutters', due_date=timezone.now().date() - timedelta(days=1))
+        sync_task_notifications([task.id])
+        # Bulk updates skip the signals, so the unread notification outlives the completion
+        Task.objects.filter(id=task.id).update(status='completed')
+
+        self.assertEqual(archive_notifications(retention_days=90), {'archived': 1})
+        self.assertFalse(NotificationArchive.objects.get().is_read)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            task.status = 'pending'
+            task.save()
+        self.assertEqual(list(Notification.objects.values_list('task', 'notification_type')), [(task.id, 'overdue')])
+        self.assertEqual(get_notification_counter(user).overdue, 1)
+
+
+@override_settings(EVENTS_REDIS_URL='redis://events.test:6379/1')
+class EventPublishingTests(TestCase):
+    def published(self, client):
+        publish = client.return_value.pipeline.return_value.publish
+        return [json.loads(call.args[1]) for call in publish.call_args_list]
+
+    def test_task_and_counter_changes_publish_on_commit(self):
+        user = get_user_model().objects.create_user(username='owner@example.com', email='owner@example.com')
+
+        with patch('owner.events.get_redis') as client:
+            with self.captureOnCommitCallbacks(execute=True):
+                task = Task.objects.create(user=user, title='gutters', due_date=timezone.now().date())
+                self.assertEqual(self.published(client), [])
+
+        events = self.published(client)
+        self.assertEqual(
+            [(event['user_id'], event['event']) for event in events],
+            [(user.id, 'task'), (user.id, 'notifications')]
+        )
+        self.assertEqual((events[0]['data']['id'], events[0]['data']['action']), (task.id, 'saved'))
+        self.assertEqual(events[1]['data'], {'overdue': 0, 'due_today': 1, 'due_soon': 0, 'total': 1})
+
+    def test_home_task_events_reach_every_member(self):
+        owner = get_user_model().objects.create_user(username='owner@example.com', email='owner@example.com')
+        partner = get_user_model().objects.create_user(username='partner@example.com', email='partner@example.com')
+        outsider = get_user_model().objects.create_user(username='outsider@example.com', email='outsider@example.com')
+        home = Home.objects.create(name='Main House', address='1 Main St')
+        HomeMembership.objects.create(user=owner, home=home, is_primary=True)
+        HomeMembership.objects.create(user=partner, home=home, role='viewer')
+        Home.objects.create(name='Other', address='2 Main St').memberships.create(user=outsider)
+        self.client.force_login(owner)
+
+        with patch('owner.events.get_redis') as client:
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.client.post('/api/v1/owner/tasks/', {
+                    'title': 'Clean gutters', 'due_date': timezone.now().date().isoformat(),
+                }, content_type='application/json')
+
+        self.assertEqual(response.status_code, 201)
+        task = Task.objects.get()
+        self.assertEqual((task.user, task.home), (None, home))
+        self.assertEqual(
+            [(event['user_id'], event['data']['id']) for event in self.published(client) if event['event'] == 'task'],
+            [(owner.id, task.id), (partner.id, task.id)]
+        )
+
+    def test_publishing_is_off_without_redis_url(self):
+        user = get_user_model().objects.create_user(username='owner@example.com', email='owner@example.com')
+
+        with override_settings(EVENTS_REDIS_URL=''), patch('owner.events.get_redis') as client:
+            with self.captureOnCommitCallbacks(execute=True) as callbacks:
+                Task.objects.create(user=user, title='gutters', due_date=timezone.now().date())
+
+        client.assert_not_called()
+        self.assertEqual(len(callbacks), 1)
+
+
+class EventStreamTests(TransactionTestCase):
+    def stream(self, cookie, events=(), until=1):
+        """
+        Run the ASGI app until it has sent `until` events, dispatching the
+        given events once the stream is open.
+        """
+        sent = []
+        done = asyncio.Event()
+
+        async def receive():
+            await done.wait()
+            return {'type': 'http.disconnect'}
+
+        async def send(message):
+            sent.append(message)
+            bodies = [m for m in sent if m['type'] == 'http.response.body']
+            if len(bodies) == 1:
+                for event in events:
+                    broker.dispatch(json.dumps(event))
+            if len(bodies) >= until or (bodies and not bodies[-1].get('more_body')):
+                done.set()
+
+        scope = {'type': 'http', 'path': EVENTS_PATH, 'headers': [(b'cookie', cookie.encode())]}
+        async_to_sync(event_stream)(scope, receive, send)
+        return sent
+
+    def test_streams_counters_and_user_events(self):
+        user = get_user_model().objects.create_user(username='owner@example.com', email='owner@example.com')
+        other = get_user_model().objects.create_user(username='other@example.com', email='other@example.com')
+        Task.objects.create(user=user, title='gutters', due_date=timezone.now().date() - timedelta(days=1))
+        sync_task_notifications(Task.objects.values_list('id', flat=True))
+        self.client.force_login(user)
+
+        sent = self.stream(self.client.cookies.output(attrs=[], header='', sep=';').strip(), events=[
+            {'user_id': other.id, 'event': 'task', 'data': {'id': 1}},
+            {'user_id': user.id, 'event': 'task', 'data': {'id': 2, 'action': 'deleted'}},
+        ], until=2)
+
+        self.assertEqual(sent[0]['status'], 200)
+        self.assertIn((b'content-type', b'text/event-stream'), sent[0]['headers'])
+        self.assertEqual(
+            [message['body'].decode() for message in sent[1:]],
+            [
+                'event: notifications\ndata: {"overdue": 1, "due_today": 0, "due_soon": 0, "total": 1}\n\n',
+                'event: task\ndata: {"id": 2, "action": "deleted"}\n\n',
+            ]
+        )
+        self.assertEqual(broker.streams, {})
+
+    def test_rejects_anonymous_streams(self):
+        sent = self.stream('')
+
+        self.assertEqual(sent[0]['status'], 401)
+
+
+class TaskOccurrencesViewTests(APITestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            username='owner@example.com',
+            email='owner@example.com',
+            password='testpass123'
+        )
+        self.home = Home.objects.create(name='Main House', address='1 Main St')
+        HomeMembership.objects.create(user=self.user, home=self.home, is_primary=True)
+        self.client.force_authenticate(user=self.user)
+        self.today = timezone.now().date()
+
+    def test_merges_instances_with_projected_occurrences(self):
+        task = Task.objects.create(
+            user=self.user,
+            home=self.home,
+            title='Check smoke detectors',
+            due_date=self.today - timedelta(days=7),
+            is_recurring=True,
+            recurrence_pattern='weekly',
+            recurrence_days_of_week=[str((self.today.weekday() + 1) % 7)],
+        )
+        create_recurring_task_instances()
+
+        response = self.client.get('/api/v1/owner/tasks/occurrences/', {
+            'start': self.today.isoformat(),
+            'end': (self.today + timedelta(days=20)).isoformat(),
+        })
+
+        self.assertEqual(response.status_code, 200)
+        occurrences = response.data['occurrences']
+        self.assertEqual(
+            [(o['due_date'], o['is_virtual']) for o in occurrences],
+            [((self.today + timedelta(days=n)).isoformat(), n > 0) for n in (0, 7, 14)]
+        )
+        self.assertTrue(all(o['task_id'] == task.id for o in occurrences))
+        self.assertEqual(Task.objects.count(), 2)
+
+    def test_rejects_bad_window(self):
+        response = self.client.get('/api/v1/owner/tasks/occurrences/', {
+            'start': '2025-01-10',
+            'end': '2025-01-01',
+        })
+        self.assertEqual(response.status_code, 400)
@@ -5,6 +5,7 @@ from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status, viewsets
 from rest_framework.decorators import action
+from django.db import transaction
 from django.http import FileResponse, JsonResponse
 
 from payments.permissions import HasPurchasedProduct, HasAnyActiveSubscription, HasAllActiveSubscriptions
@@ -23,8 +24,9 @@ from .serializers import (
     TaskSerializer, AppointmentSerializer, MaintenanceHistorySerializer, ContractorSerializer,
     ContractorDetailSerializer, NotificationSerializer, NotificationPreferenceSerializer
 )
-from .recurring_tasks import get_recurring_task_stats
-from django.core.mail import send_mail
+from .recurring_tasks import get_recurring_task_stats, get_recurring_task_occurrences
+from .notification_service import get_notification_counter, recount_notifications
+from .outbox import queue_email
 
 # Helper function to get current home
 def get_current_home(request):
@@ -133,15 +135,15 @@ class ContactUsAPIView(APIView):
         contact = ContactUs.objects.create(name=name, email=email, message=message)
 
         if settings.SEND_EMAIL_FOR_CONTACT_US and settings.CONTACT_US_RECIPIENT_EMAIL:
-            send_email_for_contact_us(name, email, message)
+            send_email_for_contact_us(contact)
 
         return Response({'message': 'Contact Us form submitted successfully.'}, status=status.HTTP_200_OK)
 
 
-def send_email_for_contact_us(name, email, message):
-    subject = f'New Contact Us form submission from {name}'
-    message = f'Name: {name}\nEmail: {email}\nMessage: {message}'
-    send_mail(subject, message, settings.DEFAULT_FROM_EMAIL, [settings.CONTACT_US_RECIPIENT_EMAIL])
+def send_email_for_contact_us(contact):
+    subject = f'New Contact Us form submission from {contact.name}'
+    message = f'Name: {contact.name}\nEmail: {contact.email}\nMessage: {contact.message}'
+    queue_email(f'contact-us:{contact.id}', subject, message, [settings.CONTACT_US_RECIPIENT_EMAIL])
 
 
 # ===== Home Management Views =====
@@ -508,6 +510,10 @@ class DocumentViewSet(viewsets.ModelViewSet):
         })
 
 
+# Longest date range the task occurrences endpoint will expand
+MAX_OCCURRENCE_WINDOW_DAYS = 366
+
+
 class TaskViewSet(viewsets.ModelViewSet):
     """
     ViewSet for managing home tasks
@@ -549,6 +555,46 @@ class TaskViewSet(viewsets.ModelViewSet):
             'recurring': recurring_stats
         })
 
+    @action(detail=False, methods=['get'])
+    def occurrences(self, request):
+        """
+        Get occurrences of recurring tasks between start and end (YYYY-MM-DD).
+        Future occurrences are projected from the recurrence rules without creating tasks.
+        """
+        from datetime import datetime
+
+        start_str = request.query_params.get('start')
+        end_str = request.query_params.get('end')
+        if not start_str or not end_str:
+            return Response(
+                {'error': 'start and end parameters are required (YYYY-MM-DD)'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        try:
+            start_date = datetime.strptime(start_str, '%Y-%m-%d').date()
+            end_date = datetime.strptime(end_str, '%Y-%m-%d').date()
+        except ValueError:
+            return Response(
+                {'error': 'Invalid date format. Use YYYY-MM-DD'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        if end_date < start_date or (end_date - start_date).days > MAX_OCCURRENCE_WINDOW_DAYS:
+            return Response(
+                {'error': f'end must be on or after start and at most {MAX_OCCURRENCE_WINDOW_DAYS} days later'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        home = get_current_home(request)
+        occurrences = get_recurring_task_occurrences(home, start_date, end_date) if home else []
+
+        return Response({
+            'start': start_str,
+            'end': end_str,
+            'occurrences': occurrences
+        })
+
 
 class AppointmentViewSet(viewsets.ModelViewSet):
     """
@@ -747,26 +793,19 @@ class NotificationViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['get'])
     def unread_count(self, request):
         """Get count of unread notifications"""
-        count = self.get_queryset().filter(is_read=False).count()
-        return Response({'unread_count': count})
+        counter = get_notification_counter(request.user)
+        return Response({'unread_count': counter.total})
 
     @action(detail=False, methods=['get'])
     def summary(self, request):
         """Get summary of notifications (overdue, due today, due soon)"""
-        from django.utils import timezone
-        from datetime import timedelta
-
-        queryset = self.get_queryset()
-
-        overdue = queryset.filter(notification_type='overdue', is_read=False).count()
-        due_today = queryset.filter(notification_type='due_today', is_read=False).count()
-        due_soon = queryset.filter(notification_type='due_soon', is_read=False).count()
+        counter = get_notification_counter(request.user)
 
         return Response({
-            'overdue': overdue,
-            'due_today': due_today,
-            'due_soon': due_soon,
-            'total': overdue + due_today + due_soon
+            'overdue': counter.overdue,
+            'due_today': counter.due_today,
+            'due_soon': counter.due_soon,
+            'total': counter.total
         })
 
     @action(detail=True, methods=['post'])
@@ -776,7 +815,9 @@ class NotificationViewSet(viewsets.ModelViewSet):
         notification = self.get_object()
         notification.is_read = True
         notification.read_at = timezone.now()
-        notification.save()
+        with transaction.atomic():
+            # The post_save signal takes it off the unread counter
+            notification.save()
         serializer = self.get_serializer(notification)
         return Response(serializer.data)
 
@@ -785,7 +826,10 @@ class NotificationViewSet(viewsets.ModelViewSet):
         """Mark all notifications as read"""
         from django.utils import timezone
         queryset = self.get_queryset().filter(is_read=False)
-        updated_count = queryset.update(is_read=True, read_at=timezone.now())
+        with transaction.atomic():
+            updated_count = queryset.update(is_read=True, read_at=timezone.now())
+            # Recounted rather than zeroed, so notifications created meanwhile still count
+            recount_notifications([request.user.id])
         return Response({'updated_count': updated_count})
 
 
@@ -0,0 +1,409 @@
+"""
+Synthetic recurring task workload and benchmarks for the recurrence scheduler.
+
+Generated users have a reserved username prefix and no email address, so they
+can be told apart from real accounts, removed in one go and never receive mail.
+"""
+
+import random
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import timedelta
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db import connection, transaction
+from django.utils import timezone
+from .models import Home, HomeComponent, HomeMembership, Task, TaskTemplate
+from .recurrence import RELATIVE_WEEKDAYS, WEEK_INDEX, next_occurrence, rule_cache
+from .recurring_tasks import calculate_next_due_date, create_recurring_task_instances, register_components_bulk
+
+User = get_user_model()
+
+WORKLOAD_USERNAME_PREFIX = 'loadtest-'
+WORKLOAD_ADDRESS_SUFFIX = ' Loadtest Way'
+
+# Rough share of each rule shape among production recurring tasks
+PATTERN_MIX = {
+    'daily': 10,
+    'weekly': 35,
+    'monthly-absolute': 25,
+    'monthly-relative': 15,
+    'yearly': 15,
+}
+
+TASK_TITLES = [
+    'Water plants', 'Take out recycling', 'Replace HVAC filter', 'Test smoke detectors',
+    'Clean gutters', 'Flush water heater', 'Clean dryer vent', 'Check sump pump',
+    'Inspect roof', 'Service lawn mower', 'Clean range hood filter', 'Run dishwasher cleaner',
+]
+
+CATEGORIES = ['General Maintenance', 'HVAC', 'Plumbing', 'Electrical', 'Exterior', 'Appliances']
+
+# (category, component names, brands) used for generated home components
+COMPONENT_KINDS = [
+    ('HVAC', ['Furnace', 'Heat Pump', 'Central AC'], ['Carrier', 'Trane', 'Lennox']),
+    ('Water Heater', ['Water Heater (Tank)', 'Tankless Water Heater'], ['Rheem', 'A.O. Smith']),
+    ('Appliances', ['Refrigerator', 'Dishwasher', 'Clothes Dryer'], ['Whirlpool', 'LG', 'Bosch']),
+    ('Plumbing', ['Water Softener', 'Well Pump'], ['Culligan', 'Goulds']),
+    ('Gutters', ['Gutters'], ['']),
+    ('Sump Pump', ['Sump Pump'], ['Zoeller', 'Wayne']),
+    ('Garage Door', ['Garage Door Opener'], ['Chamberlain', 'Genie']),
+]
+
+
+def parse_pattern_mix(value):
+    """
+    Parse a pattern mix such as "daily:10,weekly:35,yearly:5".
+
+    Args:
+        value: str of comma separated label:weight pairs
+
+    Returns:
+        dict mapping pattern label to weight
+    """
+    mix = {}
+    for part in value.split(','):
+        label, _, weight = part.partition(':')
+        label = label.strip()
+        if label not in PATTERN_MIX:
+            raise ValueError(f"Unknown pattern '{label}'")
+        mix[label] = int(weight or 1)
+    return mix
+
+
+def pattern_label(task):
+    """
+    Classify a task's recurrence rule into one of the PATTERN_MIX labels.
+    """
+    if task.recurrence_pattern != 'monthly':
+        return task.recurrence_pattern
+    days_of_month = task.recurrence_days_of_month or []
+    if days_of_month and isinstance(days_of_month[0], dict):
+        return 'monthly-relative'
+    return 'monthly-absolute'
+
+
+def build_recurrence_rule(rng, label):
+    """
+    Build the recurrence fields for a random rule of the given shape.
+
+    Args:
+        rng: random.Random instance
+        label: one of the PATTERN_MIX labels
+
+    Returns:
+        dict of Task field values
+    """
+    rule = {
+        'recurrence_interval': 1,
+        'recurrence_days_of_week': [],
+        'recurrence_days_of_month': [],
+    }
+
+    if label == 'daily':
+        rule['recurrence_pattern'] = 'daily'
+        rule['recurrence_interval'] = rng.choice([1, 1, 2, 3, 7])
+    elif label == 'weekly':
+        rule['recurrence_pattern'] = 'weekly'
+        rule['recurrence_interval'] = rng.choice([1, 1, 1, 2, 4])
+        days = rng.sample(range(7), rng.choice([1, 1, 2, 3]))
+        rule['recurrence_days_of_week'] = [str(day) for day in sorted(days)]
+    elif label == 'monthly-absolute':
+        rule['recurrence_pattern'] = 'monthly'
+        days = rng.sample(range(1, 32), rng.choice([1, 1, 2]))
+        rule['recurrence_days_of_month'] = sorted(days)
+    elif label == 'monthly-relative':
+        rule['recurrence_pattern'] = 'monthly'
+        rule['recurrence_days_of_month'] = [{
+            'type': 'relative',
+            'week': rng.choice(list(WEEK_INDEX)),
+            'day': rng.choice(['day'] + list(RELATIVE_WEEKDAYS)),
+        }]
+    else:
+        rule['recurrence_pattern'] = 'yearly'
+
+    return rule
+
+
+def generate_workload(homes, tasks_per_home, mix=None, seed=None, spread_days=45, components_per_home=0,
+                      batch_size=1000):
+    """
+    Create synthetic homes, owners and recurring tasks.
+
+    Due dates are spread over the past spread_days days, so a realistic share of
+    the tasks is due on the next nightly run. Rows are bulk created, so
+    next_occurrence_date is computed here rather than by the post_save signal.
+
+    Args:
+        homes: number of homes (each with one owner) to create
+        tasks_per_home: number of recurring tasks per home
+        mix: dict of pattern label to weight (defaults to PATTERN_MIX)
+        seed: optional random seed for reproducible workloads
+        spread_days: due dates fall between today and this many days ago
+        components_per_home: home components to create and register against active templates
+        batch_size: rows per bulk insert
+
+    Returns:
+        dict with counts of created users, homes, components, registrations and tasks per pattern
+    """
+    rng = random.Random(seed)
+    mix = mix or PATTERN_MIX
+    labels = list(mix)
+    weights = [mix[label] for label in labels]
+    today = timezone.now().date()
+
+    first = User.objects.filter(username__startswith=WORKLOAD_USERNAME_PREFIX).count()
+    counts = {
+        'users': 0,
+        'homes': 0,
+        'components': 0,
+        'registrations': 0,
+        'tasks': {label: 0 for label in labels},
+    }
+
+    for start in range(first, first + homes, batch_size):
+        numbers = range(start, min(start + batch_size, first + homes))
+
+        with transaction.atomic():
+            users = User.objects.bulk_create([
+                User(
+                    username=f'{WORKLOAD_USERNAME_PREFIX}{n}',
+                    password=make_password(None),
+                    first_name='Load',
+                    last_name=f'Test {n}',
+                )
+                for n in numbers
+            ])
+            home_objects = Home.objects.bulk_create([
+                Home(name=f'Load Test Home {n}', address=f'{n}{WORKLOAD_ADDRESS_SUFFIX}')
+                for n in numbers
+            ])
+            HomeMembership.objects.bulk_create([
+                HomeMembership(user=user, home=home, is_primary=True)
+                for user, home in zip(users, home_objects)
+            ])
+
+            tasks = []
+            for user, home in zip(users, home_objects):
+                for label in rng.choices(labels, weights, k=tasks_per_home):
+                    task = Task(
+                        user=user,
+                        home=home,
+                        title=rng.choice(TASK_TITLES),
+                        category=rng.choice(CATEGORIES),
+                        due_date=today - timedelta(days=rng.randint(0, spread_days)),
+                        is_recurring=True,
+                        **build_recurrence_rule(rng, label)
+                    )
+                    task.next_occurrence_date = next_occurrence(task, task.due_date)
+                    tasks.append(task)
+                    counts['tasks'][label] += 1
+
+            Task.objects.bulk_create(tasks, batch_size=batch_size)
+
+            if components_per_home:
+                components = HomeComponent.objects.bulk_create([
+                    build_component(rng, user, home)
+                    for user, home in zip(users, home_objects)
+                    for _ in range(components_per_home)
+                ], batch_size=batch_size)
+                counts['components'] += len(components)
+                counts['registrations'] += register_components_bulk(components, create_tasks=False)['registrations']
+
+        counts['users'] += len(users)
+        counts['homes'] += len(home_objects)
+
+    return counts
+
+
+def build_component(rng, user, home):
+    """
+    Build an unsaved home component of a random kind.
+    """
+    category, names, brands = rng.choice(COMPONENT_KINDS)
+    return HomeComponent(
+        user=user,
+        home=home,
+        name=rng.choice(names),
+        category=category,
+        brand=rng.choice(brands),
+    )
+
+
+def create_workload_templates(seed=None):
+    """
+    Create one maintenance template per generated component category, with a
+    mix of frequencies, for databases that have no template catalog (such as
+    the simulator's throwaway database).
+
+    Returns:
+        list of created TaskTemplate objects
+    """
+    rng = random.Random(seed)
+    return TaskTemplate.objects.bulk_create([
+        TaskTemplate(
+            category=category,
+            title=f'Service {category.lower()}',
+            description=f'Routine maintenance for {category.lower()} components.',
+            frequency_months=rng.choice([1, 3, 6, 12]),
+            time_estimate_minutes=30,
+        )
+        for category, _, _ in COMPONENT_KINDS
+    ])
+
+
+def add_recurring_tasks(tasks_per_user, label='monthly-absolute', seed=None, batch_size=1000):
+    """
+    Give every generated user extra recurring tasks of one shape, to model
+    questions like "what if every user adds five monthly tasks".
+
+    Returns:
+        int number of tasks created
+    """
+    rng = random.Random(seed)
+    today = timezone.now().date()
+    memberships = HomeMembership.objects.filter(
+        user__username__startswith=WORKLOAD_USERNAME_PREFIX
+    ).select_related('user', 'home')
+
+    tasks = []
+    for membership in memberships:
+        for _ in range(tasks_per_user):
+            task = Task(
+                user=membership.user,
+                home=membership.home,
+                title=rng.choice(TASK_TITLES),
+                category=rng.choice(CATEGORIES),
+                due_date=today,
+                is_recurring=True,
+                **build_recurrence_rule(rng, label)
+            )
+            task.next_occurrence_date = next_occurrence(task, task.due_date)
+            tasks.append(task)
+
+    Task.objects.bulk_create(tasks, batch_size=batch_size)
+    return len(tasks)
+
+
+def clear_workload():
+    """
+    Delete every generated user and home, and with them their tasks.
+
+    Returns:
+        int number of deleted rows
+    """
+    with transaction.atomic():
+        deleted, _ = Home.objects.filter(address__endswith=WORKLOAD_ADDRESS_SUFFIX).delete()
+        user_deleted, _ = User.objects.filter(username__startswith=WORKLOAD_USERNAME_PREFIX).delete()
+    return deleted + user_deleted
+
+
+class QueryCounter:
+    """
+    Connection execute wrapper that counts queries. Unlike CaptureQueriesContext
+    it keeps no query log, so it stays accurate past Django's 9000 query cap.
+    """
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+    def __len__(self):
+        return self.count
+
+
+@contextmanager
+def count_queries():
+    """
+    Count the queries run on the default connection inside the block.
+    """
+    counter = QueryCounter()
+    with connection.execute_wrapper(counter):
+        yield counter
+
+
+def _rate(count, seconds):
+    return round(count / seconds, 1) if seconds else None
+
+
+def benchmark_patterns(tasks, iterations=10):
+    """
+    Measure next-occurrence throughput for each rule shape.
+
+    For every pattern label this times the engine alone (first call compiles
+    the rule, the rest hit the rule cache) and calculate_next_due_date, which
+    also looks up the latest instance and so shows the per-task query cost.
+
+    Args:
+        tasks: iterable of recurring parent Task objects
+        iterations: engine calls per task
+
+    Returns:
+        dict mapping pattern label to its measurements
+    """
+    by_label = defaultdict(list)
+    for task in tasks:
+        by_label[pattern_label(task)].append(task)
+
+    results = {}
+    for label, label_tasks in sorted(by_label.items()):
+        rule_cache.clear()
+
+        start = time.perf_counter()
+        for task in label_tasks:
+            current_date = task.due_date
+            for _ in range(iterations):
+                current_date = next_occurrence(task, current_date, has_previous=True)
+        engine_seconds = time.perf_counter() - start
+
+        with count_queries() as queries:
+            start = time.perf_counter()
+            for task in label_tasks:
+                calculate_next_due_date(task)
+            lookup_seconds = time.perf_counter() - start
+
+        results[label] = {
+            'tasks': len(label_tasks),
+            'engine_per_second': _rate(len(label_tasks) * iterations, engine_seconds),
+            'next_due_date_per_second': _rate(len(label_tasks), lookup_seconds),
+            'queries_per_task': round(len(queries) / len(label_tasks), 2),
+        }
+
+    return results
+
+
+def benchmark_nightly_run(batch_size=None, catch_up=False, keep=False):
+    """
+    Time one run of create_recurring_task_instances and count its queries.
+
+    The run happens inside a transaction that is rolled back unless keep is
+    True, so the same workload can be measured repeatedly.
+
+    Args:
+        batch_size: passed through; None uses the row-at-a-time path
+        catch_up: passed through to create missed occurrences
+        keep: commit the created instances instead of rolling back
+
+    Returns:
+        dict with created, errors, seconds, queries and instances per second
+    """
+    with transaction.atomic():
+        with count_queries() as queries:
+            start = time.perf_counter()
+            result = create_recurring_task_instances(batch_size=batch_size, catch_up=catch_up)
+            seconds = time.perf_counter() - start
+
+        if not keep:
+            transaction.set_rollback(True)
+
+    return {
+        'created': result['created'],
+        'errors': len(result['errors']),
+        'seconds': round(seconds, 3),
+        'queries': len(queries),
+        'per_second': _rate(result['created'], seconds),
+    }